@@ -1,11 +1,31 @@
 # Importações necessárias para operações assíncronas e análise
 import asyncio
+import json
+import random
+import time
 import aiohttp
 import numpy as np
 import pytz 
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, fields
 from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
 # GARANTINDO A IMPORTAÇÃO DE TODOS OS TIPOS USADOS
-from typing import Dict, Any, List, Tuple, Optional 
+from typing import Dict, Any, List, Tuple, Optional, AsyncIterator, Callable, Iterator, Sequence, Union
+
+try:
+    import orjson
+except ImportError:  # Opcional: sem orjson, as respostas são decodificadas com o json da stdlib
+    orjson = None
+
+from form_index import TeamFormIndex
+from instrumentation import (
+    API_REQUESTS_TOTAL, API_REQUEST_SECONDS, API_RETRIES_TOTAL, API_RATE_LIMITED_TOTAL,
+    API_RETRY_GIVEUPS_TOTAL, API_CIRCUIT_TRANSITIONS_TOTAL, cache_event, endpoint_label,
+)
+from match_store import MatchStore
+from models import Fixture, LiveMatch, TeamMetrics, TeamMetricsPanel
 
 # Configurações da API football-data.org
 BASE_URL = "https://api.football-data.org/v4"
@@ -37,6 +57,9 @@ LEAGUE_MAP: Dict[str, Dict[str, Any]] = {
 # Lista de IDs que serão buscados no fetch_upcoming_fixtures
 COMPETITION_IDS = [data["id"] for data in LEAGUE_MAP.values()]
 
+# Índice pré-calculado: ID numérico da competição -> metadados da liga
+LEAGUE_BY_ID: Dict[int, Dict[str, Any]] = {data["id"]: data for data in LEAGUE_MAP.values()}
+
 # Mapeamento de códigos de área (Atualizado para incluir 'WW' e 'EU')
 AREA_CODE_MAP = {
     "ENG": "GB", "ESP": "ES", "ITA": "IT", "DEU": "DE", "GER": "DE", 
@@ -44,6 +67,300 @@ AREA_CODE_MAP = {
     "GBR": "GB", "WORLD": "WW", "EUR": "EU",
 }
 
+# ======================================================================
+# CONTROLE DE COTA DA API (RATE LIMIT)
+# ======================================================================
+
+class RateLimiter:
+    """
+    Token bucket assíncrono compartilhado por todas as chamadas à API.
+    A cota é ajustada pelos headers do football-data.org (X-Requests-Available-Minute,
+    X-RequestCounter-Reset) e pelo Retry-After de respostas 429.
+    """
+
+    def __init__(self, rate_per_minute: int = 10, burst: Optional[int] = None):
+        self.set_rate(rate_per_minute, burst)
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate_per_minute: int, burst: Optional[int] = None) -> None:
+        """Reconfigura a cota (ex.: plano pago com mais requisições por minuto)."""
+        self.rate = max(rate_per_minute, 1) / 60.0
+        self.capacity = float(burst or rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self) -> None:
+        """Aguarda até haver cota disponível e consome uma requisição."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def block_for(self, seconds: float) -> None:
+        """Suspende todas as requisições por 'seconds' (ex.: Retry-After de um 429)."""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = now
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado atual do bucket (para o endpoint /status)."""
+        now = time.monotonic()
+        return {
+            "rate_per_minute": round(self.rate * 60, 2),
+            "tokens": round(min(self.capacity, self._tokens + (now - self._updated) * self.rate), 2),
+            "blocked_for_s": round(max(0.0, self._blocked_until - now), 2),
+        }
+
+    def update_from_headers(self, headers: Any) -> None:
+        """Sincroniza o bucket com a cota informada pela API na resposta."""
+        available = _header_float(headers, "X-Requests-Available-Minute")
+        reset_in = _header_float(headers, "X-RequestCounter-Reset")
+
+        if available is None:
+            return
+
+        self._refill(time.monotonic())
+        # Só reduz: o bucket local já descontou as requisições em andamento
+        self._tokens = min(self._tokens, available)
+        if available <= 0 and reset_in:
+            self.block_for(reset_in)
+
+
+def _header_float(headers: Any, name: str) -> Optional[float]:
+    value = headers.get(name) if headers else None
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Limiter padrão usado por fetch_with_retry (cota do plano gratuito: 10 req/min)
+API_RATE_LIMITER = RateLimiter(rate_per_minute=10)
+
+# RateLimiter da chave em uso na task atual (modo em shards: cada chave tem o seu).
+# Sem valor, fetch_with_retry usa o API_RATE_LIMITER global.
+_ACTIVE_LIMITER: ContextVar[Optional[RateLimiter]] = ContextVar("active_limiter", default=None)
+
+
+@contextmanager
+def rate_limiter_scope(limiter: RateLimiter) -> Iterator[None]:
+    """As requisições feitas dentro do bloco (e das tasks criadas nele) usam 'limiter'."""
+    token = _ACTIVE_LIMITER.set(limiter)
+    try:
+        yield
+    finally:
+        _ACTIVE_LIMITER.reset(token)
+
+# ======================================================================
+# POLÍTICA DE REENVIO (PRAZO DO CICLO) E CIRCUIT BREAKER
+# ======================================================================
+
+# Prazo (epoch) do ciclo em andamento; as tasks criadas dentro do ciclo herdam o valor.
+# É uma função porque o prazo do pipeline muda conforme novos kickoffs aparecem.
+_CYCLE_DEADLINE: ContextVar[Optional[Callable[[], float]]] = ContextVar("cycle_deadline", default=None)
+
+
+@contextmanager
+def cycle_deadline_scope(deadline: Callable[[], float]) -> Iterator[None]:
+    """Limita os reenvios feitos dentro do bloco ao prazo do ciclo (epoch retornado por 'deadline')."""
+    token = _CYCLE_DEADLINE.set(deadline)
+    try:
+        yield
+    finally:
+        _CYCLE_DEADLINE.reset(token)
+
+
+def remaining_cycle_budget() -> Optional[float]:
+    """Segundos até o prazo do ciclo atual (None fora de um ciclo)."""
+    deadline = _CYCLE_DEADLINE.get()
+    return None if deadline is None else deadline() - time.time()
+
+
+class RetryPolicy:
+    """
+    Tentativas, timeouts por requisição e backoff com 'decorrelated jitter'
+    (espera = aleatório entre base e 3x a espera anterior, limitado a max_delay).
+    Nenhuma espera ultrapassa o que resta do prazo do ciclo.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        request_timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+    ):
+        self.configure(max_attempts, base_delay, max_delay, request_timeout, connect_timeout)
+        self.retries = 0
+        self.budget_giveups = 0
+
+    def configure(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        request_timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+    ) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = aiohttp.ClientTimeout(total=request_timeout, sock_connect=connect_timeout)
+
+    def next_delay(self, previous: float) -> float:
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+
+    def fits_budget(self, delay: float) -> bool:
+        """True se ainda dá para esperar 'delay' e tentar de novo antes do prazo do ciclo."""
+        remaining = remaining_cycle_budget()
+        if remaining is None or delay < remaining:
+            return True
+        self.budget_giveups += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_attempts": self.max_attempts,
+            "request_timeout_s": self.timeout.total,
+            "retries": self.retries,
+            "budget_giveups": self.budget_giveups,
+        }
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por host: após 'failure_threshold' falhas seguidas (5xx, timeout,
+    erro de conexão) o circuito abre e as requisições falham na hora durante 'cooldown'
+    segundos. Depois disso uma única requisição de teste decide se fecha ou reabre; se
+    ela terminar sem resposta (cancelada pelo prazo do ciclo, erro inesperado), o
+    circuito volta a abrir por mais 'cooldown' segundos (ver abandon_probe).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.configure(failure_threshold, cooldown)
+        self._state: Dict[str, str] = {}
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self.rejected = 0
+
+    def configure(self, failure_threshold: int = 5, cooldown: float = 30.0) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+
+    def _set_state(self, host: str, state: str) -> None:
+        if self._state.get(host, self.CLOSED) != state:
+            self._state[host] = state
+            API_CIRCUIT_TRANSITIONS_TOTAL.inc(host, state)
+            if state == self.OPEN:
+                print(f"⚠ Circuit breaker ABERTO para {host} por {self.cooldown:g}s.")
+
+    def allow(self, host: str) -> bool:
+        state = self._state.get(host, self.CLOSED)
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN and time.monotonic() - self._opened_at[host] >= self.cooldown:
+            self._set_state(host, self.HALF_OPEN)
+            return True  # Requisição de teste
+        self.rejected += 1
+        return False
+
+    def is_probing(self, host: str) -> bool:
+        return self._state.get(host) == self.HALF_OPEN
+
+    def abandon_probe(self, host: str) -> None:
+        """A requisição de teste acabou sem sucesso nem falha registrados: reabre o circuito."""
+        if self._state.get(host) == self.HALF_OPEN:
+            self._opened_at[host] = time.monotonic()
+            self._set_state(host, self.OPEN)
+
+    def record_success(self, host: str) -> None:
+        self._failures[host] = 0
+        self._set_state(host, self.CLOSED)
+
+    def record_failure(self, host: str) -> None:
+        self._failures[host] = self._failures.get(host, 0) + 1
+        if self._state.get(host) == self.HALF_OPEN or self._failures[host] >= self.failure_threshold:
+            self._opened_at[host] = time.monotonic()
+            self._set_state(host, self.OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "rejected": self.rejected,
+            "hosts": {
+                host: {
+                    "state": state,
+                    "failures": self._failures.get(host, 0),
+                    "open_for_s": round(max(0.0, self.cooldown - (now - self._opened_at[host])), 2)
+                    if state == self.OPEN else 0.0,
+                }
+                for host, state in self._state.items()
+            },
+        }
+
+
+# Política e circuit breaker padrão usados por fetch_with_retry (configurados pelo main.py)
+API_RETRY_POLICY = RetryPolicy()
+API_CIRCUIT_BREAKER = CircuitBreaker()
+
+# ======================================================================
+# SESSÃO HTTP COMPARTILHADA (POOL DE CONEXÕES)
+# ======================================================================
+
+def create_http_session(
+    limit: int = 20,
+    limit_per_host: int = 10,
+    ttl_dns_cache: int = 300,
+    keepalive_timeout: float = 60.0,
+    total_timeout: float = 30.0,
+    trace_configs: Optional[List[aiohttp.TraceConfig]] = None,
+) -> aiohttp.ClientSession:
+    """
+    Cria a sessão HTTP de longa duração do bot: pool de conexões com keep-alive e
+    cache de DNS, para reaproveitar o handshake TCP+TLS com a API entre requisições.
+    Deve ser criada uma vez (em main()) e fechada no encerramento.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=ttl_dns_cache,
+        keepalive_timeout=keepalive_timeout,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=total_timeout),
+        trace_configs=trace_configs,
+    )
+
+
+@asynccontextmanager
+async def _session_scope(session: Optional[aiohttp.ClientSession]):
+    """Usa a sessão compartilhada se fornecida; caso contrário abre uma temporária."""
+    if session is not None:
+        yield session
+        return
+    async with create_http_session() as temp_session:
+        yield temp_session
+
 # ======================================================================
 # FUNÇÕES DE UTILIDADE E CONFIGURAÇÃO
 # ======================================================================
@@ -66,50 +383,165 @@ def get_flag_emoji(country_code: str) -> str:
     return "".join(chr(0x1F1E6 + ord(char) - ord('A')) for char in code)
 
 
-async def fetch_with_retry(session: aiohttp.ClientSession, url: str, api_token: str) -> Optional[Dict[str, Any]]:
+# ======================================================================
+# DECODIFICAÇÃO E PROJEÇÃO DAS RESPOSTAS
+# ======================================================================
+
+def decode_json(raw: bytes) -> Any:
+    """Decodifica o corpo bruto da resposta (orjson quando instalado, senão json da stdlib)."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _slim_score(part: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    part = part or {}
+    return {"home": part.get("home"), "away": part.get("away")}
+
+
+def _slim_team(team: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    team = team or {}
+    return {"id": team.get("id"), "name": team.get("name")}
+
+
+def slim_match(m: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Realiza uma chamada HTTP GET assíncrona com lógica de Exponential Backoff para reenvio.
+    Só os campos de uma partida que o pipeline usa (ids, data, status, placares FT/HT,
+    times): árbitros, odds, área, temporada etc. são descartados antes de qualquer
+    cache, base local ou snapshot.
     """
-    max_retries = 3
-    initial_delay = 1
+    score = m.get("score") or {}
+    return {
+        "id": m.get("id"),
+        "utcDate": m.get("utcDate"),
+        "status": m.get("status", "FINISHED"),
+        "competition": {"id": (m.get("competition") or {}).get("id")},
+        "homeTeam": _slim_team(m.get("homeTeam")),
+        "awayTeam": _slim_team(m.get("awayTeam")),
+        "score": {"fullTime": _slim_score(score.get("fullTime")), "halfTime": _slim_score(score.get("halfTime"))},
+    }
+
+
+def slim_payload(data: Any) -> Any:
+    """Aplica slim_match a uma resposta de lista ({"matches": [...]}) ou de partida única."""
+    if not isinstance(data, dict):
+        return data
+    if "matches" in data:
+        return {"matches": [slim_match(m) for m in data.get("matches") or []]}
+    if "homeTeam" in data and "utcDate" in data:
+        return slim_match(data)
+    return data
+
+
+async def fetch_with_retry(
+    session: aiohttp.ClientSession,
+    url: str,
+    api_token: str,
+    limiter: Optional[RateLimiter] = None,
+    policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    slim: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Realiza uma chamada HTTP GET assíncrona com reenvio (backoff com jitter, ver RetryPolicy).
+    Toda requisição passa pelo RateLimiter da chave (o global ou o do shard, ver
+    rate_limiter_scope) e pelo circuit breaker do host; nenhuma espera passa do prazo do ciclo em andamento.
+    O corpo é decodificado direto dos bytes (decode_json) e, com 'slim', as partidas
+    já saem reduzidas por slim_payload.
+    """
+    limiter = limiter or _ACTIVE_LIMITER.get() or API_RATE_LIMITER
+    policy = policy or API_RETRY_POLICY
+    breaker = breaker or API_CIRCUIT_BREAKER
+    endpoint = endpoint_label(url)
+    host = urlsplit(url).netloc
 
     headers = {
         'X-Auth-Token': api_token,
         'Content-Type': 'application/json'
     }
 
-    for attempt in range(max_retries):
-        delay = initial_delay * (2 ** attempt)
+    delay = policy.base_delay
+    for attempt in range(policy.max_attempts):
+        last_attempt = attempt == policy.max_attempts - 1
+        if attempt > 0:
+            API_RETRIES_TOTAL.inc(endpoint)
+            policy.retries += 1
+
+        if not breaker.allow(host):
+            API_REQUESTS_TOTAL.inc(endpoint, "circuit_open")
+            API_RETRY_GIVEUPS_TOTAL.inc(endpoint, "circuit_open")
+            return None
 
+        probe = breaker.is_probing(host)  # Esta é a requisição de teste do circuito
+        delay = policy.next_delay(delay)
         try:
-            async with session.get(url, headers=headers) as response:
+            await limiter.acquire()
+            started = time.perf_counter()
+            async with session.get(url, headers=headers, timeout=policy.timeout) as response:
+                API_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+                API_REQUESTS_TOTAL.inc(endpoint, response.status)
+                limiter.update_from_headers(response.headers)
+
+                if response.status < 500:
+                    breaker.record_success(host)  # O host respondeu (inclusive 4xx/429)
+
                 if response.status == 200:
-                    return await response.json()
-                elif response.status == 429 and attempt < max_retries - 1:
-                    print(f"⚠ Rate Limit atingido (429). Tentando novamente em {delay}s...")
-                    await asyncio.sleep(delay)
+                    data = decode_json(await response.read())
+                    return slim_payload(data) if slim else data
+                elif response.status == 429:
+                    retry_after = (
+                        _header_float(response.headers, "Retry-After")
+                        or _header_float(response.headers, "X-RequestCounter-Reset")
+                        or delay
+                    )
+                    API_RATE_LIMITED_TOTAL.inc(endpoint)
+                    # Bloqueia a chave mesmo ao desistir: as outras tasks também respeitam a espera
+                    limiter.block_for(retry_after)
+                    if last_attempt:
+                        API_RETRY_GIVEUPS_TOTAL.inc(endpoint, "rate_limited")
+                        print(f"⚠ Cota da API esgotada (429) após {policy.max_attempts} tentativas. Chave bloqueada por {retry_after}s; desistindo.")
+                        return None
+                    if not policy.fits_budget(retry_after):
+                        API_RETRY_GIVEUPS_TOTAL.inc(endpoint, "deadline")
+                        print(f"⚠ Rate Limit atingido (429). Espera de {retry_after}s passa do prazo do ciclo; desistindo.")
+                        return None
+                    print(f"⚠ Rate Limit atingido (429). Tentando novamente em {retry_after}s...")
+                    continue
                 elif response.status >= 400 and response.status < 500:
                     error_text = await response.text()
                     print(f"❌ Erro irrecuperável HTTP {response.status}: {error_text}")
                     return None
-                elif response.status >= 500 and attempt < max_retries - 1:
-                    print(f"❌ Erro do Servidor HTTP {response.status}. Tentando novamente em {delay}s...")
-                    await asyncio.sleep(delay)
+                elif response.status >= 500:
+                    breaker.record_failure(host)
+                    print(f"❌ Erro do Servidor HTTP {response.status}.")
                 else:
                     print(f"❌ Erro HTTP {response.status} na requisição: {url}")
                     return None
 
-        except aiohttp.ClientConnectorError as e:
-            print(f"❌ Erro de Conexão: {e}")
-            if attempt < max_retries - 1:
-                print(f"   -> Reenvio em {delay}s...")
-                await asyncio.sleep(delay)
-            else:
-                return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            breaker.record_failure(host)
+            status = "timeout" if isinstance(e, asyncio.TimeoutError) else "connection_error"
+            API_REQUESTS_TOTAL.inc(endpoint, status)
+            print(f"❌ Erro de Conexão ({status}): {e or type(e).__name__}")
         except Exception as e:
             print(f"❌ Erro inesperado no fetch: {e}")
             return None
-            
+        finally:
+            # Teste sem resultado (cancelamento, erro inesperado): não pode deixar o host em half_open
+            if probe:
+                breaker.abandon_probe(host)
+
+        # Falha transitória (5xx, timeout, conexão): espera com jitter, se ainda houver prazo
+        if last_attempt:
+            API_RETRY_GIVEUPS_TOTAL.inc(endpoint, "attempts")
+            return None
+        if not policy.fits_budget(delay):
+            API_RETRY_GIVEUPS_TOTAL.inc(endpoint, "deadline")
+            print(f"   -> Sem prazo no ciclo para novo envio ({delay:.1f}s); desistindo.")
+            return None
+        print(f"   -> Reenvio em {delay:.1f}s...")
+        await asyncio.sleep(delay)
+
     return None
 
 # ======================================================================
@@ -117,9 +549,38 @@ async def fetch_with_retry(session: aiohttp.ClientSession, url: str, api_token:
 # ======================================================================
 
 # ATUALIZADO: Agora recebe league_ids para buscar Múltiplas Ligas
-async def fetch_upcoming_fixtures(api_token: str, league_ids: Optional[List[int]] = None, per_page: int = 200) -> List[Dict[str, Any]]:
+async def fetch_upcoming_fixtures(
+    api_token: str,
+    league_ids: Optional[List[int]] = None,
+    per_page: int = 200,
+    session: Optional[aiohttp.ClientSession] = None,
+    batched: bool = True,
+) -> List[Fixture]:
     """
     Busca jogos futuros na API do football-data.org usando IDs de competição.
+    Usa a sessão compartilhada (pool de conexões) quando fornecida.
+    Em modo 'batched', faz UMA chamada em /matches?competitions=...; se o plano não
+    permitir, busca as competições em paralelo (sob a cota do RateLimiter).
+    """
+    all_fixtures: List[Fixture] = []
+    async for fixtures in stream_upcoming_fixtures(api_token, league_ids, session=session, batched=batched):
+        all_fixtures.extend(fixtures)
+
+    print(f"✅ Jogos futuros encontrados (Total de jogos únicos): {len(all_fixtures)}")
+    return all_fixtures
+
+
+async def stream_upcoming_fixtures(
+    api_token: str,
+    league_ids: Optional[List[int]] = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    batched: bool = True,
+) -> AsyncIterator[List[Fixture]]:
+    """
+    Versão em streaming de fetch_upcoming_fixtures. Com 'batched' (padrão), tenta antes
+    a chamada única em /matches?competitions=... e entrega tudo de uma vez; se o plano
+    não permitir, entrega os jogos de cada competição assim que a resposta dela chega
+    (requisições em paralelo), sem esperar as demais.
     """
     now_utc = datetime.now(timezone.utc)
     date_from = now_utc.strftime("%Y-%m-%d")
@@ -129,174 +590,516 @@ async def fetch_upcoming_fixtures(api_token: str, league_ids: Optional[List[int]
     if league_ids is None:
         league_ids = COMPETITION_IDS
 
-    all_fixtures: List[Dict[str, Any]] = []
+    query = f"dateFrom={date_from}&dateTo={date_to}&status=SCHEDULED,IN_PLAY,PAUSED"
 
-    async with aiohttp.ClientSession() as session:
-        
-        # Faz uma chamada para CADA ID de competição
-        for comp_id in league_ids:
-            url = (
-                f"{BASE_URL}/competitions/{comp_id}/matches"
-                f"?dateFrom={date_from}&dateTo={date_to}"
-                f"&status=SCHEDULED,IN_PLAY,PAUSED" 
-            )
-            
-            data = await fetch_with_retry(session, url, api_token)
-            
-            if data and data.get("matches"):
-                # Filtra o mapeamento para obter o código de país da liga
-                comp_info = next((info for info in LEAGUE_MAP.values() if info["id"] == comp_id), None)
-                country_code = comp_info.get("country_code", "WW") if comp_info else "WW"
-                comp_name = comp_info.get("name", "Desconhecida") if comp_info else "Desconhecida"
-                
-                print(f"DEBUG: Buscando jogos da liga ID {comp_id} ({comp_name})...")
-
-                for m in data["matches"]:
-                    if m.get('status') in ['FINISHED', 'POSTPONED', 'CANCELED']:
-                        continue
-                        
-                    # Usa o código de país do mapeamento para consistência com get_flag_emoji
-                    # Nota: Mapeei o country_code (2 letras) para a bandeira
-                    
-                    mapped_fixture = {
-                        "id": m.get("id"),
-                        "starting_at": m.get("utcDate"), 
-                        "league": {
-                            "name": comp_name, # Usa o nome do mapeamento global para consistência
-                            "country": {"code": country_code} 
-                        },
-                        "participants": [
-                            {"id": m["homeTeam"]["id"], "name": m["homeTeam"]["name"], "meta": {"location": "home"}, "country": {"code": country_code}},
-                            {"id": m["awayTeam"]["id"], "name": m["awayTeam"]["name"], "meta": {"location": "away"}, "country": {"code": country_code}}
-                        ]
-                    }
-                    all_fixtures.append(mapped_fixture)
-            
-            # ATENÇÃO: Adicione um delay se o seu plano GRATUITO for muito restrito
-            # await asyncio.sleep(0.5)
+    async with _session_scope(session) as session:
 
-    print(f"✅ Jogos futuros encontrados (Total de jogos únicos): {len(all_fixtures)}")
-    return all_fixtures
+        if batched:
+            ids = ",".join(str(comp_id) for comp_id in league_ids)
+            data = await fetch_with_retry(session, f"{BASE_URL}/matches?competitions={ids}&{query}", api_token)
+            if data is not None:
+                yield [
+                    f for f in (_map_fixture(m, (m.get("competition") or {}).get("id")) for m in data.get("matches") or [])
+                    if f is not None
+                ]
+                return
+            print("⚠ Busca em lote indisponível no plano. Buscando competições em paralelo...")
+
+        async def _fetch_competition(comp_id: int) -> List[Fixture]:
+            comp_data = await fetch_with_retry(session, f"{BASE_URL}/competitions/{comp_id}/matches?{query}", api_token)
+            if not comp_data or not comp_data.get("matches"):
+                return []
+            print(f"DEBUG: Jogos da liga ID {comp_id} ({LEAGUE_BY_ID.get(comp_id, {}).get('name', 'Desconhecida')}) recebidos.")
+            return [f for f in (_map_fixture(m, comp_id) for m in comp_data["matches"]) if f is not None]
+
+        # Uma chamada por competição, todas em paralelo; cada uma é entregue ao chegar
+        tasks = [asyncio.create_task(_fetch_competition(comp_id)) for comp_id in league_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                fixtures = await next_done
+                if fixtures:
+                    yield fixtures
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def fetch_live_matches(
+    api_token: str,
+    competition_ids: List[int],
+    session: Optional[aiohttp.ClientSession] = None,
+) -> Optional[List[LiveMatch]]:
+    """Partidas em andamento (IN_PLAY/PAUSED) das competições informadas, em 1 requisição."""
+    ids = ",".join(str(comp_id) for comp_id in competition_ids)
+    async with _session_scope(session) as session:
+        data = await fetch_with_retry(session, f"{BASE_URL}/matches?competitions={ids}&status=IN_PLAY,PAUSED", api_token)
+    if data is None:
+        return None
+    return [lm for lm in (_map_live_match(m) for m in data.get("matches") or []) if lm is not None]
 
 
-async def compute_team_metrics(api_token: str, team_id: int, last: int = 5) -> Dict[str, Any]:
+async def fetch_match(
+    api_token: str,
+    match_id: int,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> Optional[LiveMatch]:
+    """Estado atual de uma única partida (usado para conferir o placar final)."""
+    async with _session_scope(session) as session:
+        data = await fetch_with_retry(session, f"{BASE_URL}/matches/{match_id}", api_token)
+    return _map_live_match(data) if data else None
+
+
+def _map_live_match(m: Dict[str, Any]) -> Optional[LiveMatch]:
+    kickoff = parse_utc_date(m.get("utcDate"))
+    if kickoff is None or m.get("id") is None:
+        return None
+    score = m.get("score") or {}
+    full_time = score.get("fullTime") or {}
+    half_time = score.get("halfTime") or {}
+    return LiveMatch(
+        id=m["id"],
+        competition_id=(m.get("competition") or {}).get("id"),
+        kickoff=kickoff,
+        status=m.get("status", "IN_PLAY"),
+        home_goals=full_time.get("home"),
+        away_goals=full_time.get("away"),
+        ht_home=half_time.get("home"),
+        ht_away=half_time.get("away"),
+    )
+
+
+def _map_fixture(m: Dict[str, Any], comp_id: Optional[int]) -> Optional[Fixture]:
+    """Converte uma partida da API em Fixture (None se já encerrada ou sem horário válido)."""
+    if m.get('status') in ['FINISHED', 'POSTPONED', 'CANCELED']:
+        return None
+
+    kickoff = parse_utc_date(m.get("utcDate"))
+    if kickoff is None:
+        return None
+
+    # Usa o código de país e o nome do mapeamento global para consistência com get_flag_emoji
+    comp_info = LEAGUE_BY_ID.get(comp_id)
+
+    return Fixture(
+        id=m.get("id"),
+        kickoff=kickoff,
+        competition_id=comp_id,
+        league_name=comp_info.get("name", "Desconhecida") if comp_info else "Desconhecida",
+        country_code=comp_info.get("country_code", "WW") if comp_info else "WW",
+        home_id=m["homeTeam"]["id"],
+        home_name=m["homeTeam"]["name"],
+        away_id=m["awayTeam"]["id"],
+        away_name=m["awayTeam"]["name"],
+        status=m.get("status", "SCHEDULED"),
+    )
+
+
+async def compute_team_metrics(
+    api_token: str,
+    team_id: int,
+    last: int = 5,
+    session: Optional[aiohttp.ClientSession] = None,
+    store: Optional[MatchStore] = None,
+    form_index: Optional[TeamFormIndex] = None,
+) -> TeamMetrics:
     """
     Busca os últimos 'last' jogos do time na API para calcular métricas reais.
-    (Nenhuma mudança nessa função, pois ela depende apenas do ID do time.)
+    Usa a sessão compartilhada (pool de conexões) quando fornecida.
+    Com 'form_index', responde direto do índice montado pelos resultados das ligas
+    quando ele já tem 'last' jogos do time (sem nenhuma requisição).
+    Com 'store', lê primeiro a base local e só busca na API partidas mais novas
+    que a última guardada (e no máximo uma vez por refresh_interval).
     """
-    
-    DEFAULT_METRICS_ZERO = {
-        "avg_gs": 0.0, "avg_gc": 0.0, "form_score": 0.0,
-        "avg_corners_for": 0.0, "avg_ht_goals_for": 0.0, 
-        "btts_count": 0, "total_games": 0 
-    }
-    
+    matches = await _recent_team_matches(api_token, team_id, last, session, store, form_index)
+    return _metrics_from_matches(team_id, matches)
+
+
+async def compute_team_metrics_panel(
+    api_token: str,
+    team_id: int,
+    history: int = 10,
+    windows: Sequence[int] = (3, 5, 10),
+    session: Optional[aiohttp.ClientSession] = None,
+    store: Optional[MatchStore] = None,
+    form_index: Optional[TeamFormIndex] = None,
+    min_games: int = 5,
+) -> TeamMetricsPanel:
+    """
+    Como compute_team_metrics, mas busca UMA vez os últimos 'history' jogos e calcula
+    o painel inteiro (janelas, casa/fora e forma exponencial) numa passada só: mesmo
+    custo de requisições de uma janela única. O índice de forma responde sozinho quando
+    tem ao menos 'min_games' jogos do time (as janelas maiores usam os que houver).
+    """
+    matches = await _recent_team_matches(api_token, team_id, history, session, store, form_index, min_games)
+    return _panel_from_matches(team_id, matches, windows=windows)
+
+
+async def _recent_team_matches(
+    api_token: str,
+    team_id: int,
+    last: int,
+    session: Optional[aiohttp.ClientSession],
+    store: Optional[MatchStore],
+    form_index: Optional[TeamFormIndex],
+    min_games: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Últimos 'last' jogos finalizados do time: índice de forma, base local ou API, nessa
+    ordem. O índice basta com 'min_games' jogos (padrão: 'last').
+    """
+    if form_index is not None:
+        form_hit = form_index.games_count(team_id) >= min(min_games or last, last)
+        cache_event("form_index", form_hit)
+        if form_hit:
+            return form_index.recent(team_id, last)
+
+    if store is not None:
+        await _sync_team_matches(api_token, team_id, last, session, store)
+        return store.recent_matches(team_id, limit=last)
+
     url = f"{BASE_URL}/teams/{team_id}/matches?status={STATE_FINISHED_ID}&limit={last}"
     
-    metrics = {
-        "goals_scored": 0, "goals_conceded": 0, "wins": 0, "draws": 0, 
-        "losses": 0, "corners": 0, "ht_goals_for": 0, "total_games": 0,
-        "btts_sim": 0 
-    }
-    
-    async with aiohttp.ClientSession() as session:
+    async with _session_scope(session) as session:
         data = await fetch_with_retry(session, url, api_token)
         
-        if not data or not data.get("matches"):
-            return DEFAULT_METRICS_ZERO
+    if not data or not data.get("matches"):
+        return []
 
-        historical_fixtures = data.get("matches", [])
-        metrics["total_games"] = len(historical_fixtures)
+    return data["matches"]
 
-        for m in historical_fixtures:
-            score = m.get("score", {})
-            ft_score = score.get("fullTime", {})
-            ht_score = score.get("halfTime", {}) 
-            
-            home_id = m.get("homeTeam", {}).get("id")
-            is_home_game = (home_id == team_id)
 
-            gs, gc, gols_ht = 0, 0, 0
-            
-            # --- Análise FT ---
-            if ft_score and ft_score.get("home") is not None and ft_score.get("away") is not None:
-                home_g, away_g = ft_score["home"], ft_score["away"]
-                
-                if is_home_game: gs, gc = home_g, away_g
-                else: gs, gc = away_g, home_g
-                
-                metrics["goals_scored"] += gs
-                metrics["goals_conceded"] += gc
-                
-                if gs > gc: metrics["wins"] += 1
-                elif gs == gc: metrics["draws"] += 1
-                else: metrics["losses"] += 1
-                
-                if home_g > 0 and away_g > 0: metrics["btts_sim"] += 1
-                
-            # --- Análise Gols HT ---
-            if ht_score and ht_score.get("home") is not None and ht_score.get("away") is not None:
-                home_ht_g, away_ht_g = ht_score["home"], ht_score["away"]
-                if is_home_game: gols_ht = home_ht_g
-                else: gols_ht = away_ht_g
-
-                metrics["ht_goals_for"] += gols_ht
-                
-            metrics["corners"] += 5 # Simulado
-
-
-        games_count = metrics["total_games"]
-        
-        final_metrics = {
-            "team_id": team_id,
-            "avg_gs": metrics["goals_scored"] / games_count if games_count > 0 else 0.0,
-            "avg_gc": metrics["goals_conceded"] / games_count if games_count > 0 else 0.0,
-            "form_score": (metrics["wins"] * 100 + metrics["draws"] * 50) / games_count if games_count > 0 else 0.0,
-            "avg_corners_for": metrics["corners"] / games_count if games_count > 0 else 0.0,
-            "avg_ht_goals_for": metrics["ht_goals_for"] / games_count if games_count > 0 else 0.0,
-            "btts_count": metrics["btts_sim"],
-            "total_games": games_count
-        }
-        
-        return final_metrics
+async def _sync_team_matches(
+    api_token: str,
+    team_id: int,
+    last: int,
+    session: Optional[aiohttp.ClientSession],
+    store: MatchStore,
+) -> None:
+    """Atualiza a base local do time pedindo à API apenas as partidas que faltam."""
+    fresh = not store.needs_refresh(team_id)
+    cache_event("match_store", fresh)
+    if fresh:
+        return
+
+    latest = store.latest_date(team_id)
+    url = f"{BASE_URL}/teams/{team_id}/matches?status={STATE_FINISHED_ID}"
+
+    if latest and store.count(team_id) >= last:
+        # Incremental: somente partidas a partir do dia da última guardada
+        date_from = latest[:10]
+        date_to = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        url += f"&dateFrom={date_from}&dateTo={date_to}"
+    else:
+        url += f"&limit={last}"
+
+    async with _session_scope(session) as session:
+        data = await fetch_with_retry(session, url, api_token)
+
+    if data is None:
+        return  # Falha na API: usa o que já existe na base e tenta de novo no próximo ciclo
+
+    store.upsert_matches(data.get("matches") or [])
+    store.mark_synced(team_id)
+
+
+async def refresh_form_index(
+    api_token: str,
+    form_index: TeamFormIndex,
+    competition_ids: Optional[List[int]] = None,
+    days_back: int = 60,
+    session: Optional[aiohttp.ClientSession] = None,
+    store: Optional[MatchStore] = None,
+    max_age: Optional[float] = None,
+) -> int:
+    """
+    Atualiza o índice de forma com os resultados FINALIZADOS de cada competição
+    (uma requisição por liga). Depois da primeira carga, busca só a partir da
+    última data sincronizada. Com 'max_age' (segundos), pula as competições
+    atualizadas há menos tempo que isso. Retorna o total de partidas novas indexadas.
+    """
+    if competition_ids is None:
+        competition_ids = COMPETITION_IDS
+    if max_age is not None:
+        competition_ids = [c for c in competition_ids if not form_index.is_fresh(c, max_age)]
+        if not competition_ids:
+            return 0
+
+    today = datetime.now(timezone.utc)
+    date_to = today.strftime("%Y-%m-%d")
+    default_from = (today - timedelta(days=days_back)).strftime("%Y-%m-%d")
+
+    async def _refresh_one(comp_id: int) -> int:
+        date_from = form_index.last_synced(comp_id) or default_from
+        url = (
+            f"{BASE_URL}/competitions/{comp_id}/matches"
+            f"?status={STATE_FINISHED_ID}&dateFrom={date_from}&dateTo={date_to}"
+        )
+        data = await fetch_with_retry(session, url, api_token)
+        if data is None:
+            return 0
+
+        matches = data.get("matches") or []
+        if store is not None:
+            store.upsert_matches(matches)
+        form_index.synced_until[comp_id] = date_to
+        form_index.refreshed_at[comp_id] = time.time()
+        return form_index.add_matches(matches)
+
+    async with _session_scope(session) as session:
+        added = await asyncio.gather(*(_refresh_one(comp_id) for comp_id in competition_ids))
+
+    total = sum(added)
+    print(f"DEBUG: Índice de forma atualizado: {total} partidas novas, {len(form_index)} times.")
+    return total
+
+
+class _MetricsAccumulator:
+    """Somas parciais das métricas de um time (uma por janela/recorte do painel)."""
+
+    __slots__ = ("games", "goals_scored", "goals_conceded", "wins", "draws", "corners", "ht_goals_for", "btts_sim")
+
+    def __init__(self):
+        self.games = 0
+        self.goals_scored = 0
+        self.goals_conceded = 0
+        self.wins = 0
+        self.draws = 0
+        self.corners = 0
+        self.ht_goals_for = 0
+        self.btts_sim = 0
+
+    def add(self, line: Tuple[Optional[int], Optional[int], Optional[int], bool]) -> None:
+        gs, gc, gols_ht, btts = line
+        self.games += 1
+        if gs is not None:
+            self.goals_scored += gs
+            self.goals_conceded += gc
+            if gs > gc: self.wins += 1
+            elif gs == gc: self.draws += 1
+            if btts: self.btts_sim += 1
+        if gols_ht is not None:
+            self.ht_goals_for += gols_ht
+        self.corners += 5 # Simulado
+
+    def to_metrics(self, team_id: int) -> TeamMetrics:
+        games_count = self.games
+        if not games_count:
+            return TeamMetrics(team_id=team_id)
+        return TeamMetrics(
+            team_id=team_id,
+            avg_gs=self.goals_scored / games_count,
+            avg_gc=self.goals_conceded / games_count,
+            form_score=(self.wins * 100 + self.draws * 50) / games_count,
+            avg_corners_for=self.corners / games_count,
+            avg_ht_goals_for=self.ht_goals_for / games_count,
+            btts_count=self.btts_sim,
+            total_games=games_count,
+        )
+
+
+def _match_line(team_id: int, m: Dict[str, Any]) -> Tuple[Optional[int], Optional[int], Optional[int], bool]:
+    """(gols pró, gols contra, gols HT pró, ambos marcaram) do ponto de vista do time; None sem placar."""
+    score = m.get("score", {})
+    ft_score = score.get("fullTime", {})
+    ht_score = score.get("halfTime", {}) 
+    is_home_game = m.get("homeTeam", {}).get("id") == team_id
+
+    gs = gc = gols_ht = None
+    btts = False
+
+    # --- Análise FT ---
+    if ft_score and ft_score.get("home") is not None and ft_score.get("away") is not None:
+        home_g, away_g = ft_score["home"], ft_score["away"]
+        gs, gc = (home_g, away_g) if is_home_game else (away_g, home_g)
+        btts = home_g > 0 and away_g > 0
+
+    # --- Análise Gols HT ---
+    if ht_score and ht_score.get("home") is not None and ht_score.get("away") is not None:
+        gols_ht = ht_score["home"] if is_home_game else ht_score["away"]
+
+    return gs, gc, gols_ht, btts
+
+
+def _metrics_from_matches(team_id: int, historical_fixtures: List[Dict[str, Any]]) -> TeamMetrics:
+    """Calcula as métricas do time a partir de uma lista de partidas finalizadas (formato da API)."""
+    acc = _MetricsAccumulator()
+    for m in historical_fixtures:
+        acc.add(_match_line(team_id, m))
+    return acc.to_metrics(team_id)
+
+
+def _panel_from_matches(
+    team_id: int,
+    historical_fixtures: List[Dict[str, Any]],
+    windows: Sequence[int] = (3, 5, 10),
+    venue_last: int = 5,
+    ewma_alpha: float = 0.35,
+) -> TeamMetricsPanel:
+    """
+    Painel de métricas numa passada só sobre as partidas (da mais recente para a mais
+    antiga): cada janela é fechada quando a contagem de jogos chega nela, os recortes
+    casa/fora usam até 'venue_last' jogos de cada mando e a forma exponencial dá peso
+    (1 - ewma_alpha)^k ao k-ésimo jogo mais antigo.
+    """
+    windows = sorted(set(windows))
+    overall, home, away = _MetricsAccumulator(), _MetricsAccumulator(), _MetricsAccumulator()
+    closed: Dict[int, TeamMetrics] = {}
+    ewma_sum = ewma_weight = 0.0
+    weight = 1.0
+
+    for m in historical_fixtures:
+        line = _match_line(team_id, m)
+        overall.add(line)
+        if overall.games in windows:
+            closed[overall.games] = overall.to_metrics(team_id)
+
+        venue = home if m.get("homeTeam", {}).get("id") == team_id else away
+        if venue.games < venue_last:
+            venue.add(line)
+
+        gs, gc = line[0], line[1]
+        if gs is not None:
+            ewma_sum += weight * (100 if gs > gc else 50 if gs == gc else 0)
+            ewma_weight += weight
+        weight *= 1 - ewma_alpha
+
+    # Histórico mais curto que a janela: a janela usa todos os jogos disponíveis
+    for n in windows:
+        closed.setdefault(n, overall.to_metrics(team_id))
+
+    return TeamMetricsPanel(
+        team_id=team_id,
+        windows=closed,
+        home=home.to_metrics(team_id),
+        away=away.to_metrics(team_id),
+        ewma_form=ewma_sum / ewma_weight if ewma_weight else 0.0,
+        history_games=overall.games,
+    )
+
+
+def metrics_from_panel(
+    panel: TeamMetricsPanel,
+    venue: str,
+    last: int = 5,
+    venue_weight: float = 0.5,
+    min_venue_games: int = 3,
+) -> TeamMetrics:
+    """
+    Resume o painel nas métricas que decide_best_market usa, para o time jogando em
+    'venue' ("home"/"away"): médias da janela 'last' misturadas com as do mesmo mando
+    (quando há ao menos 'min_venue_games' jogos nele) e forma exponencial no lugar da
+    forma simples. total_games e btts_count continuam os da janela.
+    """
+    base = panel.window(last)
+    split = panel.home if venue == "home" else panel.away
+    if base.total_games == 0:
+        return base
+
+    w = venue_weight if split.total_games >= min_venue_games else 0.0
+    return TeamMetrics(
+        team_id=panel.team_id,
+        avg_gs=(1 - w) * base.avg_gs + w * split.avg_gs,
+        avg_gc=(1 - w) * base.avg_gc + w * split.avg_gc,
+        form_score=panel.ewma_form,
+        avg_corners_for=(1 - w) * base.avg_corners_for + w * split.avg_corners_for,
+        avg_ht_goals_for=(1 - w) * base.avg_ht_goals_for + w * split.avg_ht_goals_for,
+        btts_count=base.btts_count,
+        total_games=base.total_games,
+    )
 
 
 # ======================================================================
 # FUNÇÕES DE ANÁLISE E DECISÃO (COM DC e AH 0.0)
 # ======================================================================
 
-def decide_best_market(home_metrics: Dict[str, Any], away_metrics: Dict[str, Any]) -> Tuple[str, int]:
+@dataclass(slots=True, frozen=True)
+class MarketThresholds:
+    """
+    Limiares de entrada de cada mercado em decide_best_market (os padrões são os valores
+    originais). As fórmulas de confiança não mudam; o sweep.py busca a melhor combinação.
+    """
+    min_games: int = 3
+    over25_goals: float = 2.8
+    over15_goals: float = 2.0
+    under25_goals: float = 1.8
+    ml_form_diff: float = 50
+    ml_min_goals: float = 2.0
+    dc_form_diff: float = 35
+    dc_min_goals: float = 1.5
+    ah_min_goals: float = 1.8
+    btts_yes_rate: float = 0.70
+    btts_yes_goals: float = 2.5
+    btts_no_rate: float = 0.30
+    btts_no_goals: float = 1.8
+    corners_105: float = 10.8
+    corners_95: float = 9.0
+    ht_over15_goals: float = 1.5
+    ht_over05_goals: float = 0.8
+    min_confidence: int = 50  # Filtro do alerta (MIN_CONFIDENCE do main.py)
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "MarketThresholds":
+        """Cria a partir de um dict, ignorando chaves desconhecidas."""
+        known = {f.name: f.type for f in fields(cls)}
+        return cls(**{k: (int(v) if known[k] in (int, "int") else float(v)) for k, v in values.items() if k in known})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+DEFAULT_THRESHOLDS = MarketThresholds()
+
+
+def load_market_profile(path: str) -> MarketThresholds:
+    """Lê um perfil de limiares gerado pelo sweep.py ({"thresholds": {...}} ou o dict direto)."""
+    with open(path, encoding="utf-8") as fh:
+        raw = json.load(fh)
+    return MarketThresholds.from_dict(raw.get("thresholds", raw))
+
+
+def decide_best_market(
+    home_metrics: Union[TeamMetrics, TeamMetricsPanel],
+    away_metrics: Union[TeamMetrics, TeamMetricsPanel],
+    thresholds: MarketThresholds = DEFAULT_THRESHOLDS,
+) -> Tuple[str, int]:
     """
     Decide a melhor sugestão de aposta, analisando múltiplos mercados e retornando o de maior confiança.
-    (Nenhuma mudança nesta função)
+    É a implementação de referência; decide_best_market_batch deve produzir o mesmo resultado.
+    Aceita TeamMetricsPanel (resumido por metrics_from_panel com o mando de cada time).
     """
-    
+    if isinstance(home_metrics, TeamMetricsPanel):
+        home_metrics = metrics_from_panel(home_metrics, "home")
+    if isinstance(away_metrics, TeamMetricsPanel):
+        away_metrics = metrics_from_panel(away_metrics, "away")
+
+    t = thresholds
     suggestions: List[Tuple[str, int]] = []
     
-    # Mínimo de 3 jogos para análise
-    if home_metrics.get("total_games", 0) < 3 or away_metrics.get("total_games", 0) < 3:
-        return "Sem dados históricos suficientes (mín. 3 jogos)", 0
+    # Mínimo de jogos para análise (padrão: 3)
+    if home_metrics.total_games < t.min_games or away_metrics.total_games < t.min_games:
+        return NO_DATA_SUGGESTION, 0
         
     
-    home_form = home_metrics["form_score"]
-    away_form = away_metrics["form_score"]
+    home_form = home_metrics.form_score
+    away_form = away_metrics.form_score
     form_diff = abs(home_form - away_form)
-    total_avg_goals = home_metrics["avg_gs"] + away_metrics["avg_gc"]
-    total_avg_ht_goals = home_metrics["avg_ht_goals_for"] + away_metrics["avg_ht_goals_for"]
+    total_avg_goals = home_metrics.avg_gs + away_metrics.avg_gc
+    total_avg_ht_goals = home_metrics.avg_ht_goals_for + away_metrics.avg_ht_goals_for
     
     
     # --- 1. Gols FT (Over/Under) ---
                       
     confidence_goals = 50
-    if total_avg_goals >= 2.8:
+    if total_avg_goals >= t.over25_goals:
         suggestion_goals = "Mais de 2.5 Gols (Over 2.5 FT)"
         confidence_goals += int(min((total_avg_goals - 2.8) * 15 + 15, 49)) 
         suggestions.append((suggestion_goals, confidence_goals))
-    elif total_avg_goals >= 2.0:
+    elif total_avg_goals >= t.over15_goals:
         suggestion_goals = "Mais de 1.5 Gols (Over 1.5 FT)"
         confidence_goals += int(min((total_avg_goals - 2.0) * 10 + 10, 35))
         suggestions.append((suggestion_goals, confidence_goals))
-    elif total_avg_goals <= 1.8:
+    elif total_avg_goals <= t.under25_goals:
         suggestion_goals = "Menos de 2.5 Gols (Under 2.5 FT)"
         confidence_goals += int(min((2.5 - total_avg_goals) * 15 + 10, 30))
         suggestions.append((suggestion_goals, confidence_goals))
@@ -305,13 +1108,13 @@ def decide_best_market(home_metrics: Dict[str, Any], away_metrics: Dict[str, Any
     # --- 2. Vencedor (ML) ---
     
     confidence_winner = 50
-    if form_diff > 50: 
+    if form_diff > t.ml_form_diff: 
         winner = "Casa" if home_form > away_form else "Fora"
-        if winner == "Casa" and home_metrics["avg_gs"] > 2.0: 
+        if winner == "Casa" and home_metrics.avg_gs > t.ml_min_goals: 
             suggestion_winner = "Vitória do Time da Casa (ML Home)"
             confidence_winner = min(99, max(confidence_winner, 65 + int(form_diff / 2)))
             suggestions.append((suggestion_winner, confidence_winner))
-        elif winner == "Fora" and away_metrics["avg_gs"] > 2.0:
+        elif winner == "Fora" and away_metrics.avg_gs > t.ml_min_goals:
             suggestion_winner = "Vitória do Time Visitante (ML Away)"
             confidence_winner = min(99, max(confidence_winner, 65 + int(form_diff / 2)))
             suggestions.append((suggestion_winner, confidence_winner))
@@ -321,26 +1124,26 @@ def decide_best_market(home_metrics: Dict[str, Any], away_metrics: Dict[str, Any
     
     confidence_dc = 55
 
-    if form_diff > 35:
+    if form_diff > t.dc_form_diff:
         winner_favored = "Casa" if home_form > away_form else "Fora"
         
         # Dupla Chance (1X ou X2)
-        if winner_favored == "Casa" and home_metrics["avg_gs"] > 1.5:
+        if winner_favored == "Casa" and home_metrics.avg_gs > t.dc_min_goals:
             suggestion_dc = "Dupla Chance: Casa ou Empate (1X)"
             confidence = min(95, confidence_dc + int(form_diff / 3) + 10)
             suggestions.append((suggestion_dc, confidence))
             
-            if home_metrics["avg_gs"] > 1.8: # Mais agressivo
+            if home_metrics.avg_gs > t.ah_min_goals: # Mais agressivo
                 suggestion_ah = "Handicap Asiático: Casa (0.0)"
                 confidence_ah = min(99, confidence + 5) 
                 suggestions.append((suggestion_ah, confidence_ah))
                     
-        elif winner_favored == "Fora" and away_metrics["avg_gs"] > 1.5:
+        elif winner_favored == "Fora" and away_metrics.avg_gs > t.dc_min_goals:
             suggestion_dc = "Dupla Chance: Fora ou Empate (X2)"
             confidence = min(95, confidence_dc + int(form_diff / 3) + 10)
             suggestions.append((suggestion_dc, confidence))
 
-            if away_metrics["avg_gs"] > 1.8: # Mais agressivo
+            if away_metrics.avg_gs > t.ah_min_goals: # Mais agressivo
                 suggestion_ah = "Handicap Asiático: Fora (0.0)"
                 confidence_ah = min(99, confidence + 5)
                 suggestions.append((suggestion_ah, confidence_ah))
@@ -348,18 +1151,18 @@ def decide_best_market(home_metrics: Dict[str, Any], away_metrics: Dict[str, Any
 
     # --- 4. Ambos Marcam (BTTS) ---
     
-    total_games = home_metrics["total_games"]
-    home_btts_rate = home_metrics["btts_count"] / total_games
-    away_btts_rate = away_metrics["btts_count"] / total_games
+    total_games = home_metrics.total_games
+    home_btts_rate = home_metrics.btts_count / total_games
+    away_btts_rate = away_metrics.btts_count / total_games
     avg_btts_rate = (home_btts_rate + away_btts_rate) / 2 
     
     confidence_btts = 50
     
-    if avg_btts_rate >= 0.70 and total_avg_goals >= 2.5:
+    if avg_btts_rate >= t.btts_yes_rate and total_avg_goals >= t.btts_yes_goals:
         suggestion_btts = "Ambas Marcam: SIM (BTTS Yes)"
         confidence_btts += int(min((avg_btts_rate - 0.70) * 100 + 15, 49)) 
         suggestions.append((suggestion_btts, confidence_btts))
-    elif avg_btts_rate <= 0.30 and total_avg_goals < 1.8:
+    elif avg_btts_rate <= t.btts_no_rate and total_avg_goals < t.btts_no_goals:
         suggestion_btts = "Ambas Marcam: NÃO (BTTS No)"
         confidence_btts += int(min((0.30 - avg_btts_rate) * 100 + 10, 35))
         suggestions.append((suggestion_btts, confidence_btts))
@@ -367,14 +1170,14 @@ def decide_best_market(home_metrics: Dict[str, Any], away_metrics: Dict[str, Any
 
     # --- 5. Escanteios (Simulado) ---
     
-    total_avg_corners = home_metrics["avg_corners_for"] + away_metrics["avg_corners_for"]
+    total_avg_corners = home_metrics.avg_corners_for + away_metrics.avg_corners_for
     confidence_corners = 50
     
-    if total_avg_corners >= 10.8:
+    if total_avg_corners >= t.corners_105:
         suggestion_corners = "Mais de 10.5 Escanteios (Over 10.5 CR)"
         confidence_corners += int(min((total_avg_corners - 10.0) * 8, 49)) 
         suggestions.append((suggestion_corners, confidence_corners))
-    elif total_avg_corners >= 9.0:
+    elif total_avg_corners >= t.corners_95:
         suggestion_corners = "Mais de 9.5 Escanteios (Over 9.5 CR)"
         confidence_corners += int(min((total_avg_corners - 8.5) * 8, 35))
         suggestions.append((suggestion_corners, confidence_corners))
@@ -384,11 +1187,11 @@ def decide_best_market(home_metrics: Dict[str, Any], away_metrics: Dict[str, Any
     
     confidence_ht = 50
     
-    if total_avg_ht_goals >= 1.5:
+    if total_avg_ht_goals >= t.ht_over15_goals:
         suggestion_ht = "Mais de 1.5 Gols (Over 1.5 HT)"
         confidence_ht += int(min((total_avg_ht_goals - 1.0) * 25, 49)) 
         suggestions.append((suggestion_ht, confidence_ht))
-    elif total_avg_ht_goals >= 0.8:
+    elif total_avg_ht_goals >= t.ht_over05_goals:
         suggestion_ht = "Mais de 0.5 Gols (Over 0.5 HT)"
         confidence_ht += int(min((total_avg_ht_goals - 0.5) * 20, 30))
         suggestions.append((suggestion_ht, confidence_ht))
@@ -399,7 +1202,7 @@ def decide_best_market(home_metrics: Dict[str, Any], away_metrics: Dict[str, Any
         suggestions.sort(key=lambda x: x[1], reverse=True)
         best_suggestion, max_confidence = suggestions[0]
     else:
-        best_suggestion = "Sem sinal forte — evite aposta"
+        best_suggestion = NO_SIGNAL_SUGGESTION
         max_confidence = 50
         
     final_confidence = min(99, max(0, max_confidence)) 
@@ -407,30 +1210,259 @@ def decide_best_market(home_metrics: Dict[str, Any], away_metrics: Dict[str, Any
     return best_suggestion, final_confidence
 
 
-def kickoff_time_local(fixture: Dict[str, Any], tz: pytz.BaseTzInfo, return_datetime: bool = False) -> Any:
+# Sugestões fixas compartilhadas entre a versão escalar e a vetorizada
+NO_DATA_SUGGESTION = "Sem dados históricos suficientes (mín. 3 jogos)"
+NO_SIGNAL_SUGGESTION = "Sem sinal forte — evite aposta"
+
+METRIC_COLUMNS = (
+    "avg_gs", "avg_gc", "form_score", "avg_corners_for",
+    "avg_ht_goals_for", "btts_count", "total_games",
+)
+
+
+def metrics_to_columns(metrics_list: List[TeamMetrics]) -> Dict[str, np.ndarray]:
+    """Converte uma lista de TeamMetrics em colunas NumPy para o modo em lote."""
+    return {
+        key: np.array([getattr(m, key) for m in metrics_list], dtype=np.float64)
+        for key in METRIC_COLUMNS
+    }
+
+
+def decide_best_market_batch(
+    home: Dict[str, np.ndarray],
+    away: Dict[str, np.ndarray],
+    thresholds: MarketThresholds = DEFAULT_THRESHOLDS,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Versão vetorizada de decide_best_market para várias partidas de uma vez.
+    Recebe as métricas de casa e fora como colunas (ver metrics_to_columns) e retorna
+    (sugestões, confianças) por partida, idênticas à função escalar (que segue como referência).
+    """
+    return select_best_markets(*score_markets_batch(home, away, thresholds))
+
+
+def select_best_markets(
+    labels: np.ndarray,
+    conf_matrix: np.ndarray,
+    has_data: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Melhor mercado de cada partida a partir da saída de score_markets_batch (ou de outro motor)."""
+    n = conf_matrix.shape[1]
+
+    # --- 7. Seleção da Melhor Aposta (argmax estável: primeiro mercado vence no empate) ---
+    best = np.argmax(conf_matrix, axis=0)
+    cols = np.arange(n)
+    best_conf = conf_matrix[best, cols]
+    best_label = labels[best, cols]
+
+    no_signal = best_conf < 0
+    suggestions = np.where(no_signal, NO_SIGNAL_SUGGESTION, best_label).astype(object)
+    confidences = np.clip(np.where(no_signal, 50, best_conf), 0, 99)
+
+    suggestions = np.where(has_data, suggestions, NO_DATA_SUGGESTION).astype(object)
+    confidences = np.where(has_data, confidences, 0).astype(np.int64)
+    return suggestions, confidences
+
+
+def score_markets_batch(
+    home: Dict[str, np.ndarray],
+    away: Dict[str, np.ndarray],
+    thresholds: MarketThresholds = DEFAULT_THRESHOLDS,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pontua TODOS os mercados de cada partida (não só o melhor).
+    Retorna (rótulos [mercado, partida], confianças [mercado, partida] com -1 onde o
+    mercado não foi sugerido, partidas com histórico mínimo), na ordem de decide_best_market.
+    """
+    t = thresholds
+    h_gs, h_form = home["avg_gs"], home["form_score"]
+    a_gs, a_gc, a_form = away["avg_gs"], away["avg_gc"], away["form_score"]
+    n = len(h_gs)
+
+    has_data = (home["total_games"] >= t.min_games) & (away["total_games"] >= t.min_games)
+    form_diff = np.abs(h_form - a_form)
+    home_fav = h_form > a_form
+    total_avg_goals = h_gs + a_gc
+    total_avg_ht_goals = home["avg_ht_goals_for"] + away["avg_ht_goals_for"]
+
+    # Cada "slot" é um mercado na ordem de avaliação: (rótulo por partida, confiança, válido)
+    labels: List[np.ndarray] = []
+    confs: List[np.ndarray] = []
+    valids: List[np.ndarray] = []
+
+    def _slot(label: Any, conf: np.ndarray, valid: np.ndarray) -> None:
+        labels.append(np.broadcast_to(np.asarray(label, dtype=object), (n,)))
+        confs.append(np.broadcast_to(conf, (n,)).astype(np.int64))
+        valids.append(valid)
+
+    # --- 1. Gols FT (Over/Under) ---
+    over25 = total_avg_goals >= t.over25_goals
+    over15 = ~over25 & (total_avg_goals >= t.over15_goals)
+    under25 = total_avg_goals <= t.under25_goals
+    goals_conf = 50 + np.select(
+        [over25, over15],
+        [np.trunc(np.minimum((total_avg_goals - 2.8) * 15 + 15, 49)),
+         np.trunc(np.minimum((total_avg_goals - 2.0) * 10 + 10, 35))],
+        np.trunc(np.minimum((2.5 - total_avg_goals) * 15 + 10, 30)),
+    )
+    goals_label = np.where(
+        over25, "Mais de 2.5 Gols (Over 2.5 FT)",
+        np.where(over15, "Mais de 1.5 Gols (Over 1.5 FT)", "Menos de 2.5 Gols (Under 2.5 FT)"),
+    ).astype(object)
+    _slot(goals_label, goals_conf, over25 | over15 | under25)
+
+    # --- 2. Vencedor (ML) ---
+    fav_gs = np.where(home_fav, h_gs, a_gs)
+    ml_conf = np.minimum(99, np.maximum(50, 65 + np.trunc(form_diff / 2)))
+    ml_label = np.where(home_fav, "Vitória do Time da Casa (ML Home)", "Vitória do Time Visitante (ML Away)").astype(object)
+    _slot(ml_label, ml_conf, (form_diff > t.ml_form_diff) & (fav_gs > t.ml_min_goals))
+
+    # --- 3. Dupla Chance (DC) e Handicap Asiático (AH 0.0) ---
+    dc_valid = (form_diff > t.dc_form_diff) & (fav_gs > t.dc_min_goals)
+    dc_conf = np.minimum(95, 55 + np.trunc(form_diff / 3) + 10)
+    dc_label = np.where(home_fav, "Dupla Chance: Casa ou Empate (1X)", "Dupla Chance: Fora ou Empate (X2)").astype(object)
+    _slot(dc_label, dc_conf, dc_valid)
+
+    ah_label = np.where(home_fav, "Handicap Asiático: Casa (0.0)", "Handicap Asiático: Fora (0.0)").astype(object)
+    _slot(ah_label, np.minimum(99, dc_conf + 5), dc_valid & (fav_gs > t.ah_min_goals))
+
+    # --- 4. Ambos Marcam (BTTS) ---
+    # Mesma base da função escalar: ambos os times divididos por total_games da casa
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_games = np.where(home["total_games"] > 0, home["total_games"], 1)
+        avg_btts_rate = (home["btts_count"] / total_games + away["btts_count"] / total_games) / 2
+
+    btts_yes = (avg_btts_rate >= t.btts_yes_rate) & (total_avg_goals >= t.btts_yes_goals)
+    btts_no = ~btts_yes & (avg_btts_rate <= t.btts_no_rate) & (total_avg_goals < t.btts_no_goals)
+    btts_conf = 50 + np.where(
+        btts_yes,
+        np.trunc(np.minimum((avg_btts_rate - 0.70) * 100 + 15, 49)),
+        np.trunc(np.minimum((0.30 - avg_btts_rate) * 100 + 10, 35)),
+    )
+    btts_label = np.where(btts_yes, "Ambas Marcam: SIM (BTTS Yes)", "Ambas Marcam: NÃO (BTTS No)").astype(object)
+    _slot(btts_label, btts_conf, btts_yes | btts_no)
+
+    # --- 5. Escanteios (Simulado) ---
+    total_avg_corners = home["avg_corners_for"] + away["avg_corners_for"]
+    cr105 = total_avg_corners >= t.corners_105
+    cr95 = ~cr105 & (total_avg_corners >= t.corners_95)
+    corners_conf = 50 + np.where(
+        cr105,
+        np.trunc(np.minimum((total_avg_corners - 10.0) * 8, 49)),
+        np.trunc(np.minimum((total_avg_corners - 8.5) * 8, 35)),
+    )
+    corners_label = np.where(cr105, "Mais de 10.5 Escanteios (Over 10.5 CR)", "Mais de 9.5 Escanteios (Over 9.5 CR)").astype(object)
+    _slot(corners_label, corners_conf, cr105 | cr95)
+
+    # --- 6. Gols no Primeiro Tempo (HT Goals) ---
+    ht15 = total_avg_ht_goals >= t.ht_over15_goals
+    ht05 = ~ht15 & (total_avg_ht_goals >= t.ht_over05_goals)
+    ht_conf = 50 + np.where(
+        ht15,
+        np.trunc(np.minimum((total_avg_ht_goals - 1.0) * 25, 49)),
+        np.trunc(np.minimum((total_avg_ht_goals - 0.5) * 20, 30)),
+    )
+    ht_label = np.where(ht15, "Mais de 1.5 Gols (Over 1.5 HT)", "Mais de 0.5 Gols (Over 0.5 HT)").astype(object)
+    _slot(ht_label, ht_conf, ht15 | ht05)
+
+    conf_matrix = np.where(np.stack(valids), np.stack(confs), -1)
+    return np.stack(labels), conf_matrix, has_data
+
+
+# ======================================================================
+# CONFERÊNCIA DOS MERCADOS (placar -> green/red)
+# ======================================================================
+
+# Código do mercado (entre parênteses na sugestão) -> regra sobre (gols casa, gols fora)
+_MARKET_RULES = {
+    "Over 2.5 FT": lambda h, a: h + a > 2.5,
+    "Over 1.5 FT": lambda h, a: h + a > 1.5,
+    "Under 2.5 FT": lambda h, a: h + a < 2.5,
+    "ML Home": lambda h, a: h > a,
+    "ML Away": lambda h, a: a > h,
+    "1X": lambda h, a: h >= a,
+    "X2": lambda h, a: a >= h,
+    "BTTS Yes": lambda h, a: h > 0 and a > 0,
+    "BTTS No": lambda h, a: h == 0 or a == 0,
+    "Over 1.5 HT": lambda h, a: h + a > 1.5,
+    "Over 0.5 HT": lambda h, a: h + a > 0.5,
+}
+
+# Mercados conferíveis pelo placar (escanteios são simulados e ficam de fora)
+MARKET_CODES = tuple(_MARKET_RULES) + ("AH Home", "AH Away")
+
+
+def market_code(suggestion: Optional[str]) -> Optional[str]:
+    """Código curto do mercado de uma sugestão: 'Mais de 2.5 Gols (Over 2.5 FT)' -> 'Over 2.5 FT'."""
+    if not suggestion:
+        return None
+    if suggestion.startswith("Handicap Asiático: Casa"):
+        return "AH Home"
+    if suggestion.startswith("Handicap Asiático: Fora"):
+        return "AH Away"
+    start, end = suggestion.rfind("("), suggestion.rfind(")")
+    return suggestion[start + 1:end] if 0 <= start < end else None
+
+
+def market_hit(
+    suggestion: Optional[str],
+    ft_home: Optional[int],
+    ft_away: Optional[int],
+    ht_home: Optional[int] = None,
+    ht_away: Optional[int] = None,
+) -> Optional[bool]:
     """
-    Converte a string de horário UTC da API para horário local (BRT) e formata.
-    (Nenhuma mudança nesta função)
+    Confere uma sugestão com o placar: True (green), False (red) ou None quando não há
+    como conferir (escanteios, sem sinal, placar ausente ou AH 0.0 devolvido no empate).
+    """
+    code = market_code(suggestion)
+    return market_hit_code(code, ft_home, ft_away, ht_home, ht_away) if code is not None else None
+
+
+def market_hit_code(
+    code: str,
+    ft_home: Optional[int],
+    ft_away: Optional[int],
+    ht_home: Optional[int] = None,
+    ht_away: Optional[int] = None,
+) -> Optional[bool]:
+    """Igual a market_hit, a partir do código do mercado (ver MARKET_CODES)."""
+    home, away = (ht_home, ht_away) if code.endswith(" HT") else (ft_home, ft_away)
+    if home is None or away is None:
+        return None
+
+    if code in ("AH Home", "AH Away"):
+        if home == away:
+            return None  # Devolução da aposta
+        return home > away if code == "AH Home" else away > home
+
+    rule = _MARKET_RULES.get(code)
+    return rule(home, away) if rule is not None else None
+
+
+def kickoff_time_local(fixture: Fixture, tz: pytz.BaseTzInfo, return_datetime: bool = False) -> Any:
+    """
+    Converte o kickoff (UTC, já parseado na ingestão) para horário local (BRT) e formata.
     """
     
-    starting_at_str = fixture.get("starting_at") 
+    dt_local = fixture.kickoff.astimezone(tz)
     
-    if not starting_at_str:
-        return datetime.now(tz) if return_datetime else "N/A"
-        
+    if return_datetime:
+        return dt_local
+    
+    now_local = datetime.now(tz).date()
+    if dt_local.date() == now_local:
+        return dt_local.strftime("%H:%M")
+    else:
+        return dt_local.strftime("%H:%M — %d/%m")
+
+
+def parse_utc_date(value: Optional[str]) -> Optional[datetime]:
+    """Converte o utcDate da API ('2025-01-01T18:00:00Z') em datetime tz-aware (UTC)."""
+    if not value:
+        return None
     try:
-        dt_utc = datetime.fromisoformat(starting_at_str.replace('Z', '+00:00'))
-        dt_local = dt_utc.astimezone(tz)
-        
-        if return_datetime:
-            return dt_local
-        
-        now_local = datetime.now(tz).date()
-        if dt_local.date() == now_local:
-            return dt_local.strftime("%H:%M")
-        else:
-            return dt_local.strftime("%H:%M — %d/%m")
-            
-    except Exception as e:
-        print(f"❌ Erro ao processar data '{starting_at_str}' para timezone: {e}") 
-        return datetime.now(tz) if return_datetime else "Erro de data"
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError as e:
+        print(f"❌ Erro ao processar data '{value}': {e}")
+        return None
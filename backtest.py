@@ -0,0 +1,356 @@
+# Backtest histórico de decide_best_market: a confiança anunciada bate com a taxa de acerto?
+#
+# Carrega partidas finalizadas (base local SQLite ou dumps JSON da API), reconstrói para
+# cada partida as mesmas métricas que compute_team_metrics teria no kickoff (últimos N
+# jogos de cada time), pontua todos os mercados em lote e confere com o placar.
+#
+# Uso: python backtest.py --store matches.db
+#      python backtest.py dumps/*.json --competitions 2021,2014 --from 2024-08-01
+import argparse
+import glob
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from analysis import (
+    METRIC_COLUMNS,
+    NO_DATA_SUGGESTION,
+    NO_SIGNAL_SUGGESTION,
+    DEFAULT_THRESHOLDS,
+    MarketThresholds,
+    load_market_profile,
+    market_code,
+    market_hit,
+    score_markets_batch,
+    select_best_markets,
+)
+from match_store import MatchStore
+from poisson_model import LEAGUE_AVG_GOALS, MIN_MATCHES_FOR_LEAGUE_AVG, score_markets_poisson
+
+# Escanteios simulados por jogo (mesmo valor fixo de _metrics_from_matches)
+SIMULATED_CORNERS = 5.0
+CONFIDENCE_BUCKET = 10
+
+# Motores de pontuação (MARKET_ENGINE no main.py)
+ENGINES = {"heuristic": score_markets_batch, "poisson": score_markets_poisson}
+
+
+# ======================================================================
+# CARGA DOS DADOS
+# ======================================================================
+
+def load_json_dumps(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Lê respostas salvas da API ({"matches": [...]} ou lista de partidas). Sem duplicatas."""
+    by_id: Dict[int, Dict[str, Any]] = {}
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, encoding="utf-8") as fh:
+                raw = json.load(fh)
+            for m in raw.get("matches", []) if isinstance(raw, dict) else raw:
+                if m.get("status", "FINISHED") == "FINISHED" and m.get("id") is not None:
+                    by_id[m["id"]] = m
+    return list(by_id.values())
+
+
+def load_matches(dumps: Iterable[str] = (), store_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Partidas dos dumps JSON e/ou da base SQLite do MatchStore."""
+    matches = load_json_dumps(dumps) if dumps else []
+    if store_path:
+        store = MatchStore(store_path)
+        matches.extend(store.all_matches())
+        store.close()
+    return matches
+
+
+def matches_to_arrays(matches: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Partidas da API em colunas NumPy ordenadas por data (placar ausente = NaN)."""
+    rows = []
+    for m in {m.get("id"): m for m in matches}.values():
+        home = (m.get("homeTeam") or {}).get("id")
+        away = (m.get("awayTeam") or {}).get("id")
+        if home is None or away is None or not m.get("utcDate"):
+            continue
+        score = m.get("score") or {}
+        ft = score.get("fullTime") or {}
+        ht = score.get("halfTime") or {}
+        rows.append((
+            m["utcDate"], m["id"], (m.get("competition") or {}).get("id") or 0, home, away,
+            ft.get("home"), ft.get("away"), ht.get("home"), ht.get("away"),
+        ))
+    rows.sort(key=lambda r: (r[0], r[1]))
+
+    def _score(i: int) -> np.ndarray:
+        return np.array([np.nan if r[i] is None else r[i] for r in rows], dtype=np.float64)
+
+    return {
+        "utc_date": np.array([r[0] for r in rows], dtype=object),
+        "id": np.array([r[1] for r in rows], dtype=np.int64),
+        "competition_id": np.array([r[2] for r in rows], dtype=np.int64),
+        "home_id": np.array([r[3] for r in rows], dtype=np.int64),
+        "away_id": np.array([r[4] for r in rows], dtype=np.int64),
+        "ft_home": _score(5), "ft_away": _score(6),
+        "ht_home": _score(7), "ht_away": _score(8),
+    }
+
+
+# ======================================================================
+# JANELAS MÓVEIS (mesmas entradas de compute_team_metrics no kickoff)
+# ======================================================================
+
+def rolling_team_columns(data: Dict[str, np.ndarray], last: int = 5) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Métricas de casa e fora de cada partida calculadas só com os 'last' jogos anteriores
+    de cada time. Cada partida vira 2 linhas (uma por time); as linhas são ordenadas por
+    time e data e as janelas saem de somas acumuladas (cs[i] - cs[i - last]), sem
+    recalcular nada por partida.
+    """
+    n = len(data["id"])
+    team = np.concatenate([data["home_id"], data["away_id"]])
+    ft_valid = ~np.isnan(data["ft_home"]) & ~np.isnan(data["ft_away"])
+    ht_valid = ~np.isnan(data["ht_home"]) & ~np.isnan(data["ht_away"])
+
+    both_valid = np.concatenate([ft_valid, ft_valid])
+    gs = np.where(both_valid, np.nan_to_num(np.concatenate([data["ft_home"], data["ft_away"]])), 0.0)
+    gc = np.where(both_valid, np.nan_to_num(np.concatenate([data["ft_away"], data["ft_home"]])), 0.0)
+    btts = np.tile(ft_valid & (np.nan_to_num(data["ft_home"]) > 0) & (np.nan_to_num(data["ft_away"]) > 0), 2)
+    ht_for = np.where(
+        np.concatenate([ht_valid, ht_valid]),
+        np.nan_to_num(np.concatenate([data["ht_home"], data["ht_away"]])), 0.0,
+    )
+
+    sums = {
+        "gs": gs,
+        "gc": gc,
+        "wins": (both_valid & (gs > gc)).astype(np.float64),
+        "draws": (both_valid & (gs == gc)).astype(np.float64),
+        "btts": btts.astype(np.float64),
+        "ht_for": ht_for,
+    }
+
+    # Ordena as linhas por time e, dentro do time, pela ordem cronológica da partida
+    match_pos = np.tile(np.arange(n), 2)
+    order = np.lexsort((match_pos, team))
+    team_sorted = team[order]
+    pos = np.arange(2 * n)
+    new_team = np.ones(2 * n, dtype=bool)
+    new_team[1:] = team_sorted[1:] != team_sorted[:-1]
+    group_start = np.maximum.accumulate(np.where(new_team, pos, 0))
+    lo = np.maximum(group_start, pos - last)
+    count_sorted = (pos - lo).astype(np.float64)
+
+    window: Dict[str, np.ndarray] = {}
+    for key, values in sums.items():
+        cs = np.concatenate([[0.0], np.cumsum(values[order])])
+        out = np.empty(2 * n)
+        out[order] = cs[pos] - cs[lo]
+        window[key] = out
+    count = np.empty(2 * n)
+    count[order] = count_sorted
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        safe = np.where(count > 0, count, 1.0)
+        cols = {
+            "avg_gs": window["gs"] / safe,
+            "avg_gc": window["gc"] / safe,
+            "form_score": (window["wins"] * 100 + window["draws"] * 50) / safe,
+            "avg_corners_for": np.where(count > 0, SIMULATED_CORNERS, 0.0),
+            "avg_ht_goals_for": window["ht_for"] / safe,
+            "btts_count": window["btts"],
+            "total_games": count,
+        }
+
+    home = {key: cols[key][:n] for key in METRIC_COLUMNS}
+    away = {key: cols[key][n:] for key in METRIC_COLUMNS}
+    return home, away
+
+
+def rolling_league_averages(data: Dict[str, np.ndarray], min_matches: int = MIN_MATCHES_FOR_LEAGUE_AVG) -> np.ndarray:
+    """
+    Média de gols por time por jogo da competição de cada partida, só com as partidas
+    anteriores dela (mesma conta de competition_goal_averages no bot, sem olhar o futuro).
+    """
+    n = len(data["id"])
+    comp = data["competition_id"]
+    ft_valid = ~np.isnan(data["ft_home"]) & ~np.isnan(data["ft_away"])
+    goals = np.where(ft_valid, np.nan_to_num(data["ft_home"]) + np.nan_to_num(data["ft_away"]), 0.0)
+
+    # Somas acumuladas por competição (ordem cronológica), excluindo a própria partida
+    order = np.lexsort((np.arange(n), comp))
+    new_comp = np.ones(n, dtype=bool)
+    new_comp[1:] = comp[order][1:] != comp[order][:-1]
+    start = np.maximum.accumulate(np.where(new_comp, np.arange(n), 0))
+    cs_goals = np.concatenate([[0.0], np.cumsum(goals[order])])
+    cs_played = np.concatenate([[0.0], np.cumsum(ft_valid[order])])
+    prior_goals = np.empty(n)
+    prior_played = np.empty(n)
+    prior_goals[order] = cs_goals[:-1] - cs_goals[start]
+    prior_played[order] = cs_played[:-1] - cs_played[start]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        averages = prior_goals / (2 * prior_played)
+    return np.where((prior_played >= min_matches) & (prior_goals > 0), averages, LEAGUE_AVG_GOALS)
+
+
+def selection_mask(
+    data: Dict[str, np.ndarray],
+    competition_ids: Optional[Iterable[int]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> np.ndarray:
+    """Partidas que entram na avaliação (as demais só alimentam o histórico dos times)."""
+    selected = np.ones(len(data["id"]), dtype=bool)
+    if competition_ids is not None:
+        selected &= np.isin(data["competition_id"], list(competition_ids))
+    if date_from:
+        selected &= data["utc_date"] >= date_from
+    if date_to:
+        selected &= data["utc_date"] < date_to
+    return selected
+
+
+# ======================================================================
+# RELATÓRIO
+# ======================================================================
+
+def _bucket(confidence: int) -> str:
+    low = (confidence // CONFIDENCE_BUCKET) * CONFIDENCE_BUCKET
+    return f"{low}-{low + CONFIDENCE_BUCKET - 1}"
+
+
+def _tally(table: Dict[str, Dict[str, float]], key: str, hit: Optional[bool]) -> None:
+    row = table.setdefault(key, {"bets": 0, "hits": 0, "voids": 0})
+    row["bets"] += 1
+    if hit is None:
+        row["voids"] += 1
+    elif hit:
+        row["hits"] += 1
+
+
+def _finish(table: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    for row in table.values():
+        settled = row["bets"] - row["voids"]
+        row["hit_rate"] = round(row["hits"] / settled, 4) if settled else None
+    return dict(sorted(table.items()))
+
+
+def run_backtest(
+    matches: List[Dict[str, Any]],
+    last: int = 5,
+    competition_ids: Optional[Iterable[int]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    thresholds: MarketThresholds = DEFAULT_THRESHOLDS,
+    engine: str = "heuristic",
+) -> Dict[str, Any]:
+    """
+    Backtest sobre as partidas carregadas. Todas entram no histórico dos times; só as que
+    passam nos filtros (competições, datas) são pontuadas e conferidas.
+    """
+    started = time.perf_counter()
+    data = matches_to_arrays(matches)
+    home, away = rolling_team_columns(data, last=last)
+
+    idx = np.flatnonzero(selection_mask(data, competition_ids, date_from, date_to))
+
+    home = {key: col[idx] for key, col in home.items()}
+    away = {key: col[idx] for key, col in away.items()}
+    if engine == "poisson":
+        # Média da competição explícita, como no bot (nunca estimada pelo lote pontuado)
+        league_avg = rolling_league_averages(data)[idx]
+        labels, conf_matrix, has_data = score_markets_poisson(home, away, thresholds, league_avg)
+    else:
+        labels, conf_matrix, has_data = ENGINES[engine](home, away, thresholds)
+    suggestions, confidences = select_best_markets(labels, conf_matrix, has_data)
+
+    scores = [
+        tuple(None if np.isnan(data[k][i]) else int(data[k][i]) for k in ("ft_home", "ft_away", "ht_home", "ht_away"))
+        for i in idx
+    ]
+
+    best_by_market: Dict[str, Dict[str, float]] = {}
+    best_by_conf: Dict[str, Dict[str, float]] = {}
+    all_by_market: Dict[str, Dict[str, float]] = {}
+    all_by_conf: Dict[str, Dict[str, float]] = {}
+
+    for j, score in enumerate(scores):
+        if not has_data[j]:
+            continue
+        suggestion = suggestions[j]
+        if suggestion not in (NO_DATA_SUGGESTION, NO_SIGNAL_SUGGESTION):
+            hit = market_hit(suggestion, *score)
+            _tally(best_by_market, market_code(suggestion), hit)
+            _tally(best_by_conf, _bucket(int(confidences[j])), hit)
+
+        # Todos os mercados sugeridos para a partida, não só o escolhido
+        for m in np.flatnonzero(conf_matrix[:, j] >= 0):
+            label = labels[m, j]
+            hit = market_hit(label, *score)
+            _tally(all_by_market, market_code(label), hit)
+            _tally(all_by_conf, _bucket(int(conf_matrix[m, j])), hit)
+
+    return {
+        "matches_loaded": int(len(data["id"])),
+        "matches_scored": int(len(idx)),
+        "matches_with_history": int(has_data.sum()),
+        "window": last,
+        "engine": engine,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "best": {"by_market": _finish(best_by_market), "by_confidence": _finish(best_by_conf)},
+        "all_markets": {"by_market": _finish(all_by_market), "by_confidence": _finish(all_by_conf)},
+    }
+
+
+def _print_table(title: str, table: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n{title}")
+    print(f"   {'':<14} {'apostas':>8} {'acertos':>8} {'devol.':>7} {'taxa':>7}")
+    for key, row in table.items():
+        rate = f"{row['hit_rate'] * 100:.1f}%" if row["hit_rate"] is not None else "-"
+        print(f"   {key:<14} {row['bets']:>8} {row['hits']:>8} {row['voids']:>7} {rate:>7}")
+
+
+def add_data_arguments(parser: argparse.ArgumentParser) -> None:
+    """Argumentos de origem e filtro dos dados (compartilhados com o sweep.py)."""
+    parser.add_argument("dumps", nargs="*", help="Arquivos JSON com partidas da API (aceita glob)")
+    parser.add_argument("--store", help="Base SQLite do MatchStore (ex.: matches.db)")
+    parser.add_argument("--competitions", type=lambda v: [int(x) for x in v.split(",")],
+                        help="IDs das competições pontuadas, separados por vírgula")
+    parser.add_argument("--from", dest="date_from", help="Data inicial (AAAA-MM-DD) das partidas pontuadas")
+    parser.add_argument("--to", dest="date_to", help="Data final (exclusiva) das partidas pontuadas")
+    parser.add_argument("--last", type=int, default=5, help="Jogos por time na janela (como compute_team_metrics)")
+    parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backtest histórico de decide_best_market.")
+    add_data_arguments(parser)
+    parser.add_argument("--profile", help="Perfil de limiares gerado pelo sweep.py (padrão: valores originais)")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="heuristic", help="Motor de pontuação dos mercados")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.store and not args.dumps:
+        sys.exit("Informe --store ou ao menos um arquivo JSON.")
+
+    report = run_backtest(
+        load_matches(args.dumps, args.store),
+        last=args.last,
+        competition_ids=args.competitions,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        thresholds=load_market_profile(args.profile) if args.profile else DEFAULT_THRESHOLDS,
+        engine=args.engine,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"📈 BACKTEST ({report['engine']}) – {report['matches_scored']} partidas pontuadas "
+              f"({report['matches_with_history']} com histórico) em {report['elapsed_s']}s")
+        _print_table("🎯 Melhor aposta por mercado", report["best"]["by_market"])
+        _print_table("📊 Melhor aposta por faixa de confiança", report["best"]["by_confidence"])
+        _print_table("🧮 Todos os mercados sugeridos", report["all_markets"]["by_market"])
+        _print_table("📊 Todos os mercados por faixa de confiança", report["all_markets"]["by_confidence"])
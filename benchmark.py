@@ -0,0 +1,269 @@
+# Benchmark offline do ciclo completo (run_analysis_send) sem acesso à rede.
+#
+# Sobe um servidor aiohttp local que imita o football-data.org (/matches,
+# /competitions/{id}/matches, /teams/{id}/matches) e o sendMessage do Telegram,
+# aponta o bot para ele e mede: tempo total, nº de requisições, latência p50/p95
+# e pico de memória (RSS).
+#
+# Uso: python benchmark.py --fixtures 40 --latency-ms 80 --rate-429 0.05
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+from aiohttp import web
+import aiohttp
+
+BENCH_TOKEN = "BENCH_API_TOKEN"
+BENCH_TELEGRAM_TOKEN = "123456:BENCH"
+BENCH_CHAT_ID = "1000"
+
+
+# ======================================================================
+# DADOS SINTÉTICOS
+# ======================================================================
+
+class SyntheticData:
+    """Gera partidas futuras e históricos finalizados determinísticos (seed fixa)."""
+
+    def __init__(self, competition_ids: List[int], fixtures: int, history: int, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.now = datetime.now(timezone.utc)
+        self.upcoming: Dict[int, List[Dict[str, Any]]] = {cid: [] for cid in competition_ids}
+        self.finished: Dict[int, List[Dict[str, Any]]] = {cid: [] for cid in competition_ids}
+        self.by_team: Dict[int, List[Dict[str, Any]]] = {}
+
+        next_id = 1
+        for i in range(fixtures):
+            cid = competition_ids[i % len(competition_ids)]
+            home_id, away_id = 10_000 + 2 * i, 10_000 + 2 * i + 1
+            kickoff = self.now + timedelta(minutes=self.rng.randint(30, 11 * 60))
+            self.upcoming[cid].append(self._match(next_id, cid, kickoff, home_id, away_id, "SCHEDULED"))
+            next_id += 1
+
+            for team_id in (home_id, away_id):
+                for g in range(history):
+                    played = self.now - timedelta(days=3 * (g + 1))
+                    opponent = 90_000 + self.rng.randint(0, 500)
+                    home, away = (team_id, opponent) if g % 2 == 0 else (opponent, team_id)
+                    m = self._match(next_id, cid, played, home, away, "FINISHED")
+                    next_id += 1
+                    self.finished[cid].append(m)
+                    self.by_team.setdefault(team_id, []).append(m)
+
+    def _match(self, match_id: int, cid: int, when: datetime, home: int, away: int, status: str) -> Dict[str, Any]:
+        score = None
+        if status == "FINISHED":
+            ht_h, ht_a = self.rng.randint(0, 2), self.rng.randint(0, 2)
+            score = {
+                "fullTime": {"home": ht_h + self.rng.randint(0, 2), "away": ht_a + self.rng.randint(0, 2)},
+                "halfTime": {"home": ht_h, "away": ht_a},
+            }
+        return {
+            "id": match_id,
+            "utcDate": when.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "status": status,
+            "competition": {"id": cid, "name": f"Comp {cid}"},
+            "area": {"code": "BEN", "name": "Bench"},
+            "season": {"id": 1, "startDate": "2025-08-01", "endDate": "2026-05-31"},
+            "homeTeam": {"id": home, "name": f"Time {home}"},
+            "awayTeam": {"id": away, "name": f"Time {away}"},
+            "score": score or {"fullTime": {"home": None, "away": None}, "halfTime": {"home": None, "away": None}},
+            "referees": [{"id": 1, "name": "Árbitro", "type": "REFEREE"}],
+            "odds": {"msg": "Activate Odds-Package in User-Panel to retrieve odds."},
+        }
+
+
+# ======================================================================
+# SERVIDOR STUB (football-data.org + Telegram)
+# ======================================================================
+
+class StubServer:
+    """Servidor local com latência configurável, 429 aleatório e cabeçalhos de cota."""
+
+    def __init__(self, data: SyntheticData, latency_ms: float, rate_429: float, quota: int, seed: int = 7):
+        self.data = data
+        self.latency = latency_ms / 1000.0
+        self.rate_429 = rate_429
+        self.quota = quota
+        self.rng = random.Random(seed)
+        self.requests: Counter = Counter()
+        self.status_429 = 0
+        self.messages: List[str] = []
+        self.app = web.Application()
+        self.app.router.add_get("/v4/matches", self.matches)
+        self.app.router.add_get("/v4/competitions/{cid}/matches", self.competition_matches)
+        self.app.router.add_get("/v4/teams/{tid}/matches", self.team_matches)
+        self.app.router.add_post("/bot{token}/{method}", self.telegram)
+        self._runner: Optional[web.AppRunner] = None
+        self.port = 0
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _api_response(self, endpoint: str, payload: Dict[str, Any]) -> web.Response:
+        self.requests[endpoint] += 1
+        await asyncio.sleep(self.latency)
+        headers = {"X-Requests-Available-Minute": str(self.quota), "X-RequestCounter-Reset": "60"}
+        if self.rng.random() < self.rate_429:
+            self.status_429 += 1
+            return web.json_response({"message": "Too many requests"}, status=429, headers={**headers, "Retry-After": "1"})
+        return web.json_response(payload, headers=headers)
+
+    async def matches(self, request: web.Request) -> web.Response:
+        ids = [int(x) for x in request.query.get("competitions", "").split(",") if x]
+        matches = [m for cid in ids for m in self.data.upcoming.get(cid, [])]
+        return await self._api_response("/matches", {"matches": matches})
+
+    async def competition_matches(self, request: web.Request) -> web.Response:
+        cid = int(request.match_info["cid"])
+        if request.query.get("status") == "FINISHED":
+            return await self._api_response("/competitions/*/matches (finished)", {"matches": self.data.finished.get(cid, [])})
+        return await self._api_response("/competitions/*/matches", {"matches": self.data.upcoming.get(cid, [])})
+
+    async def team_matches(self, request: web.Request) -> web.Response:
+        tid = int(request.match_info["tid"])
+        limit = int(request.query.get("limit", "5"))
+        history = sorted(self.data.by_team.get(tid, []), key=lambda m: m["utcDate"], reverse=True)[:limit]
+        return await self._api_response("/teams/*/matches", {"matches": history})
+
+    async def telegram(self, request: web.Request) -> web.Response:
+        self.requests["telegram/" + request.match_info["method"]] += 1
+        form = await request.post() if request.content_type != "application/json" else await request.json()
+        self.messages.append(str(form.get("text", "")))
+        return web.json_response({
+            "ok": True,
+            "result": {
+                "message_id": len(self.messages),
+                "date": int(time.time()),
+                "chat": {"id": int(form.get("chat_id", 0)), "type": "private"},
+                "text": form.get("text", ""),
+            },
+        })
+
+
+# ======================================================================
+# EXECUÇÃO DO BENCHMARK
+# ======================================================================
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def _latency_tracer(samples: List[float]) -> aiohttp.TraceConfig:
+    """TraceConfig que mede a latência de cada requisição HTTP feita pela sessão do bot."""
+    trace = aiohttp.TraceConfig()
+
+    async def on_start(session, ctx, params):
+        ctx.start = time.perf_counter()
+
+    async def on_end(session, ctx, params):
+        samples.append(time.perf_counter() - ctx.start)
+
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    return trace
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    # Configura o bot ANTES de importá-lo (base local em memória, cota do stub)
+    os.environ.setdefault("MATCH_STORE_PATH", ":memory:")
+    os.environ.setdefault("SNAPSHOT_PATH", "")  # Ciclo sempre a frio
+    os.environ["API_REQUESTS_PER_MINUTE"] = str(args.quota)
+    os.environ["API_TOKEN"] = BENCH_TOKEN
+    if args.keys > 1:
+        os.environ["API_TOKENS"] = ",".join([BENCH_TOKEN] + [f"{BENCH_TOKEN}_{i}" for i in range(1, args.keys)])
+    os.environ["TELEGRAM_TOKEN"] = BENCH_TELEGRAM_TOKEN
+    os.environ["CHAT_ID"] = BENCH_CHAT_ID
+    os.environ["CHAT_IDS"] = ",".join(str(int(BENCH_CHAT_ID) + i) for i in range(args.chats))
+
+    import analysis
+    import main
+    from telegram import Bot
+
+    competition_ids = main.LEAGUE_IDS_TO_FETCH[: args.competitions]
+    data = SyntheticData(competition_ids, args.fixtures, args.history, seed=args.seed)
+    server = StubServer(data, args.latency_ms, args.rate_429, args.quota, seed=args.seed)
+    await server.start()
+
+    base = f"http://127.0.0.1:{server.port}"
+    analysis.BASE_URL = f"{base}/v4"
+    main.bot = main.delivery.bot = Bot(token=BENCH_TELEGRAM_TOKEN, base_url=f"{base}/bot")
+
+    samples: List[float] = []
+    session = analysis.create_http_session(trace_configs=[_latency_tracer(samples)])
+    if main.shard_coordinator is not None:
+        main.shard_coordinator.session_factory = lambda: analysis.create_http_session(trace_configs=[_latency_tracer(samples)])
+    try:
+        started = time.perf_counter()
+        await main.run_analysis_send(session)
+        await main.delivery.join()
+        wall = time.perf_counter() - started
+    finally:
+        await main.delivery.stop(drain=False)
+        if main.shard_coordinator is not None:
+            await main.shard_coordinator.close()
+        await session.close()
+        await server.stop()
+
+    return {
+        "fixtures": args.fixtures,
+        "competitions": len(competition_ids),
+        "api_keys": args.keys,
+        "wall_time_s": round(wall, 3),
+        "requests": sum(server.requests.values()),
+        "requests_by_endpoint": dict(server.requests),
+        "responses_429": server.status_429,
+        "latency_p50_ms": round(_percentile(samples, 50) * 1000, 2),
+        "latency_p95_ms": round(_percentile(samples, 95) * 1000, 2),
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1
+        ),
+        "telegram_messages": len(server.messages),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark offline do ciclo de análise do bot.")
+    parser.add_argument("--fixtures", type=int, default=40, help="Partidas futuras na janela")
+    parser.add_argument("--competitions", type=int, default=12, help="Quantidade de competições (máx. 12)")
+    parser.add_argument("--history", type=int, default=10, help="Jogos finalizados por time")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latência simulada da API")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probabilidade de resposta 429")
+    parser.add_argument("--quota", type=int, default=600, help="Requisições por minuto anunciadas pelo stub")
+    parser.add_argument("--chats", type=int, default=1, help="Chats inscritos que recebem o alerta")
+    parser.add_argument("--keys", type=int, default=1, help="Chaves da API (modo em shards com 2 ou mais)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print("\n📈 RESULTADO DO BENCHMARK")
+        for key, value in report.items():
+            print(f"   {key}: {value}")
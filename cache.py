@@ -0,0 +1,123 @@
+# Cache assíncrono em memória (TTL + LRU) com coalescência de chamadas concorrentes
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from instrumentation import cache_event
+
+
+class AsyncTTLCache:
+    """
+    Cache limitado a 'maxsize' entradas, cada uma válida por 'ttl' segundos; ao
+    estourar o limite sai a usada há mais tempo (LRU, via OrderedDict).
+
+    get_or_load é "single-flight": chamadas concorrentes para a mesma chave esperam
+    a MESMA carga em andamento, então um time pedido por duas partidas ao mesmo
+    tempo gera uma única busca. Falhas não ficam no cache. Se a carga for cancelada
+    (ex.: prazo do ciclo da task que a iniciou), quem estava esperando tenta de novo.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 3600.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # chave -> (expira_em (monotonic), versão, valor)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: Any = None) -> Tuple[bool, Any]:
+        """(True, valor) se a chave está no cache, não expirou e tem a mesma 'version'."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, entry_version, value = entry
+        if expires_at <= time.monotonic() or entry_version != version:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key: Hashable, value: Any, version: Any = None) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        version: Any = None,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Valor em cache ou o resultado de 'loader()'. Com 'version', uma entrada gravada
+        com outra versão conta como desatualizada. 'cache_if' decide se o resultado
+        carregado pode ficar no cache (ex.: não guardar respostas vazias da API).
+        """
+        found, value = self.get(key, version)
+        if found:
+            self.hits += 1
+            cache_event(self.name, True)
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            cache_event(self.name, True)
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Cancelada foi a carga do líder, não esta task: carrega de novo
+                if pending.cancelled() and not asyncio.current_task().cancelling():
+                    return await self.get_or_load(key, loader, version, cache_if)
+                raise
+
+        self.misses += 1
+        cache_event(self.name, False)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Marca como lida: sem aviso se ninguém estava esperando
+            raise
+        except BaseException:
+            future.cancel()  # Cancelamento não é erro da carga: os que esperam tentam de novo
+            raise
+        else:
+            future.set_result(value)
+            if cache_if is None or cache_if(value):
+                self.put(key, value, version)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+        }
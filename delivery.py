@@ -0,0 +1,172 @@
+# Fila assíncrona de envio ao Telegram (vários chats, limites de envio, flood-wait)
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from telegram import Bot
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+from analysis import RateLimiter
+from instrumentation import TELEGRAM_MESSAGES_TOTAL, stage
+
+# Limite de caracteres por mensagem da API do Telegram
+TELEGRAM_MAX_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_LENGTH) -> List[str]:
+    """Divide o texto em partes <= limit, preferindo quebrar entre linhas."""
+    if len(text) <= limit:
+        return [text]
+
+    parts: List[str] = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:  # Linha sozinha maior que o limite: corte seco
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        if len(current) + len(line) > limit:
+            parts.append(current)
+            current = ""
+        current += line
+    if current:
+        parts.append(current)
+    return parts
+
+
+@dataclass(slots=True)
+class _Outbound:
+    chat_id: str
+    chunks: List[str]
+    parse_mode: Optional[str]
+
+
+class TelegramDeliveryQueue:
+    """
+    Fila de saída desacoplada da análise: o ciclo só enfileira e segue.
+
+    Workers concorrentes entregam as mensagens respeitando o limite global do bot
+    (token bucket) e um intervalo mínimo por chat; as partes de uma mensagem longa
+    saem em ordem no mesmo chat. RetryAfter (flood-wait) espera o tempo pedido pelo
+    Telegram e tenta de novo.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = 8,
+        global_per_second: float = 25.0,
+        per_chat_interval: float = 1.0,
+        max_retries: int = 3,
+    ):
+        self.bot = bot
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._global = RateLimiter(rate_per_minute=int(global_per_second * 60), burst=int(global_per_second))
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._chat_next: Dict[str, float] = {}
+        self.sent = 0
+        self.failed = 0
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Inicia os workers no loop atual (idempotente)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain: bool = True) -> None:
+        if drain:
+            await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def join(self) -> None:
+        """Aguarda até todas as mensagens enfileiradas terem sido entregues (ou desistidas)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def submit(self, chat_id: str, text: str, parse_mode: Optional[str] = None) -> None:
+        """Enfileira uma mensagem para um chat (dividida se passar de 4096 caracteres)."""
+        self.start()
+        self._queue.put_nowait(_Outbound(str(chat_id), split_message(text), parse_mode))
+
+    def broadcast(self, text: str, chat_ids: Iterable[str], parse_mode: Optional[str] = None) -> int:
+        """Enfileira a mesma mensagem para vários chats. Retorna quantos chats foram enfileirados."""
+        chunks = split_message(text)
+        self.start()
+        count = 0
+        for chat_id in chat_ids:
+            self._queue.put_nowait(_Outbound(str(chat_id), chunks, parse_mode))
+            count += 1
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+    # ------------------------------------------------------------------
+    # Entrega
+    # ------------------------------------------------------------------
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                lock = self._chat_locks.setdefault(item.chat_id, asyncio.Lock())
+                async with lock:
+                    for chunk in item.chunks:
+                        if not await self._send_chunk(item.chat_id, chunk, item.parse_mode):
+                            break
+            except Exception as e:
+                print(f"❌ Erro inesperado na fila do Telegram: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _send_chunk(self, chat_id: str, text: str, parse_mode: Optional[str]) -> bool:
+        for attempt in range(self.max_retries):
+            # Intervalo mínimo por chat + limite global do bot
+            wait = self._chat_next.get(chat_id, 0.0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self._global.acquire()
+
+            try:
+                with stage("telegram_send"):
+                    await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                self._chat_next[chat_id] = time.monotonic() + self.per_chat_interval
+                TELEGRAM_MESSAGES_TOTAL.inc("ok")
+                self.sent += 1
+                return True
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+                TELEGRAM_MESSAGES_TOTAL.inc("flood_wait")
+                print(f"⚠ Flood-wait do Telegram no chat {chat_id}. Aguardando {retry_after}s...")
+                self._chat_next[chat_id] = time.monotonic() + retry_after
+            except (TimedOut, NetworkError) as e:
+                TELEGRAM_MESSAGES_TOTAL.inc("retry")
+                print(f"⚠ Falha de rede ao enviar para {chat_id}: {e}. Tentando novamente...")
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                print(f"❌ Erro ao enviar mensagem para {chat_id}: {e}")
+                break
+
+        TELEGRAM_MESSAGES_TOTAL.inc("error")
+        self.failed += 1
+        return False
@@ -0,0 +1,107 @@
+# Índice de forma por time, alimentado pelos resultados em massa das competições
+import time
+from collections import deque
+from typing import Deque, Dict, Any, List, Iterable, Optional
+
+
+class TeamFormIndex:
+    """
+    Ring buffer (tamanho fixo) com os últimos N resultados de cada time.
+    É montado a partir de /competitions/{id}/matches?status=FINISHED (uma chamada
+    por liga), e responde compute_team_metrics sem requisições por time.
+    """
+
+    def __init__(self, size: int = 10):
+        self.size = size
+        self._buffers: Dict[int, Deque[Dict[str, Any]]] = {}
+        # Última data (YYYY-MM-DD) já sincronizada por competição, para buscas incrementais
+        self.synced_until: Dict[int, str] = {}
+        # Momento (epoch) da última atualização bem-sucedida por competição
+        self.refreshed_at: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def add_matches(self, matches: Iterable[Dict[str, Any]]) -> int:
+        """Insere partidas finalizadas (formato da API). Retorna quantas eram novas no índice."""
+        added = 0
+        for m in sorted(matches, key=lambda x: x.get("utcDate") or ""):
+            if m.get("status", "FINISHED") != "FINISHED" or not m.get("utcDate"):
+                continue
+            home_id = (m.get("homeTeam") or {}).get("id")
+            away_id = (m.get("awayTeam") or {}).get("id")
+            if home_id is None or away_id is None:
+                continue
+            # Sem curto-circuito: a partida entra no buffer dos dois times
+            if self._push(home_id, m) | self._push(away_id, m):
+                added += 1
+        return added
+
+    def _push(self, team_id: int, match: Dict[str, Any]) -> bool:
+        """Coloca a partida no buffer do time. False se ela já estava lá."""
+        buf = self._buffers.get(team_id)
+        if buf is None:
+            buf = self._buffers[team_id] = deque(maxlen=self.size)
+
+        if any(m.get("id") == match.get("id") for m in buf):
+            return False
+
+        if not buf or match["utcDate"] >= buf[-1]["utcDate"]:
+            buf.append(match)
+            return True
+
+        # Partida fora de ordem (ex.: liga + copa chegando em chamadas separadas)
+        ordered = sorted([*buf, match], key=lambda x: x["utcDate"])
+        buf.clear()
+        buf.extend(ordered[-self.size:])
+        return any(m is match for m in buf)  # Mais antiga que o buffer cheio: ficou de fora
+
+    def games_count(self, team_id: int) -> int:
+        buf = self._buffers.get(team_id)
+        return len(buf) if buf else 0
+
+    def latest_match_id(self, team_id: int) -> Optional[int]:
+        """Id do jogo mais recente do time (muda quando entra um resultado novo)."""
+        buf = self._buffers.get(team_id)
+        return buf[-1].get("id") if buf else None
+
+    def matches(self) -> List[Dict[str, Any]]:
+        """Partidas distintas do índice (cada jogo está no buffer dos dois times)."""
+        return list({m.get("id"): m for buf in self._buffers.values() for m in buf}.values())
+
+    def recent(self, team_id: int, last: int = 5) -> List[Dict[str, Any]]:
+        """Últimos 'last' jogos do time, do mais recente para o mais antigo."""
+        buf = self._buffers.get(team_id)
+        if not buf:
+            return []
+        return list(reversed(buf))[:last]
+
+    def last_synced(self, competition_id: int) -> Optional[str]:
+        return self.synced_until.get(competition_id)
+
+    def is_fresh(self, competition_id: int, max_age: float) -> bool:
+        """True se a competição foi atualizada há menos de 'max_age' segundos."""
+        refreshed = self.refreshed_at.get(competition_id)
+        return refreshed is not None and time.time() - refreshed < max_age
+
+    # ------------------------------------------------------------------
+    # Snapshot (ver snapshot.py)
+    # ------------------------------------------------------------------
+
+    def to_state(self) -> Dict[str, Any]:
+        """Estado serializável (listas de pares: chaves inteiras sobrevivem ao JSON)."""
+        return {
+            "size": self.size,
+            "buffers": [[team_id, list(buf)] for team_id, buf in self._buffers.items()],
+            "synced_until": [[comp_id, date] for comp_id, date in self.synced_until.items()],
+            "refreshed_at": [[comp_id, ts] for comp_id, ts in self.refreshed_at.items()],
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restaura o estado salvo por to_state (respeitando o tamanho atual do buffer)."""
+        self._buffers = {
+            int(team_id): deque(matches[-self.size:], maxlen=self.size)
+            for team_id, matches in state.get("buffers", [])
+        }
+        self.synced_until = {int(c): d for c, d in state.get("synced_until", [])}
+        self.refreshed_at = {int(c): float(t) for c, t in state.get("refreshed_at", [])}
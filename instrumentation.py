@@ -0,0 +1,165 @@
+# Instrumentação do ciclo de análise: contadores e histogramas no formato Prometheus
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_LOCK = threading.Lock()  # O /metrics pode ser lido de outra thread (servidor HTTP)
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Contador monotônico com labels."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = tuple(str(v) for v in labels)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(tuple(str(v) for v in labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Histograma (buckets cumulativos, soma e contagem) com labels."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = tuple(str(v) for v in labels)
+        with _LOCK:
+            # [contagem por bucket..., soma, contagem total]
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labels: str) -> float:
+        series = self._series.get(tuple(str(v) for v in labels))
+        return series[-1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            labels = _format_labels(self.labelnames, key)
+            for bound, count in zip(self.buckets, series):
+                bucket_labels = _format_labels(self.labelnames, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {count:g}")
+            inf_labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {series[-1]:g}")
+            lines.append(f"{self.name}_sum{labels} {series[-2]:g}")
+            lines.append(f"{self.name}_count{labels} {series[-1]:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Exposição completa no formato texto do Prometheus (text/plain; version=0.0.4)."""
+        with _LOCK:
+            lines: List[str] = []
+            for metric in self._metrics:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ----------------------------------------------------------------------
+# Métricas do bot
+# ----------------------------------------------------------------------
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "bot_stage_duration_seconds", "Duração de cada etapa do ciclo de análise.", ["stage"],
+))
+CYCLES_TOTAL = REGISTRY.register(Counter(
+    "bot_cycles_total", "Ciclos de análise executados, por resultado.", ["result"],
+))
+API_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "bot_api_requests_total", "Requisições à API por endpoint e status HTTP.", ["endpoint", "status"],
+))
+API_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "bot_api_request_duration_seconds", "Latência das requisições à API por endpoint.", ["endpoint"],
+))
+API_RETRIES_TOTAL = REGISTRY.register(Counter(
+    "bot_api_retries_total", "Reenvios de requisições à API por endpoint.", ["endpoint"],
+))
+API_RATE_LIMITED_TOTAL = REGISTRY.register(Counter(
+    "bot_api_rate_limited_total", "Respostas 429 (rate limit) por endpoint.", ["endpoint"],
+))
+API_RETRY_GIVEUPS_TOTAL = REGISTRY.register(Counter(
+    "bot_api_retry_giveups_total", "Requisições abandonadas pelo reenvio, por motivo (deadline, circuit_open, attempts, rate_limited).", ["endpoint", "reason"],
+))
+API_CIRCUIT_TRANSITIONS_TOTAL = REGISTRY.register(Counter(
+    "bot_api_circuit_transitions_total", "Mudanças de estado do circuit breaker por host.", ["host", "state"],
+))
+CACHE_EVENTS_TOTAL = REGISTRY.register(Counter(
+    "bot_cache_events_total", "Acertos e falhas dos caches locais.", ["cache", "result"],
+))
+TELEGRAM_MESSAGES_TOTAL = REGISTRY.register(Counter(
+    "bot_telegram_messages_total", "Mensagens enviadas ao Telegram por resultado.", ["result"],
+))
+
+_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_label(url: str) -> str:
+    """Normaliza a URL em um label de baixa cardinalidade: '/teams/{id}/matches'."""
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/"):] if "/" in path else "/"
+    path = path.split("?", 1)[0]
+    if path.startswith("/v4"):
+        path = path[3:]
+    return _ID_RE.sub("/{id}", path) or "/"
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Mede a duração de uma etapa do ciclo (funciona dentro de código assíncrono)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, name)
+
+
+def cache_event(cache: str, hit: bool) -> None:
+    CACHE_EVENTS_TOTAL.inc(cache, "hit" if hit else "miss")
@@ -1,15 +1,47 @@
-from flask import Flask
-from threading import Thread
+# Servidor HTTP de saúde/status rodando no MESMO event loop do bot (aiohttp)
+import json
+from typing import Any, Callable, Dict
 
-app = Flask('')
+from aiohttp import web
 
-@app.route('/')
-def home():
-    return "Bot ativo!"
+from instrumentation import REGISTRY
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+def create_status_app(status_provider: Callable[[], Dict[str, Any]]) -> web.Application:
+    """Rotas: / (keep-alive), /status (JSON com o estado do bot) e /metrics (Prometheus)."""
+
+    async def home(request: web.Request) -> web.Response:
+        return web.Response(text="Bot ativo!")
+
+    async def status(request: web.Request) -> web.Response:
+        return web.json_response(status_provider(), dumps=_dumps)
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            text=REGISTRY.render(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/", home)
+    app.router.add_get("/status", status)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+async def keep_alive(
+    status_provider: Callable[[], Dict[str, Any]],
+    host: str = "0.0.0.0",
+    port: int = 8080,
+) -> web.AppRunner:
+    """Inicia o servidor no loop atual e retorna o runner (chamar runner.cleanup() ao encerrar)."""
+    runner = web.AppRunner(create_status_app(status_provider), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"✅ Servidor de status ativo em http://{host}:{port} (/, /status, /metrics).")
+    return runner
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str)
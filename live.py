@@ -0,0 +1,249 @@
+# Modo ao vivo: acompanha as partidas alertadas durante o jogo (polling adaptativo)
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+
+from analysis import fetch_live_matches, fetch_match, market_code, market_hit
+from models import Fixture, LiveMatch
+
+# Mercados que o placar parcial já decide: over/BTTS sim viram green com o gol,
+# under/BTTS não viram red com o gol (os demais só no intervalo/final)
+_EARLY_GREEN = {"Over 2.5 FT", "Over 1.5 FT", "BTTS Yes", "Over 1.5 HT", "Over 0.5 HT"}
+_EARLY_RED = {"Under 2.5 FT", "BTTS No"}
+# 45 min + acréscimos + intervalo: antes disso o placar atual ainda é o do 1º tempo
+_SECOND_HALF_AFTER = timedelta(minutes=60)
+
+
+def live_market_state(
+    suggestion: Optional[str],
+    match: LiveMatch,
+    halftime_reached: bool = False,
+    now: Optional[datetime] = None,
+) -> Optional[bool]:
+    """
+    Situação da sugestão com o placar atual: True (green), False (red) ou None se ainda
+    em aberto. Mercados HT fecham no intervalo; os FT, no apito final (ou antes, pelo placar).
+    No 2º tempo (intervalo visto ou mais de _SECOND_HALF_AFTER desde o kickoff, caso os
+    polls do intervalo tenham falhado) os mercados HT só usam o placar HT da API.
+    """
+    code = market_code(suggestion)
+    if code is None:
+        return None
+
+    if match.status == "FINISHED":
+        return market_hit(suggestion, match.home_goals, match.away_goals, match.ht_home, match.ht_away)
+
+    home, away = match.home_goals or 0, match.away_goals or 0
+    if code.endswith(" HT"):
+        if match.status == "PAUSED":
+            # No intervalo o placar atual é o do 1º tempo
+            ht_home = match.ht_home if match.ht_home is not None else home
+            ht_away = match.ht_away if match.ht_away is not None else away
+            return market_hit(suggestion, None, None, ht_home, ht_away)
+        now = now or datetime.now(timezone.utc)
+        if halftime_reached or now - match.kickoff >= _SECOND_HALF_AFTER:
+            if match.ht_home is None or match.ht_away is None:
+                return None  # 2º tempo sem placar HT: o parcial já inclui gols do 2º tempo
+            return market_hit(suggestion, None, None, match.ht_home, match.ht_away)
+
+    # Placar parcial (no 1º tempo, o parcial também vale como placar HT)
+    partial = market_hit(suggestion, home, away, home, away)
+    if partial is True and code in _EARLY_GREEN:
+        return True
+    if partial is False and code in _EARLY_RED:
+        return False
+    return None
+
+
+@dataclass(slots=True)
+class LiveUpdate:
+    """Mudança detectada entre dois snapshots para uma partida acompanhada."""
+    fixture: Fixture
+    match: LiveMatch
+    previous: Optional[LiveMatch]
+    market_state: Optional[bool]
+    settled_now: bool  # O mercado sugerido acabou de ser decidido neste snapshot
+
+
+class LiveMonitor:
+    """
+    Acompanha as partidas alertadas enquanto estão em jogo.
+
+    Só consulta as competições que têm partida acompanhada em andamento (ou prestes a
+    começar), em 1 requisição /matches?competitions=...&status=IN_PLAY,PAUSED. Cada
+    snapshot é comparado com o anterior e apenas as partidas que mudaram (status ou
+    placar) têm o mercado sugerido reavaliado. O intervalo entre consultas se adapta:
+    rápido perto do kickoff e do intervalo, normal com jogo rolando, lento sem jogos.
+    """
+
+    def __init__(
+        self,
+        api_token: str,
+        on_update: Callable[[List[LiveUpdate]], None],
+        fast_interval: float = 30.0,
+        normal_interval: float = 90.0,
+        idle_interval: float = 900.0,
+        kickoff_window: timedelta = timedelta(minutes=10),
+        match_duration: timedelta = timedelta(minutes=150),
+    ):
+        self.api_token = api_token
+        self.on_update = on_update
+        self.fast_interval = fast_interval
+        self.normal_interval = normal_interval
+        self.idle_interval = idle_interval
+        self.kickoff_window = kickoff_window
+        self.match_duration = match_duration
+        self._watched: Dict[int, Fixture] = {}
+        self._snapshot: Dict[int, LiveMatch] = {}
+        self._halftime: Set[int] = set()
+        self._settled: Set[int] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self.polls = 0
+        self.updates = 0
+        self.last_interval: Optional[float] = None
+
+    # ------------------------------------------------------------------
+    # Partidas acompanhadas
+    # ------------------------------------------------------------------
+
+    def watch(self, fixtures: Iterable[Fixture]) -> None:
+        """Passa a acompanhar as partidas pontuadas (com sugestão) informadas."""
+        added = False
+        for f in fixtures:
+            if f.suggestion and f.competition_id is not None:
+                added = added or f.id not in self._watched
+                self._watched[f.id] = f
+        if added and self._wakeup is not None:
+            self._wakeup.set()  # Replaneja o próximo poll (pode haver kickoff próximo)
+
+    def watched(self) -> List[Fixture]:
+        return list(self._watched.values())
+
+    def active_competitions(self, now: datetime) -> Set[int]:
+        """Competições com partida acompanhada em andamento ou na janela do kickoff."""
+        active = set()
+        for f in self._watched.values():
+            if f.id in self._snapshot or f.kickoff - self.kickoff_window <= now <= f.kickoff + self.match_duration:
+                active.add(f.competition_id)
+        return active
+
+    def next_interval(self, now: datetime) -> float:
+        """Segundos até o próximo poll, conforme a fase das partidas acompanhadas."""
+        if not self._watched:
+            return self.idle_interval
+
+        live = list(self._snapshot.values())
+        if any(m.status == "PAUSED" for m in live):
+            return self.fast_interval  # Intervalo: mercados HT fecham e o jogo volta em ~15 min
+        for m in live:
+            elapsed = now - m.kickoff
+            if m.id not in self._halftime and timedelta(minutes=40) <= elapsed <= timedelta(minutes=55):
+                return self.fast_interval  # Perto do intervalo
+
+        waiting = [f.kickoff for f in self._watched.values() if f.id not in self._snapshot]
+        if any(abs(now - kickoff) <= self.kickoff_window for kickoff in waiting):
+            return self.fast_interval  # Perto do kickoff
+        if live or any(kickoff <= now for kickoff in waiting):
+            return self.normal_interval
+
+        upcoming = [kickoff - self.kickoff_window for kickoff in waiting if kickoff - self.kickoff_window > now]
+        if upcoming:
+            return max(self.fast_interval, min(self.idle_interval, (min(upcoming) - now).total_seconds()))
+        return self.idle_interval
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    async def poll_once(self, session: Optional[aiohttp.ClientSession] = None, now: Optional[datetime] = None) -> List[LiveUpdate]:
+        """Busca um snapshot das competições ativas e devolve só as partidas que mudaram."""
+        now = now or datetime.now(timezone.utc)
+        self._expire(now)
+
+        competitions = self.active_competitions(now)
+        if not competitions:
+            return []
+
+        matches = await fetch_live_matches(self.api_token, sorted(competitions), session=session)
+        self.polls += 1
+        if matches is None:
+            return []  # Falha na consulta: mantém o snapshot anterior
+
+        current = {m.id: m for m in matches if m.id in self._watched}
+
+        # Saiu de IN_PLAY/PAUSED: confere o placar final da partida (1 requisição por jogo encerrado)
+        for match_id in set(self._snapshot) - set(current):
+            final = await fetch_match(self.api_token, match_id, session=session)
+            if final is not None:
+                current[match_id] = final
+
+        updates = self._diff(current, now)
+        self._snapshot = {i: m for i, m in current.items() if m.status in ("IN_PLAY", "PAUSED")}
+        for match_id in set(current) - set(self._snapshot):
+            self._forget(match_id)  # Encerrada (ou suspensa): não acompanha mais
+        return updates
+
+    def _diff(self, current: Dict[int, LiveMatch], now: Optional[datetime] = None) -> List[LiveUpdate]:
+        updates = []
+        for match_id, match in current.items():
+            previous = self._snapshot.get(match_id)
+            if previous == match:
+                continue  # Nada mudou: nenhuma reavaliação
+
+            if match.status == "PAUSED":
+                self._halftime.add(match_id)
+            fixture = self._watched[match_id]
+            state = live_market_state(fixture.suggestion, match, halftime_reached=match_id in self._halftime, now=now)
+            settled_now = state is not None and match_id not in self._settled
+            if settled_now:
+                self._settled.add(match_id)
+            updates.append(LiveUpdate(fixture, match, previous, state, settled_now))
+
+        self.updates += len(updates)
+        return updates
+
+    def _expire(self, now: datetime) -> None:
+        for match_id, f in list(self._watched.items()):
+            if match_id not in self._snapshot and f.kickoff + self.match_duration < now:
+                self._forget(match_id)
+
+    def _forget(self, match_id: int) -> None:
+        self._watched.pop(match_id, None)
+        self._halftime.discard(match_id)
+        self._settled.discard(match_id)
+
+    # ------------------------------------------------------------------
+    # Loop
+    # ------------------------------------------------------------------
+
+    async def run(self, session: Optional[aiohttp.ClientSession] = None) -> None:
+        """Loop do modo ao vivo (rodar como task; termina ao ser cancelado)."""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                updates = await self.poll_once(session)
+                if updates:
+                    self.on_update(updates)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Erro no modo ao vivo: {e}")
+
+            self.last_interval = self.next_interval(datetime.now(timezone.utc))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.last_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "watched": len(self._watched),
+            "live": len(self._snapshot),
+            "polls": self.polls,
+            "updates": self.updates,
+            "next_interval_s": self.last_interval,
+        }
@@ -1,20 +1,52 @@
 import os
 import asyncio
+import time
 from datetime import datetime, timedelta
 import pytz
+import aiohttp
 from telegram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 # CORREÇÃO CRÍTICA: Importação explícita de TODOS os tipos usados
-from typing import List, Dict, Any, Optional 
+from typing import List, Dict, Any, Optional, Set, Tuple, Union, AsyncIterator, Callable
 
 # Importa TODAS as funções do analysis.py (API, análise e utilidades)
 from analysis import (
     fetch_upcoming_fixtures,
+    stream_upcoming_fixtures,
     compute_team_metrics,
+    compute_team_metrics_panel,
     decide_best_market, 
     kickoff_time_local,
-    get_flag_emoji
+    get_flag_emoji,
+    create_http_session,
+    refresh_form_index,
+    load_market_profile,
+    MarketThresholds,
+    cycle_deadline_scope,
+    API_RATE_LIMITER,
+    API_RETRY_POLICY,
+    API_CIRCUIT_BREAKER,
 )
+from cache import AsyncTTLCache
+from form_index import TeamFormIndex
+from match_store import MatchStore
+from models import Fixture, TeamMetrics, TeamMetricsPanel
+from scheduling import plan_kickoff_jobs, RunCoordinator
+from instrumentation import stage, CYCLES_TOTAL
+from delivery import TelegramDeliveryQueue
+from poisson_model import competition_goal_averages, decide_best_market_poisson
+from pipeline import StreamingPipeline
+from sharding import ShardCoordinator, ShardedPipeline, parse_api_tokens
+from subscriptions import Subscription, ScoredFixtureTable, load_subscriptions
+from keep_alive import keep_alive
+from snapshot import (
+    build_snapshot,
+    fixtures_from_snapshot,
+    load_snapshot,
+    save_snapshot,
+    sent_alerts_from_snapshot,
+)
+from live import LiveMonitor, LiveUpdate
 
 # ----------------------------------------------------------------------
 # 🌍 NOVO: MAPEAMENTO GLOBAL DE LIGAS COM CÓDIGO (football-data.org) E BANDEIRA
@@ -46,91 +78,261 @@ TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "YOUR_TELEGRAM_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID", "YOUR_CHAT_ID")                     
 TZ = pytz.timezone("America/Sao_Paulo")
 
-# Bot do Telegram
+# Chats inscritos (CHAT_IDS separados por vírgula; CHAT_ID continua valendo)
+CHAT_IDS = [c.strip() for c in os.getenv("CHAT_IDS", "").split(",") if c.strip()]
+if CHAT_ID != "YOUR_CHAT_ID" and CHAT_ID not in CHAT_IDS:
+    CHAT_IDS.insert(0, CHAT_ID)
+
+# Bot do Telegram e fila de envio (entrega desacoplada da análise)
 bot = Bot(token=TELEGRAM_TOKEN)
+delivery = TelegramDeliveryQueue(
+    bot,
+    workers=int(os.getenv("TELEGRAM_WORKERS", "8")),
+    global_per_second=float(os.getenv("TELEGRAM_GLOBAL_PER_SECOND", "25")),
+    per_chat_interval=float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL", "1.0")),
+)
+
+# PERFIL DE LIMIARES DOS MERCADOS (gerado pelo sweep.py); sem perfil, valores originais
+MARKET_PROFILE = os.getenv("MARKET_PROFILE")
+MARKET_THRESHOLDS = load_market_profile(MARKET_PROFILE) if MARKET_PROFILE else MarketThresholds()
+
+# Motor de decisão: "heuristic" (limiares de decide_best_market) ou "poisson" (modelo de
+# placar do poisson_model.py; confiança = vantagem sobre a partida média da competição)
+MARKET_ENGINE = os.getenv("MARKET_ENGINE", "heuristic").lower()
+# Gols por time por jogo de cada competição (do índice de forma), usados pelo motor poisson
+league_goal_averages: Dict[int, float] = {}
 
 # CONFIGURAÇÕES DE FILTRO
 HOURS_LIMIT = 12 
 TOP_QTY = 4      
-MIN_CONFIDENCE = 50 
+MIN_CONFIDENCE = MARKET_THRESHOLDS.min_confidence  # 50 sem perfil
+
+# INSCRIÇÕES: cada chat com suas ligas, janela, confiança mínima e TOP N (JSON em
+# SUBSCRIPTIONS_FILE). Sem arquivo, todos os CHAT_IDS usam os filtros globais acima.
+SUBSCRIPTIONS_FILE = os.getenv("SUBSCRIPTIONS_FILE")
+SUBSCRIPTIONS: List[Subscription] = (
+    load_subscriptions(SUBSCRIPTIONS_FILE) if SUBSCRIPTIONS_FILE
+    else [Subscription(chat_id=c, hours=HOURS_LIMIT, min_confidence=MIN_CONFIDENCE, top_n=TOP_QTY) for c in CHAT_IDS]
+)
+# Janela de análise: a maior janela entre as inscrições
+ANALYSIS_HOURS = max([HOURS_LIMIT] + [s.hours for s in SUBSCRIPTIONS])
+# Tabela única de partidas pontuadas (indexada por liga e kickoff), compartilhada por todas as inscrições
+scored_table = ScoredFixtureTable()
 
 # Margem de tempo de segurança
 MINUTES_BEFORE_KICKOFF = 2 
 
-# NOVO VALOR: Aumentado para 15.5 segundos para respeitar o Rate Limit da API Free
-SLEEP_TIME_BETWEEN_ANALYSIS = 15.5 
+# IDs das competições buscadas (precisam ser os IDs reais da API)
+LEAGUE_IDS_TO_FETCH = [2000, 2001, 2002, 2003, 2013, 2014, 2015, 2016, 2017, 2018, 2019, 2021]
+
+# MODO DO AGENDADOR: "cron" (4 horários fixos) ou "kickoff" (análise por grupo de jogos)
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "cron")
+KICKOFF_LEAD_MINUTES = int(os.getenv("KICKOFF_LEAD_MINUTES", "90"))
+KICKOFF_BATCH_WINDOW_MINUTES = int(os.getenv("KICKOFF_BATCH_WINDOW_MINUTES", "45"))
+KICKOFF_REPLAN_HOURS = int(os.getenv("KICKOFF_REPLAN_HOURS", "6"))
+KICKOFF_MISFIRE_GRACE_SECONDS = int(os.getenv("KICKOFF_MISFIRE_GRACE_SECONDS", "300"))
+
+# Execuções sobrepostas: "coalesce" (roda uma vez ao final) ou "skip" (descarta o disparo)
+RUN_OVERLAP_POLICY = os.getenv("RUN_OVERLAP_POLICY", "coalesce")
+# Duração máxima de um ciclo (além do limite do primeiro kickoff da janela)
+CYCLE_MAX_MINUTES = int(os.getenv("CYCLE_MAX_MINUTES", "30"))
+run_coordinator = RunCoordinator(policy=RUN_OVERLAP_POLICY)
+
+# Pipeline em streaming: análises simultâneas e envio antecipado dos jogos que começam
+# em até EARLY_SEND_MINUTES (0 = desligado, tudo sai no resumo final)
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "8"))
+EARLY_SEND_MINUTES = int(os.getenv("EARLY_SEND_MINUTES", "0"))
+
+# SNAPSHOT DE AQUECIMENTO: partidas pontuadas, índice de forma e alertas enviados ficam
+# em disco; ao reiniciar, um snapshot com menos de SNAPSHOT_FRESH_MINUTES responde sem API
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "bot_snapshot.bin")  # Vazio desativa
+SNAPSHOT_FRESH_MINUTES = int(os.getenv("SNAPSHOT_FRESH_MINUTES", "60"))
+# Competições do índice de forma atualizadas há menos que isso não são buscadas de novo
+FORM_INDEX_MAX_AGE_MINUTES = int(os.getenv("FORM_INDEX_MAX_AGE_MINUTES", "60"))
+# Alertas já enviados por chat (chat -> partida -> kickoff epoch): evita reenviar a mesma partida
+# e diz a quais chats o modo ao vivo avisa green/red (mantidos até N horas após o kickoff)
+SENT_ALERTS_RETENTION_HOURS = float(os.getenv("SENT_ALERTS_RETENTION_HOURS", "6"))
+sent_alerts: Dict[str, Dict[int, float]] = {}
+last_cycle_at: Optional[float] = None
+
+# MODO AO VIVO: acompanha as partidas alertadas durante o jogo e avisa green/red
+# assim que o mercado sugerido é decidido (consulta só as ligas com jogo em andamento)
+LIVE_MODE = os.getenv("LIVE_MODE", "0") == "1"
+LIVE_FAST_SECONDS = float(os.getenv("LIVE_FAST_SECONDS", "30"))
+LIVE_NORMAL_SECONDS = float(os.getenv("LIVE_NORMAL_SECONDS", "90"))
+LIVE_IDLE_SECONDS = float(os.getenv("LIVE_IDLE_SECONDS", "900"))
+
+# Porta do servidor de status (Cloud Run informa via PORT)
+STATUS_PORT = int(os.getenv("PORT", "8080"))
+
+# Cota da API (requisições por minuto). O RateLimiter do analysis.py controla o ritmo
+# e se ajusta pelos headers da API, então não há mais espera fixa entre análises.
+API_REQUESTS_PER_MINUTE = int(os.getenv("API_REQUESTS_PER_MINUTE", "10"))
+API_RATE_LIMITER.set_rate(API_REQUESTS_PER_MINUTE)
+
+# Pool de conexões HTTP (sessão única criada em main())
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "20"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+
+# Reenvio das requisições (timeouts, tentativas e backoff com jitter) e circuit breaker
+# por host. As esperas nunca passam do prazo do ciclo (ver _pipeline_deadline).
+HTTP_REQUEST_TIMEOUT = float(os.getenv("HTTP_REQUEST_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_ATTEMPTS = int(os.getenv("HTTP_MAX_ATTEMPTS", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))
+API_RETRY_POLICY.configure(
+    max_attempts=HTTP_MAX_ATTEMPTS, base_delay=HTTP_BACKOFF_BASE, max_delay=HTTP_BACKOFF_MAX,
+    request_timeout=HTTP_REQUEST_TIMEOUT, connect_timeout=HTTP_CONNECT_TIMEOUT,
+)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30"))
+API_CIRCUIT_BREAKER.configure(failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN_SECONDS)
+
+# Modo em shards: com 2 ou mais chaves em API_TOKENS (separadas por vírgula), as ligas são
+# divididas entre elas e cada chave roda o próprio pipeline com a sua cota (API_REQUESTS_PER_MINUTE
+# por chave). O API_TOKEN continua sendo usado pelo modo ao vivo e pelo planejamento do modo kickoff.
+API_TOKENS = parse_api_tokens(os.getenv("API_TOKENS"))
+shard_coordinator: Optional[ShardCoordinator] = (
+    ShardCoordinator(
+        API_TOKENS,
+        LEAGUE_IDS_TO_FETCH,
+        requests_per_minute=API_REQUESTS_PER_MINUTE,
+        session_factory=lambda: create_http_session(
+            limit=HTTP_POOL_LIMIT, limit_per_host=HTTP_POOL_LIMIT_PER_HOST, ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        ),
+        known_limiters={API_TOKEN: API_RATE_LIMITER},
+    )
+    if len(API_TOKENS) > 1 else None
+)
+
+# Base local de partidas finalizadas (evita baixar o histórico dos times a cada ciclo)
+MATCH_STORE_PATH = os.getenv("MATCH_STORE_PATH", "matches.db")
+MATCH_STORE_REFRESH_HOURS = float(os.getenv("MATCH_STORE_REFRESH_HOURS", "6"))
+match_store = MatchStore(MATCH_STORE_PATH, refresh_interval=MATCH_STORE_REFRESH_HOURS * 3600)
+
+# "window": métricas dos últimos 5 jogos (padrão, igual ao backtest). "panel": busca os
+# últimos TEAM_METRICS_HISTORY jogos de uma vez e decide com o painel (janelas 3/5/10,
+# casa/fora e forma exponencial), com o mesmo número de requisições.
+TEAM_METRICS_MODE = os.getenv("TEAM_METRICS_MODE", "window").lower()
+TEAM_METRICS_HISTORY = int(os.getenv("TEAM_METRICS_HISTORY", "10"))
+TEAM_METRICS_PANEL_MIN_GAMES = 5  # Jogos no índice de forma que bastam para o painel
+
+# Índice de forma (últimos N resultados por time) montado com 1 requisição por liga.
+# Guarda pelo menos o histórico que as métricas pedem; a janela de busca (dias) acompanha
+# o tamanho (~6 dias por jogo), senão o índice nunca chega a ter os N jogos.
+_FORM_GAMES_NEEDED = TEAM_METRICS_HISTORY if TEAM_METRICS_MODE == "panel" else 5
+FORM_INDEX_SIZE = int(os.getenv("FORM_INDEX_SIZE", str(max(10, _FORM_GAMES_NEEDED))))
+if FORM_INDEX_SIZE < _FORM_GAMES_NEEDED:
+    print(f"⚠ FORM_INDEX_SIZE={FORM_INDEX_SIZE} menor que o histórico usado ({_FORM_GAMES_NEEDED}); usando {_FORM_GAMES_NEEDED}.")
+    FORM_INDEX_SIZE = _FORM_GAMES_NEEDED
+FORM_INDEX_DAYS_BACK = int(os.getenv("FORM_INDEX_DAYS_BACK", str(6 * FORM_INDEX_SIZE)))
+form_index = TeamFormIndex(size=FORM_INDEX_SIZE)
+
+# Cache das métricas por (time, últimos N): o mesmo clube em duas competições (liga + CL)
+# é calculado uma vez, e análises concorrentes do mesmo time dividem a mesma busca.
+TEAM_METRICS_CACHE_SIZE = int(os.getenv("TEAM_METRICS_CACHE_SIZE", "2048"))
+TEAM_METRICS_CACHE_TTL_MINUTES = float(os.getenv("TEAM_METRICS_CACHE_TTL_MINUTES", "360"))
+team_metrics_cache = AsyncTTLCache(
+    "team_metrics", maxsize=TEAM_METRICS_CACHE_SIZE, ttl=TEAM_METRICS_CACHE_TTL_MINUTES * 60
+)
 
 # ----------------------------------------------------------------------
 # FUNÇÕES DE ANÁLISE E MENSAGEM
 # ----------------------------------------------------------------------
 
-async def analyze_and_rate_fixture(fixture: Dict[str, Any], api_token: str) -> Optional[Dict[str, Any]]:
+async def analyze_and_rate_fixture(
+    fixture: Fixture,
+    api_token: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    min_confidence: int = MIN_CONFIDENCE,
+) -> Optional[Fixture]:
     """Analisa uma única partida, seleciona a MELHOR SUGESTÃO e retorna o objeto da partida."""
     
-    participants = fixture.get("participants", [])
-    if len(participants) < 2:
-        return None
-    
-    home_id = next((p["id"] for p in participants if p["meta"]["location"] == "home"), None)
-    away_id = next((p["id"] for p in participants if p["meta"]["location"] == "away"), None)
-
-    if not home_id or not away_id:
+    if not fixture.home_id or not fixture.away_id:
         return None
     
     # Análise de Métricas
-    hm, am = await asyncio.gather(
-        compute_team_metrics(api_token, home_id, last=5), 
-        compute_team_metrics(api_token, away_id, last=5)
-    )
+    with stage("team_metrics"):
+        hm, am = await asyncio.gather(
+            cached_team_metrics(api_token, fixture.home_id, last=5, session=session),
+            cached_team_metrics(api_token, fixture.away_id, last=5, session=session),
+        )
 
-    suggestion, confidence = decide_best_market(hm, am)
+    with stage("scoring"):
+        if MARKET_ENGINE == "poisson":
+            suggestion, confidence = decide_best_market_poisson(
+                hm, am, MARKET_THRESHOLDS, league_avg=league_goal_averages.get(fixture.competition_id)
+            )
+        else:
+            suggestion, confidence = decide_best_market(hm, am, MARKET_THRESHOLDS)
     
-    # Filtro: Apenas sinais fortes (>= MIN_CONFIDENCE)
-    if confidence < MIN_CONFIDENCE:
+    # Filtro: Apenas sinais fortes (>= min_confidence)
+    if confidence < min_confidence:
         return None
     
-    fixture['suggestion'] = suggestion
-    fixture['confidence'] = confidence
+    fixture.suggestion = suggestion
+    fixture.confidence = confidence
     return fixture
 
 
-async def build_top_n_message(top_fixtures: List[Dict[str, Any]]) -> str:
+async def cached_team_metrics(
+    api_token: str,
+    team_id: int,
+    last: int = 5,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> Union[TeamMetrics, TeamMetricsPanel]:
+    """
+    compute_team_metrics (ou o painel, com TEAM_METRICS_MODE=panel) através do
+    team_metrics_cache. A entrada vale enquanto o índice de forma não receber um jogo
+    novo do time; métricas vazias (falha na API) não são guardadas.
+    """
+    if TEAM_METRICS_MODE == "panel":
+        return await team_metrics_cache.get_or_load(
+            (team_id, "panel", TEAM_METRICS_HISTORY),
+            lambda: compute_team_metrics_panel(
+                api_token, team_id, history=TEAM_METRICS_HISTORY,
+                session=session, store=match_store, form_index=form_index,
+                min_games=min(TEAM_METRICS_PANEL_MIN_GAMES, TEAM_METRICS_HISTORY),
+            ),
+            version=form_index.latest_match_id(team_id),
+            cache_if=lambda panel: panel.history_games > 0,
+        )
+
+    return await team_metrics_cache.get_or_load(
+        (team_id, last),
+        lambda: compute_team_metrics(
+            api_token, team_id, last=last, session=session, store=match_store, form_index=form_index
+        ),
+        version=form_index.latest_match_id(team_id),
+        cache_if=lambda metrics: metrics.total_games > 0,
+    )
+
+
+def build_top_n_message(top_fixtures: List[Fixture], hours: float = HOURS_LIMIT) -> str:
     """Constrói a mensagem final consolidada para os TOP N jogos."""
     
     now = datetime.now(TZ)
     
     header = (
         f"🚨 ALERTA DE OPORTUNIDADES (TOP {len(top_fixtures)}) – {now.strftime('%d/%m/%Y %H:%M')}\n"
-        f"🔎 Próximas {HOURS_LIMIT} Horas\n"
+        f"🔎 Próximas {hours:g} Horas\n"
         f"──────────────────────────────\n"
     )
     
     message_parts = []
     
     for i, f in enumerate(top_fixtures):
-        participants = f.get("participants", [])
-        home = next((p for p in participants if p["meta"]["location"] == "home"), {})
-        away = next((p for p in participants if p["meta"]["location"] == "away"), {})
-
-        league_data = f.get("league", {})
-        league_name = league_data.get("name", "Desconhecida")
-        league_country_code = league_data.get("country", {}).get("code", "xx")
-        
         kickoff_local = kickoff_time_local(f, TZ)
-        league_flag = get_flag_emoji(league_country_code)
-        
-        home_name = home.get("name", "Casa")
-        away_name = away.get("name", "Fora")
-        
-        suggestion = f.get('suggestion', 'N/A')
-        confidence = f.get('confidence', 0)
+        league_flag = get_flag_emoji(f.country_code)
 
         part = (
-            f"{i+1}.** ⚽ {home_name} x {away_name}\n"
-            f"   🏆 {league_flag} {league_name}\n"
+            f"{i+1}.** ⚽ {f.home_name} x {f.away_name}\n"
+            f"   🏆 {league_flag} {f.league_name}\n"
             f"   🕒 {kickoff_local} (BRT)\n"
-            f"   🔥 Aposta: {suggestion}\n"
-            f"   📊 Confiança: {confidence}%\n"
+            f"   🔥 Aposta: {f.suggestion or 'N/A'}\n"
+            f"   📊 Confiança: {f.confidence}%\n"
         )
         message_parts.append(part)
     
@@ -139,105 +341,469 @@ async def build_top_n_message(top_fixtures: List[Dict[str, Any]]) -> str:
     return header + "\n".join(message_parts) + footer
 
 
-async def run_analysis_send():
+async def run_analysis_send(session: Optional[aiohttp.ClientSession] = None):
     """Executa o ciclo completo de busca, filtro, análise e ENVIO DAS MELHORES APOSTAS."""
     
     if API_TOKEN == "YOUR_FOOTBALLDATA_API_TOKEN":
         print("\n🚨 ERRO: Token da API (football-data.org) não configurado. Abortando execução.")
         return 
     
-    if CHAT_ID == "YOUR_CHAT_ID" or TELEGRAM_TOKEN == "YOUR_TELEGRAM_TOKEN":
+    if not SUBSCRIPTIONS or TELEGRAM_TOKEN == "YOUR_TELEGRAM_TOKEN":
         print("\n🚨 ERRO: CHAT_ID ou TELEGRAM_TOKEN não configurados. A análise será executada, mas a mensagem não será enviada.")
         
     # 1. Definir o range de tempo (24 HORAS)
     now_local = datetime.now(TZ)
-    time_limit_24h = now_local + timedelta(hours=HOURS_LIMIT)
+    time_limit_24h = now_local + timedelta(hours=ANALYSIS_HOURS)
     
-    print(f"DEBUG: Buscando jogos futuros. Limite de {HOURS_LIMIT}h: {time_limit_24h.strftime('%d/%m %H:%M')} (BRT)")
+    print(f"DEBUG: Buscando jogos futuros. Limite de {ANALYSIS_HOURS:g}h: {time_limit_24h.strftime('%d/%m %H:%M')} (BRT)")
 
     try:
-        # 2. Busca fixtures – Passamos o mapeamento de ligas para o analysis.py usar.
-        #    IMPORTANTE: Seu analysis.py precisará ser atualizado para receber e usar esta lista.
-        league_ids_to_fetch = [2000, 2001, 2002, 2003, 2013, 2014, 2015, 2016, 2017, 2018, 2019, 2021] # IDs de exemplo (precisam ser os IDs reais da API)
-        fixtures = await fetch_upcoming_fixtures(API_TOKEN, league_ids=league_ids_to_fetch, per_page=200) 
-        
-        if not fixtures:
-            return
+        # 2. Busca fixtures de todas as ligas em streaming: cada liga entra na análise
+        #    assim que chega (o filtro temporal e de início é aplicado pelo pipeline)
+        if shard_coordinator is not None:
+            source = {
+                index: _staged(shard_source, "fixture_fetch")
+                for index, shard_source in shard_coordinator.upcoming_sources(leagues_to_fetch()).items()
+            }
+        else:
+            source = _staged(
+                stream_upcoming_fixtures(API_TOKEN, league_ids=leagues_to_fetch(), session=session),
+                "fixture_fetch",
+            )
+        analyzed = await analyze_and_send(source, session, horizon=time_limit_24h)
+
+        print(f"DEBUG: Jogos dentro de {ANALYSIS_HOURS:g}h e não iniciados (restantes): {analyzed}.")
+        CYCLES_TOTAL.inc("ok" if analyzed else "empty")
         
+    except Exception as e:
+        CYCLES_TOTAL.inc("error")
+        print(f"❌ Erro em run_analysis_send: {e}")
+        try:
+            if SUBSCRIPTIONS:
+                 delivery.broadcast(f"❌ Erro na análise. Verifique os logs.", {s.chat_id for s in SUBSCRIPTIONS})
+        except Exception:
+            pass
+
+
+async def analyze_and_send(
+    fixtures: Union[List[Fixture], AsyncIterator[List[Fixture]], Dict[int, AsyncIterator[List[Fixture]]]],
+    session: Optional[aiohttp.ClientSession] = None,
+    notify_empty: bool = True,
+    horizon: Optional[datetime] = None,
+) -> int:
+    """
+    Analisa as partidas informadas (lista, stream de lotes ou um stream por shard),
+    escolhe as TOP N e envia o alerta. Retorna quantas partidas da janela entraram na análise.
+    """
+    started = datetime.now(TZ)
+    time_threshold = started + timedelta(minutes=MINUTES_BEFORE_KICKOFF)
+    seen_ids: Set[int] = set()
+
+    def accept(f: Fixture) -> bool:
         # 3. FILTRO TEMPORAL E DE INÍCIO
-        upcoming_fixtures: List[Dict[str, Any]] = []
-        time_threshold = now_local + timedelta(minutes=MINUTES_BEFORE_KICKOFF) 
+        if f.kickoff <= time_threshold or (horizon is not None and f.kickoff > horizon):
+            return False
+        seen_ids.add(f.id)
+        return True
 
-        for f in fixtures:
-            kickoff_dt = kickoff_time_local(f, TZ, return_datetime=True)
-            
-            if time_threshold < kickoff_dt <= time_limit_24h:
-                upcoming_fixtures.append(f)
+    min_confidence = min((s.min_confidence for s in active_subscriptions()), default=MIN_CONFIDENCE)
 
-        print(f"DEBUG: Jogos dentro de {HOURS_LIMIT}h e não iniciados (restantes): {len(upcoming_fixtures)}.")
-        
-        if not upcoming_fixtures:
-            return
-            
-        # 4. Analisa os jogos sequencialmente, com tempo de espera
-        analyzed_fixtures: List[Dict[str, Any]] = []
+    def build_pipeline(
+        source: AsyncIterator[List[Fixture]], api_token: str, http_session: Optional[aiohttp.ClientSession]
+    ) -> StreamingPipeline:
+        async def prepare(batch: List[Fixture]) -> None:
+            # 4. Atualiza o índice de forma com os resultados em massa das ligas do lote
+            #    (os times das partidas passam a ser respondidos sem requisição própria)
+            competition_ids = sorted({f.competition_id for f in batch if f.competition_id is not None})
+            with stage("form_index_refresh"):
+                await refresh_form_index(
+                    api_token, form_index, competition_ids,
+                    days_back=FORM_INDEX_DAYS_BACK, session=http_session, store=match_store,
+                    max_age=FORM_INDEX_MAX_AGE_MINUTES * 60,
+                )
+            if MARKET_ENGINE == "poisson":
+                league_goal_averages.update(competition_goal_averages(form_index.matches()))
 
-        for f in upcoming_fixtures:
-            # NOVO: Tempo de espera para evitar Rate Limit
-            await asyncio.sleep(SLEEP_TIME_BETWEEN_ANALYSIS) 
+        # 5. Workers analisam primeiro as partidas que começam antes; o RateLimiter
+        #    da chave segura a cota da API.
+        return StreamingPipeline(
+            _temporal_filter(source, accept),
+            lambda f: analyze_and_rate_fixture(f, api_token, http_session, min_confidence=min_confidence),
+            workers=PIPELINE_WORKERS,
+            prepare=prepare,
+        )
 
-            result = await analyze_and_rate_fixture(f, API_TOKEN)
-            if result is not None:
-                analyzed_fixtures.append(result)
-        
-        if not analyzed_fixtures:
-            message = f"⚠ Nenhuma partida TOP encontrada nas próximas {HOURS_LIMIT}h, com confiança acima de {MIN_CONFIDENCE}%."
-            if CHAT_ID != "YOUR_CHAT_ID":
-                await bot.send_message(chat_id=CHAT_ID, text=message)
-            else:
-                print(message)
-            return
+    if shard_coordinator is not None and isinstance(fixtures, (list, dict)):
+        # Um pipeline por shard (chave, cota e sessão próprias); os resultados chegam juntos
+        if isinstance(fixtures, list):
+            fixtures = {index: _single_batch(batch) for index, batch in shard_coordinator.split(fixtures).items()}
+        pipeline = shard_coordinator.pipeline(
+            fixtures, lambda shard, source: build_pipeline(source, shard.api_token, shard.session)
+        )
+    else:
+        pipeline = build_pipeline(
+            fixtures if not isinstance(fixtures, list) else _single_batch(fixtures), API_TOKEN, session
+        )
 
-        # 5. Ordena pela confiança (do maior para o menor)
-        analyzed_fixtures.sort(key=lambda x: (x.get('confidence', 0), x.get("starting_at", "")), reverse=True)
-        
-        # 6. Pega APENAS os TOP N jogos (os 4 primeiros da lista)
-        top_fixtures = analyzed_fixtures[:TOP_QTY]
+    # O prazo é recalculado a cada resultado: uma liga que chega depois pode trazer um
+    # kickoff mais cedo. O que não terminar até o prazo é cancelado e o TOP N sai com
+    # o que já foi calculado. Os reenvios HTTP das tasks do pipeline herdam o mesmo prazo.
+    early_ids: Set[int] = set()
+    with cycle_deadline_scope(lambda: _pipeline_deadline(pipeline, started).timestamp()):
+        results = pipeline.results()
+        try:
+            while True:
+                try:
+                    fixture, rated = await asyncio.wait_for(
+                        anext(results), timeout=_seconds_until(_pipeline_deadline(pipeline, started))
+                    )
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    print(f"⚠ Prazo do ciclo atingido: {pipeline.pending} de {pipeline.discovered} análises canceladas.")
+                    break
+                if rated is not None:
+                    scored_table.add(rated)
+                elif fixture.id not in pipeline.failed:
+                    # Caiu abaixo do corte nesta análise: a pontuação antiga não vale mais.
+                    # (Se a análise falhou com erro, a entrada anterior fica.)
+                    scored_table.remove(fixture.id)
 
-        # 7. Constrói a mensagem e envia
-        message = await build_top_n_message(top_fixtures)
-        
-        if CHAT_ID != "YOUR_CHAT_ID" and TELEGRAM_TOKEN != "YOUR_TELEGRAM_TOKEN":
-            await bot.send_message(chat_id=CHAT_ID, text=message, parse_mode="Markdown")
+                # Envio antecipado: os jogos que começam logo já estão todos analisados
+                if EARLY_SEND_MINUTES and not early_ids and pipeline.discovery_done:
+                    cutoff = datetime.now(TZ) + timedelta(minutes=EARLY_SEND_MINUTES)
+                    if pipeline.pending_until(cutoff) == 0:
+                        early = {f.id for f in map(scored_table.get, seen_ids) if f is not None and f.kickoff <= cutoff}
+                        if early:
+                            print(f"DEBUG: Envio antecipado de {len(early)} jogos com início em até {EARLY_SEND_MINUTES} min.")
+                            deliver_to_subscribers(datetime.now(TZ), early, notify_empty=False)
+                            early_ids = early
+        finally:
+            await results.aclose()
+
+    if not seen_ids:
+        return 0
+
+    now = datetime.now(TZ)
+    scored_table.prune(now)
+
+    # 6. Cada inscrição é respondida a partir da MESMA tabela pontuada
+    deliver_to_subscribers(now, seen_ids - early_ids, notify_empty)
+
+    global last_cycle_at
+    last_cycle_at = time.time()
+    save_state()
+    return len(seen_ids)
+
+
+async def _single_batch(fixtures: List[Fixture]) -> AsyncIterator[List[Fixture]]:
+    yield fixtures
+
+
+async def _temporal_filter(
+    source: AsyncIterator[List[Fixture]], accept: Callable[[Fixture], bool]
+) -> AsyncIterator[List[Fixture]]:
+    """Aplica o filtro temporal a cada lote (medido como a etapa 'temporal_filter')."""
+    async for batch in source:
+        with stage("temporal_filter"):
+            accepted = [f for f in batch if accept(f)]
+        if accepted:
+            yield accepted
+
+
+async def _staged(source: AsyncIterator[List[Fixture]], name: str) -> AsyncIterator[List[Fixture]]:
+    """Mede a etapa 'name' do início ao fim de um stream de lotes."""
+    with stage(name):
+        async for batch in source:
+            yield batch
+
+
+def _pipeline_deadline(pipeline: Union[StreamingPipeline, ShardedPipeline], started: datetime) -> datetime:
+    """Prazo do ciclo: antes do primeiro kickoff já descoberto e nunca após CYCLE_MAX_MINUTES."""
+    deadline = started + timedelta(minutes=CYCLE_MAX_MINUTES)
+    if pipeline.earliest_kickoff is not None:
+        deadline = min(deadline, pipeline.earliest_kickoff - timedelta(minutes=MINUTES_BEFORE_KICKOFF))
+    return deadline
+
+
+def notify_live_updates(updates: List[LiveUpdate]):
+    """Avisa green/red dos mercados decididos no snapshot ao vivo apenas aos chats que receberam o alerta."""
+    outbox: Dict[str, List[str]] = {}
+
+    for u in updates:
+        if not u.settled_now:
+            continue
+        f, m = u.fixture, u.match
+        phase = {"PAUSED": "Intervalo", "FINISHED": "Final"}.get(m.status, "Ao vivo")
+        message = (
+            f"🔴 AO VIVO | {get_flag_emoji(f.country_code)} {f.league_name}\n"
+            f"⚽ {f.home_name} {m.home_goals or 0} x {m.away_goals or 0} {f.away_name} ({phase})\n"
+            f"🔥 Aposta: {f.suggestion}\n"
+            f"{'✅ GREEN' if u.market_state else '❌ RED'}"
+        )
+        outbox[message] = [chat_id for chat_id, sent in sent_alerts.items() if f.id in sent]
+
+    for message, chat_ids in outbox.items():
+        targets = [c for c in chat_ids if c]
+        if TELEGRAM_TOKEN == "YOUR_TELEGRAM_TOKEN":
+            print(message)
+        elif targets:
+            delivery.broadcast(message, targets)
+
+
+live_monitor: Optional[LiveMonitor] = (
+    LiveMonitor(
+        API_TOKEN,
+        notify_live_updates,
+        fast_interval=LIVE_FAST_SECONDS,
+        normal_interval=LIVE_NORMAL_SECONDS,
+        idle_interval=LIVE_IDLE_SECONDS,
+    )
+    if LIVE_MODE else None
+)
+
+
+def leagues_to_fetch() -> List[int]:
+    """Ligas pedidas por alguma inscrição (todas, se alguma inscrição não restringir ligas)."""
+    subs = active_subscriptions()
+    if any(s.league_ids is None for s in subs):
+        return LEAGUE_IDS_TO_FETCH
+    return sorted(set().union(*(s.league_ids for s in subs)))
+
+
+def active_subscriptions() -> List[Subscription]:
+    """Inscrições configuradas; sem nenhuma, um destino 'console' com os filtros globais."""
+    return SUBSCRIPTIONS or [Subscription(chat_id="", hours=HOURS_LIMIT, min_confidence=MIN_CONFIDENCE, top_n=TOP_QTY)]
+
+
+def deliver_to_subscribers(now: datetime, fixture_ids: Optional[Set[int]] = None, notify_empty: bool = True):
+    """Monta o TOP N de cada inscrição (ligas, janela, confiança) e enfileira o envio."""
+
+    # Inscrições com o mesmo resultado compartilham a mesma mensagem (um único broadcast)
+    outbox: Dict[Tuple[str, Optional[str]], List[str]] = {}
+    alerted: Dict[Tuple[str, Optional[str]], List[Fixture]] = {}
+    delivered: List[Fixture] = []
+    min_lead = timedelta(minutes=MINUTES_BEFORE_KICKOFF)
+
+    for sub in active_subscriptions():
+        # 7. TOP N da inscrição (ordenado por confiança), sem as partidas já enviadas ao chat
+        already_sent = sent_alerts.get(sub.chat_id)
+        top_fixtures = scored_table.query(
+            sub, now, min_lead=min_lead, fixture_ids=fixture_ids, exclude=already_sent
+        )
+
+        # 8. Constrói a mensagem
+        if top_fixtures:
+            with stage("message_build"):
+                message = build_top_n_message(top_fixtures, hours=sub.hours)
+            outbox.setdefault((message, "Markdown"), []).append(sub.chat_id)
+            alerted[(message, "Markdown")] = top_fixtures
+        elif notify_empty and not (already_sent and scored_table.query(sub, now, min_lead=min_lead, fixture_ids=fixture_ids)):
+            message = f"⚠ Nenhuma partida TOP encontrada nas próximas {sub.hours:g}h, com confiança acima de {sub.min_confidence}%."
+            outbox.setdefault((message, None), []).append(sub.chat_id)
+
+    for key, chat_ids in outbox.items():
+        message, parse_mode = key
+        targets = [c for c in chat_ids if c]
+        if targets and TELEGRAM_TOKEN != "YOUR_TELEGRAM_TOKEN":
+            # Apenas enfileira: a entrega (vários chats, limites do Telegram) roda em paralelo
+            delivery.broadcast(message, targets, parse_mode=parse_mode)
+            for chat_id in targets:
+                for f in alerted.get(key, []):
+                    sent_alerts.setdefault(chat_id, {})[f.id] = f.kickoff.timestamp()
+            delivered.extend(alerted.get(key, []))
         else:
-            print(f"--- MENSAGEM TOP {len(top_fixtures)} PRONTA (NÃO ENVIADA) ---")
+            print("--- MENSAGEM PRONTA (NÃO ENVIADA) ---")
             print(message)
             print("-----------------------------------")
-        
+            if TELEGRAM_TOKEN == "YOUR_TELEGRAM_TOKEN":
+                delivered.extend(alerted.get(key, []))  # Modo console: o ao vivo também só imprime
+
+    # O modo ao vivo acompanha só as partidas que de fato foram alertadas
+    if live_monitor is not None and delivered:
+        live_monitor.watch(delivered)
+
+
+def save_state():
+    """Grava o snapshot de aquecimento (partidas pontuadas, índice de forma, alertas enviados)."""
+    if not SNAPSHOT_PATH:
+        return
+    expired = time.time() - SENT_ALERTS_RETENTION_HOURS * 3600
+    for sent in sent_alerts.values():
+        for fixture_id in [i for i, kickoff in sent.items() if kickoff <= expired]:
+            del sent[fixture_id]
+    try:
+        state = build_snapshot(
+            scored_table.fixtures(), form_index, sent_alerts, cycle_at=last_cycle_at,
+            live_fixtures=live_monitor.watched() if live_monitor is not None else (),
+        )
+        size = save_snapshot(SNAPSHOT_PATH, state)
+        print(f"DEBUG: Snapshot salvo em {SNAPSHOT_PATH} ({size / 1024:.1f} KB).")
     except Exception as e:
-        print(f"❌ Erro em run_analysis_send: {e}")
-        try:
-            if CHAT_ID != "YOUR_CHAT_ID":
-                 await bot.send_message(chat_id=CHAT_ID, text=f"❌ Erro na análise. Verifique os logs.")
-        except Exception:
-            pass
-            
+        print(f"⚠ Falha ao salvar o snapshot: {e}")
+
+
+def restore_state() -> Optional[float]:
+    """Carrega o snapshot salvo. Retorna a idade (segundos) do último ciclo, ou None."""
+    global last_cycle_at
+    state = load_snapshot(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+    if state is None:
+        return None
+
+    form_index.load_state(state.get("form_index", {}))
+    sent_alerts.update(sent_alerts_from_snapshot(state, retention=SENT_ALERTS_RETENTION_HOURS * 3600))
+    now = datetime.now(TZ)
+    snapshot_fixtures = fixtures_from_snapshot(state)
+    restored = [f for f in snapshot_fixtures if f.kickoff > now]
+    for f in restored:
+        scored_table.add(f)
+    if live_monitor is not None:
+        # Volta a acompanhar os alertas enviados, inclusive os jogos já em andamento
+        alerted_ids = set().union(*sent_alerts.values())
+        live_monitor.watch(
+            f for f in snapshot_fixtures + fixtures_from_snapshot(state, "live_fixtures")
+            if f.id in alerted_ids and f.kickoff + live_monitor.match_duration > now
+        )
+
+    last_cycle_at = state.get("cycle_at")
+    age = time.time() - last_cycle_at if last_cycle_at else None
+    print(
+        f"✅ Snapshot restaurado: {len(restored)} partidas pontuadas, {len(form_index)} times no índice, "
+        f"{sum(len(s) for s in sent_alerts.values())} alertas já enviados"
+        + (f" (ciclo de {age / 60:.0f} min atrás)." if age is not None else ".")
+    )
+    return age
+
+
+def _seconds_until(deadline: datetime) -> float:
+    return max(0.0, (deadline - datetime.now(TZ)).total_seconds())
+
+
+async def run_kickoff_batch(fixtures: List[Fixture], session: Optional[aiohttp.ClientSession] = None):
+    """Job do modo 'kickoff': analisa e envia o resumo de um grupo de partidas com início próximo."""
+    
+    time_threshold = datetime.now(TZ) + timedelta(minutes=MINUTES_BEFORE_KICKOFF)
+    pending = [f for f in fixtures if f.kickoff > time_threshold]
+    if not pending:
+        return
+
+    print(f"DEBUG: Analisando grupo de {len(pending)} jogos (primeiro às {kickoff_time_local(pending[0], TZ)} BRT).")
+    try:
+        await analyze_and_send(pending, session, notify_empty=False)
+    except Exception as e:
+        print(f"❌ Erro em run_kickoff_batch: {e}")
+
+
+async def plan_kickoff_analysis(scheduler: AsyncIOScheduler, session: Optional[aiohttp.ClientSession] = None):
+    """
+    Modo 'kickoff': busca a lista de partidas (1 requisição) e agenda uma análise por
+    grupo de kickoffs, KICKOFF_LEAD_MINUTES antes do primeiro jogo de cada grupo.
+    """
+    if API_TOKEN == "YOUR_FOOTBALLDATA_API_TOKEN":
+        print("\n🚨 ERRO: Token da API (football-data.org) não configurado. Abortando planejamento.")
+        return
+
+    try:
+        fixtures = await fetch_upcoming_fixtures(API_TOKEN, league_ids=leagues_to_fetch(), session=session)
+        # Lido depois da busca: grupos atrasados viram 'now' e não podem nascer no passado
+        now = datetime.now(TZ)
+        window = [f for f in fixtures if f.kickoff <= now + timedelta(hours=ANALYSIS_HOURS)]
+
+        batches = plan_kickoff_jobs(
+            window,
+            now=now,
+            lead_time=timedelta(minutes=KICKOFF_LEAD_MINUTES),
+            batch_window=timedelta(minutes=KICKOFF_BATCH_WINDOW_MINUTES),
+            min_lead=timedelta(minutes=MINUTES_BEFORE_KICKOFF),
+        )
+    except Exception as e:
+        print(f"❌ Erro em plan_kickoff_analysis: {e}")
+        return
+
+    # Substitui o plano anterior: partidas podem ter mudado de horário desde a última busca
+    for job in scheduler.get_jobs():
+        if job.id.startswith("kickoff-"):
+            job.remove()
+
+    for i, batch in enumerate(batches):
+        # Corrotina como job: o AsyncIOExecutor roda no loop (callables comuns iriam para threads).
+        # Vários grupos atrasados têm o mesmo run_at, então o id usa o índice e a primeira partida.
+        scheduler.add_job(
+            run_kickoff_job,
+            "date",
+            run_date=batch.run_at,
+            args=[batch.fixtures, session],
+            id=f"kickoff-{i}-{batch.fixtures[0].id}",
+            replace_existing=True,
+            misfire_grace_time=KICKOFF_MISFIRE_GRACE_SECONDS,
+            coalesce=True,
+        )
+        print(f"DEBUG: Grupo de {len(batch.fixtures)} jogos agendado para {batch.run_at.astimezone(TZ).strftime('%d/%m %H:%M')} (BRT).")
+
 # ----------------------------------------------------------------------
 # SCHEDULER E EXECUÇÃO PRINCIPAL 
 # ----------------------------------------------------------------------
 
-def start_scheduler():
+async def run_cycle(session: Optional[aiohttp.ClientSession] = None):
+    """Dispara run_analysis_send pelo coordenador (sem ciclos sobrepostos)."""
+    await run_coordinator.run("analysis", lambda: run_analysis_send(session))
+
+
+async def run_kickoff_job(fixtures: List[Fixture], session: Optional[aiohttp.ClientSession] = None):
+    """Grupo do modo kickoff pelo coordenador: espera (em vez de fundir) se outra análise estiver rodando."""
+    await run_coordinator.run("analysis", lambda: run_kickoff_batch(fixtures, session), queue=True)
+
+
+async def run_kickoff_plan(scheduler: AsyncIOScheduler, session: Optional[aiohttp.ClientSession] = None):
+    """Replanejamento do modo kickoff pelo coordenador."""
+    await run_coordinator.run("plan", lambda: plan_kickoff_analysis(scheduler, session))
+
+
+def start_scheduler(session: Optional[aiohttp.ClientSession] = None) -> AsyncIOScheduler:
     """Inicia o agendador de tarefas."""
     scheduler = AsyncIOScheduler(timezone=TZ)
     
-    # Horários de execução (BRT)
-    scheduler.add_job(lambda: asyncio.create_task(run_analysis_send()), "cron", hour=0, minute=0) 
-    scheduler.add_job(lambda: asyncio.create_task(run_analysis_send()), "cron", hour=6, minute=0) 
-    scheduler.add_job(lambda: asyncio.create_task(run_analysis_send()), "cron", hour=16, minute=0) 
-    scheduler.add_job(lambda: asyncio.create_task(run_analysis_send()), "cron", hour=19, minute=0) 
+    if SCHEDULER_MODE == "kickoff":
+        # Replaneja periodicamente; as análises rodam por grupo de kickoff
+        scheduler.add_job(
+            run_kickoff_plan, "interval", hours=KICKOFF_REPLAN_HOURS,
+            args=[scheduler, session], next_run_time=datetime.now(TZ),
+        )
+        scheduler.start()
+        print(f"✅ Agendador iniciado no modo kickoff (análise {KICKOFF_LEAD_MINUTES} min antes de cada grupo).")
+        return scheduler
+
+    # Horários de execução (BRT); o coordenador impede ciclos sobrepostos
+    for hour in (0, 6, 16, 19):
+        scheduler.add_job(run_cycle, "cron", hour=hour, minute=0, args=[session])
     
     scheduler.start()
-    print("✅ Agendador iniciado para 06:00, 12:00, e 19:00 (BRT).")
+    print("✅ Agendador iniciado para 00:00, 06:00, 16:00 e 19:00 (BRT).")
+    return scheduler
+
+def build_status(scheduler: AsyncIOScheduler) -> Dict[str, Any]:
+    """Estado atual do bot para o endpoint /status."""
+    next_runs = [job.next_run_time for job in scheduler.get_jobs() if job.next_run_time]
+    return {
+        "scheduler_mode": SCHEDULER_MODE,
+        "next_run": min(next_runs).isoformat() if next_runs else None,
+        "runs": run_coordinator.status,
+        "subscriptions": len(SUBSCRIPTIONS),
+        "caches": {
+            "form_index_teams": len(form_index),
+            "match_store_matches": match_store.count(),
+            "scored_fixtures": len(scored_table),
+            "team_metrics": team_metrics_cache.stats(),
+            "sent_alerts": sum(len(s) for s in sent_alerts.values()),
+        },
+        "last_cycle_at": datetime.fromtimestamp(last_cycle_at, TZ).isoformat() if last_cycle_at else None,
+        "rate_limiter": API_RATE_LIMITER.stats(),
+        "http": {"retry": API_RETRY_POLICY.stats(), "circuit": API_CIRCUIT_BREAKER.stats()},
+        "shards": shard_coordinator.stats() if shard_coordinator is not None else None,
+        "delivery": delivery.stats(),
+        "live": live_monitor.stats() if live_monitor is not None else None,
+    }
+
 
 async def main():
     """Função principal que mantém o bot rodando."""
@@ -245,22 +811,59 @@ async def main():
     missing = []
     if API_TOKEN == "YOUR_FOOTBALLDATA_API_TOKEN": missing.append("API_TOKEN") 
     if TELEGRAM_TOKEN == "YOUR_TELEGRAM_TOKEN": missing.append("TELEGRAM_TOKEN")
-    if CHAT_ID == "YOUR_CHAT_ID": missing.append("CHAT_ID")
+    if not SUBSCRIPTIONS: missing.append("CHAT_ID")
         
     if missing:
         print("🚨 ATENÇÃO: Variáveis de ambiente ausentes ou com valor default:", missing)
 
-    start_scheduler()
-    
-    if os.getenv("TEST_NOW", "0") == "1":
-        print("TEST_NOW=1 -> enviando teste imediato...")
-        await run_analysis_send()
-        
+    # Sessão HTTP única (pool + keep-alive + cache DNS) para todo o ciclo de análise
+    session = create_http_session(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+    )
+
+    status_runner = None
+    live_task = None
+    snapshot_age = restore_state()
     try:
+        delivery.start()
+        scheduler = start_scheduler(session)
+        if shard_coordinator is not None:
+            shard_coordinator.open()
+            print(f"✅ Modo em shards: {len(shard_coordinator)} chaves da API dividindo as ligas.")
+
+        if live_monitor is not None:
+            live_task = asyncio.create_task(live_monitor.run(session))
+            print("✅ Modo ao vivo ativado (green/red das partidas alertadas).")
+
+        # Servidor de saúde/status/métricas no mesmo event loop do bot
+        status_runner = await keep_alive(lambda: build_status(scheduler), port=STATUS_PORT)
+        
+        if os.getenv("TEST_NOW", "0") == "1":
+            if snapshot_age is not None and snapshot_age < SNAPSHOT_FRESH_MINUTES * 60:
+                # Snapshot recente: responde da tabela restaurada, sem ciclo completo na API
+                print("TEST_NOW=1 -> enviando a partir do snapshot (sem repetir alertas)...")
+                deliver_to_subscribers(datetime.now(TZ), notify_empty=False)
+            else:
+                print("TEST_NOW=1 -> enviando teste imediato...")
+                await run_cycle(session)
+            
         while True:
             await asyncio.sleep(60 * 60) 
     except Exception as e:
         print(f"Erro no loop principal: {e}")
+    finally:
+        save_state()
+        if live_task is not None:
+            live_task.cancel()
+            await asyncio.gather(live_task, return_exceptions=True)
+        if status_runner is not None:
+            await status_runner.cleanup()
+        await delivery.stop()
+        if shard_coordinator is not None:
+            await shard_coordinator.close()
+        await session.close()
         
 if __name__ == "__main__":
     try:
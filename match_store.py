@@ -0,0 +1,153 @@
+# Armazenamento local (SQLite) das partidas finalizadas
+import sqlite3
+import time
+from typing import Dict, Any, List, Optional, Iterable
+
+
+class MatchStore:
+    """
+    Base local de partidas FINALIZADAS, indexada por time e data (utcDate).
+    Partidas finalizadas não mudam, então compute_team_metrics lê daqui primeiro
+    e só pede à API o que for mais novo que a última partida guardada.
+    """
+
+    def __init__(self, path: str = "matches.db", refresh_interval: float = 6 * 60 * 60):
+        self.path = path
+        # Intervalo mínimo (segundos) entre sincronizações do mesmo time com a API
+        self.refresh_interval = refresh_interval
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS matches (
+                id INTEGER PRIMARY KEY,
+                utc_date TEXT NOT NULL,
+                competition_id INTEGER,
+                home_id INTEGER NOT NULL,
+                away_id INTEGER NOT NULL,
+                home_name TEXT,
+                away_name TEXT,
+                ft_home INTEGER,
+                ft_away INTEGER,
+                ht_home INTEGER,
+                ht_away INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_matches_home ON matches (home_id, utc_date);
+            CREATE INDEX IF NOT EXISTS idx_matches_away ON matches (away_id, utc_date);
+            CREATE TABLE IF NOT EXISTS team_sync (
+                team_id INTEGER PRIMARY KEY,
+                synced_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def upsert_matches(self, matches: Iterable[Dict[str, Any]]) -> int:
+        """Grava partidas no formato da API (apenas status FINISHED). Retorna quantas foram gravadas."""
+        rows = []
+        for m in matches:
+            if m.get("status", "FINISHED") != "FINISHED" or not m.get("utcDate"):
+                continue
+            score = m.get("score") or {}
+            ft = score.get("fullTime") or {}
+            ht = score.get("halfTime") or {}
+            home = m.get("homeTeam") or {}
+            away = m.get("awayTeam") or {}
+            if home.get("id") is None or away.get("id") is None:
+                continue
+            rows.append((
+                m["id"], m["utcDate"], (m.get("competition") or {}).get("id"),
+                home["id"], away["id"], home.get("name"), away.get("name"),
+                ft.get("home"), ft.get("away"), ht.get("home"), ht.get("away"),
+            ))
+
+        if rows:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def mark_synced(self, team_id: int, when: Optional[float] = None) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO team_sync VALUES (?, ?)", (team_id, when or time.time())
+        )
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def needs_refresh(self, team_id: int) -> bool:
+        """True se o time nunca foi sincronizado ou a última sincronização expirou."""
+        row = self._conn.execute(
+            "SELECT synced_at FROM team_sync WHERE team_id = ?", (team_id,)
+        ).fetchone()
+        return row is None or time.time() - row["synced_at"] >= self.refresh_interval
+
+    def latest_date(self, team_id: int) -> Optional[str]:
+        """utcDate da partida mais recente guardada para o time."""
+        row = self._conn.execute(
+            "SELECT MAX(utc_date) AS latest FROM matches WHERE home_id = ? OR away_id = ?",
+            (team_id, team_id),
+        ).fetchone()
+        return row["latest"] if row else None
+
+    def count(self, team_id: Optional[int] = None) -> int:
+        if team_id is None:
+            return self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM matches WHERE home_id = ? OR away_id = ?", (team_id, team_id)
+        ).fetchone()[0]
+
+    def recent_matches(self, team_id: int, limit: int = 5) -> List[Dict[str, Any]]:
+        """Últimas 'limit' partidas do time, da mais recente para a mais antiga, no formato da API."""
+        rows = self._conn.execute(
+            """
+            SELECT * FROM (
+                SELECT * FROM matches WHERE home_id = ?
+                UNION
+                SELECT * FROM matches WHERE away_id = ?
+            ) ORDER BY utc_date DESC LIMIT ?
+            """,
+            (team_id, team_id, limit),
+        ).fetchall()
+        return [_row_to_match(r) for r in rows]
+
+    def all_matches(self, competition_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Todas as partidas guardadas (opcionalmente de algumas competições), em ordem de data."""
+        if competition_ids is None:
+            rows = self._conn.execute("SELECT * FROM matches ORDER BY utc_date, id").fetchall()
+        else:
+            ids = list(competition_ids)
+            placeholders = ",".join("?" * len(ids))
+            rows = self._conn.execute(
+                f"SELECT * FROM matches WHERE competition_id IN ({placeholders}) ORDER BY utc_date, id", ids
+            ).fetchall()
+        return [_row_to_match(r) for r in rows]
+
+
+def _row_to_match(row: sqlite3.Row) -> Dict[str, Any]:
+    """Converte uma linha da tabela de volta para o formato de partida da API."""
+    return {
+        "id": row["id"],
+        "utcDate": row["utc_date"],
+        "status": "FINISHED",
+        "competition": {"id": row["competition_id"]},
+        "homeTeam": {"id": row["home_id"], "name": row["home_name"]},
+        "awayTeam": {"id": row["away_id"], "name": row["away_name"]},
+        "score": {
+            "fullTime": {"home": row["ft_home"], "away": row["ft_away"]},
+            "halfTime": {"home": row["ht_home"], "away": row["ht_away"]},
+        },
+    }
@@ -0,0 +1,69 @@
+# Registros tipados e compactos usados no pipeline (substituem os dicts aninhados)
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+
+@dataclass(slots=True)
+class Fixture:
+    """Partida futura já resolvida: times de casa/fora e kickoff (UTC, tz-aware) parseado na ingestão."""
+    id: int
+    kickoff: datetime
+    competition_id: Optional[int]
+    league_name: str
+    country_code: str
+    home_id: int
+    home_name: str
+    away_id: int
+    away_name: str
+    status: str = "SCHEDULED"
+    suggestion: Optional[str] = None
+    confidence: int = 0
+
+
+@dataclass(slots=True)
+class TeamMetrics:
+    """Métricas agregadas dos últimos jogos de um time (entrada de decide_best_market)."""
+    team_id: Optional[int] = None
+    avg_gs: float = 0.0
+    avg_gc: float = 0.0
+    form_score: float = 0.0
+    avg_corners_for: float = 0.0
+    avg_ht_goals_for: float = 0.0
+    btts_count: int = 0
+    total_games: int = 0
+
+
+@dataclass(slots=True)
+class TeamMetricsPanel:
+    """
+    Várias janelas de métricas do mesmo time, calculadas numa única passada sobre o
+    histórico: últimos N jogos (windows), só jogos em casa / só fora e a forma com
+    peso exponencial (jogos recentes pesam mais). decide_best_market aceita o painel.
+    """
+    team_id: Optional[int]
+    windows: Dict[int, TeamMetrics]
+    home: TeamMetrics
+    away: TeamMetrics
+    ewma_form: float = 0.0
+    history_games: int = 0
+
+    def window(self, last: int) -> TeamMetrics:
+        """Janela 'last' (ou a maior janela menor que ela, se não foi calculada)."""
+        if last in self.windows:
+            return self.windows[last]
+        smaller = [n for n in self.windows if n <= last]
+        return self.windows[max(smaller)] if smaller else TeamMetrics(team_id=self.team_id)
+
+
+@dataclass(slots=True)
+class LiveMatch:
+    """Estado de uma partida em andamento (IN_PLAY/PAUSED) em um snapshot do modo ao vivo."""
+    id: int
+    competition_id: Optional[int]
+    kickoff: datetime
+    status: str
+    home_goals: Optional[int] = None
+    away_goals: Optional[int] = None
+    ht_home: Optional[int] = None
+    ht_away: Optional[int] = None
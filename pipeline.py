@@ -0,0 +1,151 @@
+# Pipeline de análise em streaming: descoberta -> métricas -> pontuação, por prioridade de kickoff
+import asyncio
+import heapq
+import itertools
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from models import Fixture
+
+# Marca de fim para os workers (ordena depois de qualquer kickoff real)
+_END = (datetime.max.replace(tzinfo=timezone.utc), float("inf"), None)
+_DONE = object()
+
+
+class TopNHeap:
+    """
+    Mantém apenas as N melhores partidas por (confiança, kickoff), em um min-heap de
+    tamanho N: cada inserção custa O(log N) e nunca guardamos a lista inteira.
+    Empates seguem a ordenação original do bot (sort reverso por confiança e kickoff).
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self._heap: List[Tuple[int, datetime, int, Fixture]] = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, fixture: Fixture) -> None:
+        if self.n <= 0:
+            return
+        # seq negativo: no empate total, a primeira inserida fica (como no sort estável)
+        entry = (fixture.confidence, fixture.kickoff, -next(self._seq), fixture)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, entry)
+        elif entry[:3] > self._heap[0][:3]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> List[Fixture]:
+        """Partidas do heap, da melhor para a pior."""
+        return [entry[3] for entry in sorted(self._heap, key=lambda e: e[:3], reverse=True)]
+
+
+class StreamingPipeline:
+    """
+    Liga a descoberta de partidas (um async iterator de lotes, ex. uma competição por
+    vez) à análise, sem esperar todas as ligas responderem.
+
+    Cada lote passa por 'prepare' (ex.: atualizar o índice de forma daquela liga) e entra
+    numa fila de prioridade por kickoff: os workers sempre analisam primeiro a partida
+    que começa antes. 'results()' entrega cada análise concluída assim que termina.
+    Uma análise que falhou com exceção também sai com resultado None, mas o id fica em
+    'failed' (para não confundir "abaixo do corte" com "erro").
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[List[Fixture]],
+        analyze: Callable[[Fixture], Awaitable[Optional[Fixture]]],
+        workers: int = 8,
+        accept: Optional[Callable[[Fixture], bool]] = None,
+        prepare: Optional[Callable[[List[Fixture]], Awaitable[None]]] = None,
+    ):
+        self.source = source
+        self.analyze = analyze
+        self.workers = max(1, workers)
+        self.accept = accept
+        self.prepare = prepare
+        self.earliest_kickoff: Optional[datetime] = None
+        self.discovered = 0
+        self.discovery_done = False
+        self.failed: Set[int] = set()
+        self._pending: Dict[int, datetime] = {}  # id -> kickoff (em preparo, na fila ou em análise)
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._out: asyncio.Queue = asyncio.Queue()
+        self._seq = itertools.count()
+        self._workers_done = 0
+
+    @property
+    def pending(self) -> int:
+        """Partidas aceitas que ainda não terminaram de ser analisadas."""
+        return len(self._pending)
+
+    def pending_until(self, cutoff: datetime) -> int:
+        """Quantas partidas com kickoff <= cutoff ainda não terminaram de ser analisadas."""
+        return sum(1 for kickoff in self._pending.values() if kickoff <= cutoff)
+
+    async def results(self) -> AsyncIterator[Tuple[Fixture, Optional[Fixture]]]:
+        """Entrega (partida, resultado da análise) a cada análise concluída, em ordem de término."""
+        worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        discovery_task = asyncio.create_task(self._discover())
+        try:
+            while True:
+                item = await self._out.get()
+                if item is _DONE:
+                    break
+                yield item
+            await discovery_task  # Propaga erros da descoberta
+        finally:
+            for task in (discovery_task, *worker_tasks):
+                task.cancel()
+            await asyncio.gather(discovery_task, *worker_tasks, return_exceptions=True)
+
+    async def _discover(self) -> None:
+        ingest_tasks = []
+        try:
+            async for batch in self.source:
+                accepted = [f for f in batch if self.accept is None or self.accept(f)]
+                if not accepted:
+                    continue
+                self.discovered += len(accepted)
+                for f in accepted:
+                    self._pending[f.id] = f.kickoff
+                    if self.earliest_kickoff is None or f.kickoff < self.earliest_kickoff:
+                        self.earliest_kickoff = f.kickoff
+                ingest_tasks.append(asyncio.create_task(self._ingest(accepted)))
+            await asyncio.gather(*ingest_tasks)
+        finally:
+            self.discovery_done = True
+            for _ in range(self.workers):
+                self._queue.put_nowait(_END)
+
+    async def _ingest(self, batch: List[Fixture]) -> None:
+        if self.prepare is not None:
+            try:
+                await self.prepare(batch)
+            except Exception as e:
+                print(f"❌ Erro ao preparar lote de {len(batch)} jogos: {e}")
+        for f in batch:
+            self._queue.put_nowait((f.kickoff, next(self._seq), f))
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, fixture = await self._queue.get()
+            if fixture is None:
+                break
+            result = None
+            try:
+                result = await self.analyze(fixture)
+            except Exception as e:
+                self.failed.add(fixture.id)
+                print(f"❌ Erro ao analisar partida {fixture.id}: {e}")
+            finally:
+                self._pending.pop(fixture.id, None)
+            self._out.put_nowait((fixture, result))
+
+        # O último worker a sair avisa o fim do stream
+        self._workers_done += 1
+        if self._workers_done == self.workers:
+            self._out.put_nowait(_DONE)
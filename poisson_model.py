@@ -0,0 +1,241 @@
+# Motor de mercados por modelo de Poisson (alternativa às heurísticas de decide_best_market)
+#
+# Força de ataque e de defesa de cada time vêm das médias de gols dos últimos jogos
+# (as mesmas colunas de metrics_to_columns). Para cada partida o modelo monta a matriz
+# de probabilidades de placar (0..MAX_GOALS x 0..MAX_GOALS) e todos os mercados saem
+# dela numa única operação NumPy sobre o lote inteiro. Escanteios são simulados nos
+# dados, então ficam de fora.
+#
+# A média de gols da liga é sempre explícita (por competição, das partidas finalizadas
+# já conhecidas: competition_goal_averages no bot, a mesma conta em janela móvel no
+# backtest), para o bot e o backtest pontuarem igual. A confiança não é a probabilidade
+# crua: é a vantagem do mercado sobre a mesma partida entre dois times médios da liga,
+# na escala 50-99 da heurística (senão 1X/X2/Over 0.5 HT ganhariam sempre).
+#
+# Uso: MARKET_ENGINE=poisson python main.py  |  python backtest.py --engine poisson ...
+import math
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from analysis import (
+    DEFAULT_THRESHOLDS,
+    MarketThresholds,
+    metrics_from_panel,
+    metrics_to_columns,
+    select_best_markets,
+)
+from models import TeamMetrics, TeamMetricsPanel
+
+MAX_GOALS = 10
+LEAGUE_AVG_GOALS = 1.35  # Gols por time por jogo quando a competição não tem jogos suficientes
+MIN_MATCHES_FOR_LEAGUE_AVG = 20
+HOME_ADVANTAGE = 1.10    # Multiplica a média esperada da casa e divide a do visitante
+SHRINK_GAMES = 2.0       # Jogos "fictícios" na média da liga: puxa amostras curtas para o centro
+HT_SHARE = 0.45          # Fração dos gols no 1º tempo quando o histórico não informa
+MIN_EDGE = 0.05          # Vantagem mínima sobre a partida média para sugerir o mercado
+
+# Rótulos iguais aos da heurística (market_code/market_hit e o modo ao vivo conferem pelo texto)
+MARKET_LABELS: Dict[str, str] = {
+    "Over 2.5 FT": "Mais de 2.5 Gols (Over 2.5 FT)",
+    "Over 1.5 FT": "Mais de 1.5 Gols (Over 1.5 FT)",
+    "Under 2.5 FT": "Menos de 2.5 Gols (Under 2.5 FT)",
+    "ML Home": "Vitória do Time da Casa (ML Home)",
+    "ML Away": "Vitória do Time Visitante (ML Away)",
+    "1X": "Dupla Chance: Casa ou Empate (1X)",
+    "X2": "Dupla Chance: Fora ou Empate (X2)",
+    "AH Home": "Handicap Asiático: Casa (0.0)",
+    "AH Away": "Handicap Asiático: Fora (0.0)",
+    "BTTS Yes": "Ambas Marcam: SIM (BTTS Yes)",
+    "BTTS No": "Ambas Marcam: NÃO (BTTS No)",
+    "Over 1.5 HT": "Mais de 1.5 Gols (Over 1.5 HT)",
+    "Over 0.5 HT": "Mais de 0.5 Gols (Over 0.5 HT)",
+}
+
+_GOALS = np.arange(MAX_GOALS + 1)
+_LOG_FACTORIAL = np.array([math.lgamma(k + 1) for k in _GOALS])
+_HOME_GOALS, _AWAY_GOALS = np.meshgrid(_GOALS, _GOALS, indexing="ij")
+
+# Mercados FT lidos da matriz de placar: máscara [casa, fora] de cada um
+_SCORE_MASKS: Dict[str, np.ndarray] = {
+    "Over 2.5 FT": _HOME_GOALS + _AWAY_GOALS > 2.5,
+    "Over 1.5 FT": _HOME_GOALS + _AWAY_GOALS > 1.5,
+    "Under 2.5 FT": _HOME_GOALS + _AWAY_GOALS < 2.5,
+    "ML Home": _HOME_GOALS > _AWAY_GOALS,
+    "ML Away": _AWAY_GOALS > _HOME_GOALS,
+    "Draw": _HOME_GOALS == _AWAY_GOALS,
+    "1X": _HOME_GOALS >= _AWAY_GOALS,
+    "X2": _AWAY_GOALS >= _HOME_GOALS,
+    "BTTS Yes": (_HOME_GOALS > 0) & (_AWAY_GOALS > 0),
+    "BTTS No": (_HOME_GOALS == 0) | (_AWAY_GOALS == 0),
+}
+_MASK_STACK = np.stack(list(_SCORE_MASKS.values())).astype(np.float64)
+_LABEL_COLUMN = np.array(list(MARKET_LABELS.values()), dtype=object)[:, None]
+
+
+def poisson_pmf(lam: np.ndarray) -> np.ndarray:
+    """P(X = k) para k = 0..MAX_GOALS, uma linha por média: [n, MAX_GOALS + 1]."""
+    lam = np.asarray(lam, dtype=np.float64)[:, None]
+    return np.exp(_GOALS * np.log(lam) - lam - _LOG_FACTORIAL)
+
+
+def scoreline_matrices(lam_home: np.ndarray, lam_away: np.ndarray) -> np.ndarray:
+    """Probabilidade de cada placar [partida, gols casa, gols fora], normalizada no corte MAX_GOALS."""
+    matrices = poisson_pmf(lam_home)[:, :, None] * poisson_pmf(lam_away)[:, None, :]
+    return matrices / matrices.sum(axis=(1, 2), keepdims=True)
+
+
+LeagueAverage = Union[None, float, np.ndarray]
+
+
+def competition_goal_averages(
+    matches: Iterable[Dict[str, Any]],
+    min_matches: int = MIN_MATCHES_FOR_LEAGUE_AVG,
+) -> Dict[int, float]:
+    """
+    Gols por time por jogo de cada competição, nas partidas finalizadas com placar
+    (formato da API). Competições com menos de 'min_matches' jogos ficam de fora.
+    """
+    goals: Dict[int, float] = {}
+    played: Dict[int, int] = {}
+    for m in matches:
+        comp_id = (m.get("competition") or {}).get("id")
+        ft = (m.get("score") or {}).get("fullTime") or {}
+        if comp_id is None or ft.get("home") is None or ft.get("away") is None:
+            continue
+        goals[comp_id] = goals.get(comp_id, 0.0) + ft["home"] + ft["away"]
+        played[comp_id] = played.get(comp_id, 0) + 1
+    return {
+        comp_id: goals[comp_id] / (2 * count)
+        for comp_id, count in played.items()
+        if count >= min_matches and goals[comp_id] > 0
+    }
+
+
+def _league(league_avg: LeagueAverage) -> Union[float, np.ndarray]:
+    """Média da liga informada (um valor ou um por partida); LEAGUE_AVG_GOALS se ausente."""
+    if league_avg is None:
+        return LEAGUE_AVG_GOALS
+    return np.asarray(league_avg, dtype=np.float64)
+
+
+def expected_goals(
+    home: Dict[str, np.ndarray],
+    away: Dict[str, np.ndarray],
+    league_avg: LeagueAverage = None,
+    home_advantage: float = HOME_ADVANTAGE,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gols esperados (casa, fora). Ataque = gols pró / média da liga, defesa = gols
+    contra / média da liga, ambos encolhidos para 1.0 em amostras curtas. 'league_avg'
+    pode ser um valor para o lote ou um por partida (ex.: a média de cada competição).
+    """
+    h_games, a_games = home["total_games"], away["total_games"]
+    league = _league(league_avg)
+
+    def _strength(avg: np.ndarray, games: np.ndarray) -> np.ndarray:
+        return (games * avg / league + SHRINK_GAMES) / (games + SHRINK_GAMES)
+
+    lam_home = league * _strength(home["avg_gs"], h_games) * _strength(away["avg_gc"], a_games) * home_advantage
+    lam_away = league * _strength(away["avg_gs"], a_games) * _strength(home["avg_gc"], h_games) / home_advantage
+    return np.clip(lam_home, 0.05, 6.0), np.clip(lam_away, 0.05, 6.0)
+
+
+def market_probabilities(
+    home: Dict[str, np.ndarray],
+    away: Dict[str, np.ndarray],
+    league_avg: LeagueAverage = None,
+) -> Dict[str, np.ndarray]:
+    """Probabilidade de cada mercado de MARKET_LABELS (e do empate) para todas as partidas do lote."""
+    lam_home, lam_away = expected_goals(home, away, league_avg)
+
+    # 1º tempo: fração HT do histórico dos dois times
+    scored = home["avg_gs"] + away["avg_gs"]
+    ht_goals = home["avg_ht_goals_for"] + away["avg_ht_goals_for"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(scored > 0, np.clip(ht_goals / scored, 0.3, 0.6), HT_SHARE)
+    return _probabilities(lam_home, lam_away, share)
+
+
+def baseline_probabilities(n: int, league_avg: LeagueAverage = None) -> Dict[str, np.ndarray]:
+    """Probabilidades de uma partida entre dois times médios da liga (referência da confiança)."""
+    league = np.broadcast_to(_league(league_avg), (n,))
+    return _probabilities(league * HOME_ADVANTAGE, league / HOME_ADVANTAGE, np.full(n, HT_SHARE))
+
+
+def _probabilities(lam_home: np.ndarray, lam_away: np.ndarray, ht_share: np.ndarray) -> Dict[str, np.ndarray]:
+    matrices = scoreline_matrices(lam_home, lam_away)
+    by_mask = np.tensordot(matrices, _MASK_STACK, axes=([1, 2], [1, 2]))  # [partida, mercado]
+    probs = {code: by_mask[:, i] for i, code in enumerate(_SCORE_MASKS)}
+
+    # AH 0.0: empate devolve a aposta, então vale P(vitória) / P(não empate)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        decided = np.maximum(1.0 - probs["Draw"], 1e-12)
+    probs["AH Home"] = probs["ML Home"] / decided
+    probs["AH Away"] = probs["ML Away"] / decided
+
+    # 1º tempo: total de gols HT ~ Poisson(fração HT x gols esperados)
+    lam_ht = ht_share * (lam_home + lam_away)
+    probs["Over 0.5 HT"] = 1.0 - np.exp(-lam_ht)
+    probs["Over 1.5 HT"] = 1.0 - np.exp(-lam_ht) * (1.0 + lam_ht)
+    return probs
+
+
+def score_markets_poisson(
+    home: Dict[str, np.ndarray],
+    away: Dict[str, np.ndarray],
+    thresholds: MarketThresholds = DEFAULT_THRESHOLDS,
+    league_avg: LeagueAverage = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Mesma saída de score_markets_batch (rótulos [mercado, partida], confianças com -1
+    onde o mercado não é sugerido, partidas com histórico mínimo). Um mercado entra
+    quando é provável (>= 50%) e a vantagem sobre a partida média da liga,
+    (p - p_média) / (1 - p_média), passa de MIN_EDGE; a confiança é 50 + 49 x vantagem.
+    Dos limiares, só usa 'min_games'.
+    """
+    n = len(home["avg_gs"])
+    has_data = (home["total_games"] >= thresholds.min_games) & (away["total_games"] >= thresholds.min_games)
+    probs = market_probabilities(home, away, league_avg)
+    base = baseline_probabilities(n, league_avg)
+
+    rows = []
+    for code in MARKET_LABELS:
+        p, p0 = probs[code], base[code]
+        edge = (p - p0) / np.maximum(1.0 - p0, 1e-9)
+        conf = 50 + np.floor(np.clip(edge, 0.0, 1.0) * 49)
+        rows.append(np.where((p >= 0.5) & (edge >= MIN_EDGE), conf, -1))
+
+    labels = np.broadcast_to(_LABEL_COLUMN, (len(MARKET_LABELS), n))
+    return labels, np.stack(rows).astype(np.int64), has_data
+
+
+def decide_best_market_poisson_batch(
+    home: Dict[str, np.ndarray],
+    away: Dict[str, np.ndarray],
+    thresholds: MarketThresholds = DEFAULT_THRESHOLDS,
+    league_avg: LeagueAverage = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Equivalente a decide_best_market_batch: o mercado de maior vantagem de cada partida."""
+    return select_best_markets(*score_markets_poisson(home, away, thresholds, league_avg))
+
+
+def decide_best_market_poisson(
+    home_metrics: Union[TeamMetrics, TeamMetricsPanel],
+    away_metrics: Union[TeamMetrics, TeamMetricsPanel],
+    thresholds: MarketThresholds = DEFAULT_THRESHOLDS,
+    league_avg: Optional[float] = None,
+) -> Tuple[str, int]:
+    """
+    Mesma assinatura de decide_best_market, para uma partida (lote de tamanho 1). Passe a
+    média da competição em 'league_avg' (ver competition_goal_averages).
+    """
+    if isinstance(home_metrics, TeamMetricsPanel):
+        home_metrics = metrics_from_panel(home_metrics, "home")
+    if isinstance(away_metrics, TeamMetricsPanel):
+        away_metrics = metrics_from_panel(away_metrics, "away")
+    suggestions, confidences = decide_best_market_poisson_batch(
+        metrics_to_columns([home_metrics]), metrics_to_columns([away_metrics]), thresholds, league_avg
+    )
+    return str(suggestions[0]), int(confidences[0])
+
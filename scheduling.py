@@ -0,0 +1,118 @@
+# Planejamento de análises por horário de início (kickoff) das partidas
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from models import Fixture
+
+
+@dataclass(slots=True)
+class KickoffBatch:
+    """Grupo de partidas com início próximo, analisadas e enviadas em um único resumo."""
+    run_at: datetime
+    fixtures: List[Fixture] = field(default_factory=list)
+
+    @property
+    def first_kickoff(self) -> datetime:
+        return self.fixtures[0].kickoff
+
+
+def plan_kickoff_jobs(
+    fixtures: List[Fixture],
+    now: datetime,
+    lead_time: timedelta = timedelta(minutes=90),
+    batch_window: timedelta = timedelta(minutes=45),
+    min_lead: timedelta = timedelta(minutes=2),
+) -> List[KickoffBatch]:
+    """
+    Agrupa as partidas por kickoff e define quando cada grupo deve ser analisado.
+
+    Partidas que começam até 'batch_window' depois da primeira do grupo entram no
+    mesmo resumo; o grupo roda 'lead_time' antes do primeiro kickoff (nunca antes de
+    'now'). Partidas que começam em menos de 'min_lead' são descartadas. Como os grupos
+    seguem a distribuição real dos jogos, a carga na API fica espalhada ao longo do dia.
+    """
+    candidates = sorted(
+        (f for f in fixtures if f.kickoff - now > min_lead),
+        key=lambda f: f.kickoff,
+    )
+
+    batches: List[KickoffBatch] = []
+    for fixture in candidates:
+        if batches and fixture.kickoff - batches[-1].first_kickoff <= batch_window:
+            batches[-1].fixtures.append(fixture)
+            continue
+        batches.append(KickoffBatch(run_at=max(now, fixture.kickoff - lead_time), fixtures=[fixture]))
+
+    return batches
+
+
+class RunCoordinator:
+    """
+    Evita execuções sobrepostas do mesmo ciclo de análise.
+
+    Com policy="coalesce", um disparo que chega durante uma execução em andamento
+    é guardado e roda UMA vez ao final (vários disparos viram um só). Com
+    policy="skip", o disparo é simplesmente descartado. Disparos com queue=True (ex.:
+    os grupos do modo kickoff, que não podem ser descartados nem fundidos) esperam a
+    execução em andamento terminar e rodam em seguida.
+    """
+
+    def __init__(self, policy: str = "coalesce"):
+        if policy not in ("coalesce", "skip"):
+            raise ValueError(f"Política de sobreposição inválida: {policy}")
+        self.policy = policy
+        self._running: Dict[str, bool] = {}
+        self._pending: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._idle: Dict[str, asyncio.Event] = {}
+        self.status: Dict[str, Dict[str, Any]] = {}
+
+    def is_running(self, name: str) -> bool:
+        return self._running.get(name, False)
+
+    async def run(self, name: str, factory: Callable[[], Awaitable[Any]], queue: bool = False) -> bool:
+        """Executa factory() se não houver outra execução de 'name'. Retorna False se não rodou agora."""
+        stats = self.status.setdefault(
+            name, {"runs": 0, "skipped": 0, "coalesced": 0, "queued": 0, "last_result": None}
+        )
+
+        if queue and self._running.get(name):
+            stats["queued"] += 1
+            print(f"⚠ Execução '{name}' já em andamento. Disparo na fila até o final.")
+            while self._running.get(name):
+                await self._idle[name].wait()
+
+        if self._running.get(name):
+            if self.policy == "coalesce":
+                self._pending[name] = factory
+                stats["coalesced"] += 1
+                print(f"⚠ Execução '{name}' já em andamento. Nova execução agendada para o final.")
+            else:
+                stats["skipped"] += 1
+                print(f"⚠ Execução '{name}' já em andamento. Disparo ignorado.")
+            return False
+
+        self._running[name] = True
+        self._idle.setdefault(name, asyncio.Event()).clear()
+        try:
+            while factory is not None:
+                stats["runs"] += 1
+                stats["last_started"] = datetime.now(timezone.utc).isoformat()
+                try:
+                    await factory()
+                    stats["last_result"] = "ok"
+                except asyncio.CancelledError:
+                    stats["last_result"] = "cancelled"
+                    raise
+                except Exception as e:
+                    stats["last_result"] = f"error: {e}"
+                    print(f"❌ Erro na execução '{name}': {e}")
+                finally:
+                    stats["last_finished"] = datetime.now(timezone.utc).isoformat()
+                factory = self._pending.pop(name, None)
+        finally:
+            self._running[name] = False
+            self._pending.pop(name, None)
+            self._idle[name].set()
+        return True
@@ -0,0 +1,203 @@
+# Modo em shards: as competições são divididas entre várias chaves da API (API_TOKENS)
+#
+# Cada shard tem a sua chave, o seu RateLimiter e a sua sessão HTTP, e roda o próprio
+# StreamingPipeline (descoberta -> índice de forma -> métricas -> pontuação) como uma
+# task. As partidas pontuadas de todos os shards chegam num único stream ao
+# coordenador (analyze_and_send no main.py), que faz o TOP N e o envio único.
+# Com a cota por chave como gargalo, o ciclo escala com o número de chaves.
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiohttp
+
+from analysis import RateLimiter, create_http_session, rate_limiter_scope, stream_upcoming_fixtures
+from models import Fixture
+from pipeline import StreamingPipeline
+
+_DONE = object()
+
+
+@dataclass(slots=True)
+class Shard:
+    """Uma chave da API com as competições atribuídas a ela."""
+    index: int
+    api_token: str
+    competition_ids: List[int]
+    limiter: RateLimiter
+    session: Optional[aiohttp.ClientSession] = None
+    analyzed: int = 0
+    failures: int = 0
+
+
+def parse_api_tokens(raw: Optional[str]) -> List[str]:
+    """Lista de chaves separadas por vírgula (sem vazias nem repetidas, na ordem informada)."""
+    tokens: List[str] = []
+    for token in (raw or "").split(","):
+        token = token.strip()
+        if token and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def assign_competitions(competition_ids: Iterable[int], shard_count: int) -> List[List[int]]:
+    """Distribui as competições entre os shards em rodízio (na ordem do LEAGUE_MAP)."""
+    shards: List[List[int]] = [[] for _ in range(max(1, shard_count))]
+    for i, comp_id in enumerate(competition_ids):
+        shards[i % len(shards)].append(comp_id)
+    return shards
+
+
+class ShardedPipeline:
+    """
+    Junta os StreamingPipeline dos shards com a mesma interface de um pipeline único
+    (earliest_kickoff, discovered, discovery_done, pending, failed, pending_until, results()),
+    para o coordenador aplicar o mesmo prazo de ciclo e o envio antecipado.
+    """
+
+    def __init__(self, parts: List[Tuple[Shard, StreamingPipeline]]):
+        self.parts = parts
+
+    @property
+    def earliest_kickoff(self):
+        kickoffs = [p.earliest_kickoff for _, p in self.parts if p.earliest_kickoff is not None]
+        return min(kickoffs) if kickoffs else None
+
+    @property
+    def discovered(self) -> int:
+        return sum(p.discovered for _, p in self.parts)
+
+    @property
+    def discovery_done(self) -> bool:
+        return all(p.discovery_done for _, p in self.parts)
+
+    @property
+    def pending(self) -> int:
+        return sum(p.pending for _, p in self.parts)
+
+    @property
+    def failed(self) -> Set[int]:
+        return set().union(*(p.failed for _, p in self.parts))
+
+    def pending_until(self, cutoff) -> int:
+        return sum(p.pending_until(cutoff) for _, p in self.parts)
+
+    async def results(self) -> AsyncIterator[Tuple[Fixture, Optional[Fixture]]]:
+        """Resultados de todos os shards, na ordem em que terminam."""
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def _drain(shard: Shard, pipeline: StreamingPipeline) -> None:
+            try:
+                async for item in pipeline.results():
+                    shard.analyzed += 1
+                    queue.put_nowait(item)
+            except Exception as e:
+                # Um shard com problema (ex.: chave inválida) não derruba os demais
+                shard.failures += 1
+                print(f"❌ Erro no shard {shard.index} (competições {shard.competition_ids}): {e}")
+            finally:
+                queue.put_nowait(_DONE)
+
+        tasks = []
+        for shard, pipeline in self.parts:
+            # A task (e as que o pipeline criar) herda o RateLimiter da chave do shard
+            with rate_limiter_scope(shard.limiter):
+                tasks.append(asyncio.create_task(_drain(shard, pipeline)))
+
+        remaining = len(tasks)
+        try:
+            while remaining:
+                item = await queue.get()
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ShardCoordinator:
+    """
+    Divide as competições entre as chaves e monta o ShardedPipeline de cada ciclo.
+    'known_limiters' reaproveita um RateLimiter já existente para a mesma chave (ex.: o
+    API_RATE_LIMITER global do API_TOKEN, usado também pelo modo ao vivo).
+    """
+
+    def __init__(
+        self,
+        api_tokens: List[str],
+        competition_ids: Iterable[int],
+        requests_per_minute: int = 10,
+        session_factory: Callable[[], aiohttp.ClientSession] = create_http_session,
+        known_limiters: Optional[Dict[str, RateLimiter]] = None,
+    ):
+        known_limiters = known_limiters or {}
+        assignment = assign_competitions(competition_ids, len(api_tokens))
+        self.shards = [
+            Shard(i, token, comps, known_limiters.get(token) or RateLimiter(rate_per_minute=requests_per_minute))
+            for i, (token, comps) in enumerate(zip(api_tokens, assignment))
+        ]
+        self._by_competition = {comp_id: shard for shard in self.shards for comp_id in shard.competition_ids}
+        self.session_factory = session_factory
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def shard_for(self, competition_id: Optional[int]) -> Shard:
+        """Shard responsável pela competição (competições fora do LEAGUE_MAP vão por resto da divisão)."""
+        shard = self._by_competition.get(competition_id)
+        return shard if shard is not None else self.shards[(competition_id or 0) % len(self.shards)]
+
+    def open(self) -> None:
+        """Cria as sessões HTTP dos shards (uma vez; chamadas seguintes não fazem nada)."""
+        for shard in self.shards:
+            if shard.session is None or shard.session.closed:
+                shard.session = self.session_factory()
+
+    async def close(self) -> None:
+        for shard in self.shards:
+            if shard.session is not None:
+                await shard.session.close()
+                shard.session = None
+
+    def upcoming_sources(self, league_ids: Iterable[int]) -> Dict[int, AsyncIterator[List[Fixture]]]:
+        """Stream de partidas futuras de cada shard, só com as competições dele em 'league_ids'."""
+        self.open()
+        by_shard: Dict[int, List[int]] = {}
+        for comp_id in league_ids:
+            by_shard.setdefault(self.shard_for(comp_id).index, []).append(comp_id)
+        return {
+            index: stream_upcoming_fixtures(self.shards[index].api_token, comps, session=self.shards[index].session)
+            for index, comps in by_shard.items()
+        }
+
+    def split(self, fixtures: List[Fixture]) -> Dict[int, List[Fixture]]:
+        """Partidas já conhecidas (ex.: lote do modo kickoff) agrupadas pelo shard da competição."""
+        by_shard: Dict[int, List[Fixture]] = {}
+        for f in fixtures:
+            by_shard.setdefault(self.shard_for(f.competition_id).index, []).append(f)
+        return by_shard
+
+    def pipeline(
+        self,
+        sources: Dict[int, AsyncIterator[List[Fixture]]],
+        build: Callable[[Shard, AsyncIterator[List[Fixture]]], StreamingPipeline],
+    ) -> ShardedPipeline:
+        """Um StreamingPipeline por shard com fonte (montado por 'build' com a chave/sessão do shard)."""
+        self.open()
+        return ShardedPipeline([(self.shards[index], build(self.shards[index], source)) for index, source in sources.items()])
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "shard": shard.index,
+                "token": f"...{shard.api_token[-4:]}",
+                "competitions": shard.competition_ids,
+                "analyzed": shard.analyzed,
+                "failures": shard.failures,
+                "rate_limiter": shard.limiter.stats(),
+            }
+            for shard in self.shards
+        ]
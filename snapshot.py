@@ -0,0 +1,122 @@
+# Snapshot de aquecimento: estado do último ciclo salvo em disco para reinícios rápidos
+import json
+import os
+import time
+import zlib
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # Opcional: sem msgpack, o snapshot sai em JSON comprimido
+    msgpack = None
+
+from analysis import slim_match
+from form_index import TeamFormIndex
+from models import Fixture
+
+SNAPSHOT_VERSION = 1
+_MAGIC = b"BOTSNAP1"
+_MSGPACK, _JSON = b"M", b"J"
+
+
+# ======================================================================
+# FORMATO BINÁRIO
+# ======================================================================
+
+def encode_snapshot(state: Dict[str, Any]) -> bytes:
+    """Cabeçalho + formato (M = msgpack, J = JSON) + corpo comprimido com zlib."""
+    if msgpack is not None:
+        return _MAGIC + _MSGPACK + zlib.compress(msgpack.packb(state, use_bin_type=True))
+    return _MAGIC + _JSON + zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_snapshot(blob: bytes) -> Dict[str, Any]:
+    if not blob.startswith(_MAGIC):
+        raise ValueError("arquivo não é um snapshot do bot")
+    kind, body = blob[len(_MAGIC):len(_MAGIC) + 1], zlib.decompress(blob[len(_MAGIC) + 1:])
+    if kind == _MSGPACK:
+        if msgpack is None:
+            raise ValueError("snapshot gravado em msgpack, mas o pacote não está instalado")
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    if kind == _JSON:
+        return json.loads(body)
+    raise ValueError(f"formato de snapshot desconhecido: {kind!r}")
+
+
+def save_snapshot(path: str, state: Dict[str, Any]) -> int:
+    """Grava o snapshot de forma atômica (arquivo temporário + rename). Retorna o tamanho em bytes."""
+    blob = encode_snapshot({**state, "version": SNAPSHOT_VERSION, "saved_at": time.time()})
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(blob)
+    os.replace(tmp, path)
+    return len(blob)
+
+
+def load_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """Lê o snapshot; None se não existir, estiver corrompido ou for de outra versão."""
+    try:
+        with open(path, "rb") as fh:
+            state = decode_snapshot(fh.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠ Snapshot ignorado ({path}): {e}")
+        return None
+    if state.get("version") != SNAPSHOT_VERSION:
+        print(f"⚠ Snapshot ignorado ({path}): versão {state.get('version')} != {SNAPSHOT_VERSION}")
+        return None
+    return state
+
+
+# ======================================================================
+# ESTADO DO BOT
+# ======================================================================
+
+def build_snapshot(
+    fixtures: Iterable[Fixture],
+    form_index: TeamFormIndex,
+    sent_alerts: Dict[str, Dict[int, float]],
+    cycle_at: Optional[float] = None,
+    live_fixtures: Iterable[Fixture] = (),
+) -> Dict[str, Any]:
+    """
+    Partidas pontuadas, índice de forma, alertas enviados (chat -> partida -> kickoff) e
+    as partidas que o modo ao vivo acompanha (já começadas não estão mais na tabela).
+    """
+    form_state = form_index.to_state()
+    form_state["buffers"] = [[team_id, [slim_match(m) for m in matches]] for team_id, matches in form_state["buffers"]]
+    return {
+        "cycle_at": cycle_at,
+        "fixtures": [_fixture_state(f) for f in fixtures],
+        "live_fixtures": [_fixture_state(f) for f in live_fixtures],
+        "form_index": form_state,
+        "sent_alerts": [
+            [chat_id, fixture_id, kickoff]
+            for chat_id, sent in sent_alerts.items()
+            for fixture_id, kickoff in sent.items()
+        ],
+    }
+
+
+def _fixture_state(f: Fixture) -> Dict[str, Any]:
+    return {**asdict(f), "kickoff": f.kickoff.isoformat()}
+
+
+def fixtures_from_snapshot(state: Dict[str, Any], key: str = "fixtures") -> List[Fixture]:
+    """Partidas pontuadas ('fixtures') ou acompanhadas ao vivo ('live_fixtures') do snapshot."""
+    return [Fixture(**{**f, "kickoff": datetime.fromisoformat(f["kickoff"])}) for f in state.get(key, [])]
+
+
+def sent_alerts_from_snapshot(
+    state: Dict[str, Any], now: Optional[float] = None, retention: float = 0.0
+) -> Dict[str, Dict[int, float]]:
+    """Alertas já enviados cujas partidas não começaram há mais de 'retention' segundos."""
+    now = now or time.time()
+    sent: Dict[str, Dict[int, float]] = {}
+    for chat_id, fixture_id, kickoff in state.get("sent_alerts", []):
+        if kickoff > now - retention:
+            sent.setdefault(str(chat_id), {})[int(fixture_id)] = kickoff
+    return sent
@@ -0,0 +1,122 @@
+# Inscrições por chat e tabela única de partidas pontuadas
+import bisect
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Collection, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from models import Fixture
+from pipeline import TopNHeap
+
+
+@dataclass(slots=True)
+class Subscription:
+    """Preferências de um chat: ligas, janela (horas), confiança mínima e quantidade de jogos."""
+    chat_id: str
+    league_ids: Optional[FrozenSet[int]] = None  # None = todas as ligas
+    hours: float = 12
+    min_confidence: int = 50
+    top_n: int = 4
+
+
+def load_subscriptions(path: str) -> List[Subscription]:
+    """
+    Lê inscrições de um arquivo JSON, ex.:
+    [{"chat_id": "123", "league_ids": [2021, 2014], "hours": 6, "min_confidence": 70, "top_n": 3}]
+    """
+    with open(path, encoding="utf-8") as fh:
+        raw = json.load(fh)
+
+    subscriptions = []
+    for item in raw:
+        leagues = item.get("league_ids")
+        subscriptions.append(Subscription(
+            chat_id=str(item["chat_id"]),
+            league_ids=frozenset(int(x) for x in leagues) if leagues else None,
+            hours=float(item.get("hours", 12)),
+            min_confidence=int(item.get("min_confidence", 50)),
+            top_n=int(item.get("top_n", 4)),
+        ))
+    return subscriptions
+
+
+class ScoredFixtureTable:
+    """
+    Partidas já pontuadas por analyze_and_rate_fixture, indexadas por liga e ordenadas
+    por kickoff. Cada inscrição é respondida com bisect na janela de horário + filtro
+    de confiança, sem nenhuma nova requisição ou análise.
+    """
+
+    def __init__(self):
+        self._by_league: Dict[Optional[int], List[Tuple[datetime, int]]] = {}
+        self._fixtures: Dict[int, Fixture] = {}
+
+    def __len__(self) -> int:
+        return len(self._fixtures)
+
+    def add(self, fixture: Fixture) -> None:
+        """Insere ou atualiza uma partida pontuada."""
+        if fixture.id in self._fixtures:
+            self.remove(fixture.id)
+        self._fixtures[fixture.id] = fixture
+        bisect.insort(self._by_league.setdefault(fixture.competition_id, []), (fixture.kickoff, fixture.id))
+
+    def fixtures(self) -> List[Fixture]:
+        return list(self._fixtures.values())
+
+    def get(self, fixture_id: int) -> Optional[Fixture]:
+        return self._fixtures.get(fixture_id)
+
+    def remove(self, fixture_id: int) -> None:
+        fixture = self._fixtures.pop(fixture_id, None)
+        if fixture is None:
+            return
+        index = self._by_league.get(fixture.competition_id, [])
+        pos = bisect.bisect_left(index, (fixture.kickoff, fixture.id))
+        if pos < len(index) and index[pos][1] == fixture.id:
+            index.pop(pos)
+
+    def prune(self, now: datetime) -> None:
+        """Remove partidas que já começaram."""
+        for index in self._by_league.values():
+            cut = bisect.bisect_right(index, (now, float("inf")))
+            for _, fixture_id in index[:cut]:
+                self._fixtures.pop(fixture_id, None)
+            del index[:cut]
+
+    def query(
+        self,
+        subscription: Subscription,
+        now: datetime,
+        min_lead: timedelta = timedelta(0),
+        fixture_ids: Optional[Set[int]] = None,
+        exclude: Optional[Collection[int]] = None,
+    ) -> List[Fixture]:
+        """
+        TOP N da inscrição: partidas das ligas escolhidas, na janela, acima da confiança
+        mínima. 'exclude' tira partidas já enviadas ao chat.
+        """
+        start = (now + min_lead, float("inf"))
+        end = (now + timedelta(hours=subscription.hours), float("inf"))
+        leagues: Iterable[Optional[int]] = (
+            subscription.league_ids if subscription.league_ids is not None else self._by_league.keys()
+        )
+
+        top = TopNHeap(subscription.top_n)
+        for league_id in leagues:
+            index = self._by_league.get(league_id)
+            if not index:
+                continue
+            lo = bisect.bisect_right(index, start)
+            hi = bisect.bisect_right(index, end)
+            for _, fixture_id in index[lo:hi]:
+                fixture = self._fixtures[fixture_id]
+                if fixture.confidence < subscription.min_confidence:
+                    continue
+                if fixture_ids is not None and fixture_id not in fixture_ids:
+                    continue
+                if exclude is not None and fixture_id in exclude:
+                    continue
+                top.push(fixture)
+
+        return top.items()
@@ -0,0 +1,262 @@
+# Busca de limiares de mercado (grid ou aleatória) em paralelo, sobre o histórico do backtest.
+#
+# As colunas de métricas (casa/fora) e a matriz de resultados por mercado são calculadas
+# uma única vez e ficam em memória compartilhada (multiprocessing.shared_memory): cada
+# processo do pool só recebe o nome do bloco, nunca os arrays.
+#
+# Uso: python sweep.py --store matches.db --random 5000 --out profile.json
+#      MARKET_PROFILE=profile.json python main.py
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from analysis import (
+    METRIC_COLUMNS,
+    MARKET_CODES,
+    MarketThresholds,
+    decide_best_market_batch,
+    market_code,
+    market_hit_code,
+)
+from backtest import add_data_arguments, load_matches, matches_to_arrays, rolling_team_columns, selection_mask
+
+# Valores testados por limiar (os demais campos de MarketThresholds ficam no padrão)
+SEARCH_SPACE: Dict[str, List[Any]] = {
+    "over25_goals": [2.4, 2.6, 2.8, 3.0, 3.2],
+    "over15_goals": [1.8, 2.0, 2.2],
+    "under25_goals": [1.6, 1.8, 2.0],
+    "ml_form_diff": [40, 50, 60],
+    "dc_form_diff": [25, 35, 45],
+    "btts_yes_rate": [0.6, 0.7, 0.8],
+    "btts_no_rate": [0.2, 0.3, 0.4],
+    "corners_95": [9.0, 10.5],  # Escanteios são simulados: 10.5 desliga o mercado
+    "ht_over15_goals": [1.3, 1.5, 1.7],
+    "ht_over05_goals": [0.6, 0.8, 1.0],
+    "min_confidence": [50, 60, 70, 80],
+}
+
+_CODE_INDEX = {code: i for i, code in enumerate(MARKET_CODES)}
+
+# Estado de cada processo do pool (preenchido por _attach)
+_SHARED: Dict[str, Any] = {}
+
+
+# ======================================================================
+# DADOS COMPARTILHADOS
+# ======================================================================
+
+def build_matrix(data: Dict[str, np.ndarray], idx: np.ndarray, last: int) -> np.ndarray:
+    """
+    Uma matriz float64 [linhas, partidas]: métricas de casa, métricas de fora e o resultado
+    de cada mercado de MARKET_CODES (1 green, 0 red, NaN devolvido/sem placar).
+    """
+    home, away = rolling_team_columns(data, last=last)
+    rows = [home[key][idx] for key in METRIC_COLUMNS] + [away[key][idx] for key in METRIC_COLUMNS]
+
+    outcomes = np.full((len(MARKET_CODES), len(idx)), np.nan)
+    for j, i in enumerate(idx):
+        score = [None if np.isnan(data[k][i]) else int(data[k][i]) for k in ("ft_home", "ft_away", "ht_home", "ht_away")]
+        for c, code in enumerate(MARKET_CODES):
+            hit = market_hit_code(code, *score)
+            if hit is not None:
+                outcomes[c, j] = float(hit)
+
+    return np.vstack(rows + [outcomes])
+
+
+def _attach(name: str, shape: Tuple[int, int]) -> None:
+    """Inicializador do pool: abre o bloco compartilhado e monta as visões (sem cópia)."""
+    shm = shared_memory.SharedMemory(name=name)
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    k = len(METRIC_COLUMNS)
+    _SHARED["shm"] = shm  # Mantém o bloco aberto enquanto o processo viver
+    _SHARED["home"] = {key: matrix[i] for i, key in enumerate(METRIC_COLUMNS)}
+    _SHARED["away"] = {key: matrix[k + i] for i, key in enumerate(METRIC_COLUMNS)}
+    _SHARED["outcomes"] = matrix[2 * k:]
+
+
+# ======================================================================
+# AVALIAÇÃO
+# ======================================================================
+
+def wilson_lower_bound(hits: float, n: float, z: float = 1.96) -> float:
+    """Limite inferior (95%) da taxa de acerto: penaliza perfis com poucas apostas."""
+    if n <= 0:
+        return 0.0
+    p = hits / n
+    denom = 1 + z * z / n
+    centre = p + z * z / (2 * n)
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return (centre - margin) / denom
+
+
+def evaluate(
+    thresholds: MarketThresholds,
+    home: Dict[str, np.ndarray],
+    away: Dict[str, np.ndarray],
+    outcomes: np.ndarray,
+    min_bets: int = 0,
+) -> Dict[str, Any]:
+    """Aposta na melhor sugestão de cada partida com confiança >= min_confidence e confere."""
+    suggestions, confidences = decide_best_market_batch(home, away, thresholds)
+    codes = np.array([_CODE_INDEX.get(market_code(s), -1) for s in suggestions], dtype=np.int64)
+
+    bet = (codes >= 0) & (confidences >= thresholds.min_confidence)
+    result = outcomes[np.where(bet, codes, 0), np.arange(len(codes))]
+    settled = bet & ~np.isnan(result)
+    n, hits = int(settled.sum()), float(np.nansum(result[settled]))
+
+    return {
+        "score": wilson_lower_bound(hits, n) if n >= min_bets else 0.0,
+        "bets": n,
+        "hits": int(hits),
+        "hit_rate": round(hits / n, 4) if n else None,
+    }
+
+
+def _evaluate_chunk(chunk: List[Dict[str, Any]], min_bets: int) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Tarefa do pool: avalia um lote de combinações contra a memória compartilhada."""
+    home, away, outcomes = _SHARED["home"], _SHARED["away"], _SHARED["outcomes"]
+    return [(params, evaluate(MarketThresholds(**params), home, away, outcomes, min_bets)) for params in chunk]
+
+
+# ======================================================================
+# BUSCA
+# ======================================================================
+
+def grid_candidates(space: Dict[str, List[Any]]) -> Iterator[Dict[str, Any]]:
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def random_candidates(space: Dict[str, List[Any]], count: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield {k: rng.choice(v) for k, v in space.items()}
+
+
+def _chunks(candidates: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        chunk = list(itertools.islice(candidates, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_sweep(
+    matrix: np.ndarray,
+    candidates: Iterator[Dict[str, Any]],
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    min_bets: int = 0,
+    top: int = 10,
+) -> Dict[str, Any]:
+    """Avalia as combinações em um ProcessPoolExecutor com a matriz em memória compartilhada."""
+    started = time.perf_counter()
+    shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+    try:
+        np.ndarray(matrix.shape, dtype=np.float64, buffer=shm.buf)[:] = matrix
+
+        ranked: List[Tuple[float, int, Dict[str, Any], Dict[str, Any]]] = []
+        evaluated = 0
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(), initializer=_attach, initargs=(shm.name, matrix.shape)
+        ) as pool:
+            chunks = _chunks(candidates, chunk_size)
+            for results in pool.map(_evaluate_chunk, chunks, itertools.repeat(min_bets)):
+                for params, result in results:
+                    evaluated += 1
+                    ranked.append((result["score"], -evaluated, params, result))
+                ranked = sorted(ranked, key=lambda r: r[:2], reverse=True)[:top]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return {
+        "evaluated": evaluated,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "top": [{"thresholds": params, **result} for _, _, params, result in ranked],
+    }
+
+
+def build_profile(report: Dict[str, Any], baseline: Dict[str, Any], matches: int) -> Dict[str, Any]:
+    """Perfil carregável por load_market_profile (MARKET_PROFILE no main.py)."""
+    best = report["top"][0]
+    return {
+        "thresholds": MarketThresholds(**best["thresholds"]).to_dict(),
+        "score": round(best["score"], 4),
+        "bets": best["bets"],
+        "hit_rate": best["hit_rate"],
+        "baseline": baseline,
+        "matches": matches,
+        "evaluated": report["evaluated"],
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Busca dos limiares de mercado sobre o histórico.")
+    add_data_arguments(parser)
+    parser.add_argument("--grid", action="store_true", help="Grid completo do SEARCH_SPACE (padrão: busca aleatória)")
+    parser.add_argument("--random", type=int, default=2000, help="Combinações sorteadas na busca aleatória")
+    parser.add_argument("--limit", type=int, help="Máximo de combinações avaliadas no grid")
+    parser.add_argument("--workers", type=int, help="Processos do pool (padrão: todos os núcleos)")
+    parser.add_argument("--min-bets", type=int, default=100, help="Mínimo de apostas conferidas para um perfil valer")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="market_profile.json", help="Arquivo do perfil vencedor")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.store and not args.dumps:
+        sys.exit("Informe --store ou ao menos um arquivo JSON.")
+
+    data = matches_to_arrays(load_matches(args.dumps, args.store))
+    idx = np.flatnonzero(selection_mask(data, args.competitions, args.date_from, args.date_to))
+    matrix = build_matrix(data, idx, args.last)
+
+    k = len(METRIC_COLUMNS)
+    baseline = evaluate(
+        MarketThresholds(),
+        {key: matrix[i] for i, key in enumerate(METRIC_COLUMNS)},
+        {key: matrix[k + i] for i, key in enumerate(METRIC_COLUMNS)},
+        matrix[2 * k:],
+        args.min_bets,
+    )
+
+    if args.grid:
+        candidates = grid_candidates(SEARCH_SPACE)
+        if args.limit:
+            candidates = itertools.islice(candidates, args.limit)
+    else:
+        candidates = random_candidates(SEARCH_SPACE, args.random, seed=args.seed)
+
+    report = run_sweep(matrix, candidates, workers=args.workers, min_bets=args.min_bets)
+    if not report["top"]:
+        sys.exit("Nenhuma combinação avaliada.")
+
+    profile = build_profile(report, baseline, len(idx))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(profile, fh, indent=2, ensure_ascii=False)
+
+    if args.json:
+        print(json.dumps({**report, "baseline": baseline}, indent=2, ensure_ascii=False))
+    else:
+        print(f"🔧 SWEEP – {report['evaluated']} combinações em {report['elapsed_s']}s ({len(idx)} partidas)")
+        print(f"   Padrão atual: {baseline['bets']} apostas, taxa {baseline['hit_rate']}")
+        for i, row in enumerate(report["top"], 1):
+            print(f"   {i:>2}. score {row['score']:.4f} | {row['bets']} apostas | taxa {row['hit_rate']}")
+        print(f"✅ Perfil salvo em {args.out}")